@@ -16,6 +16,7 @@ def callback(secs, func):
 	global g_next_handle
 	g_callback_events[g_next_handle] = (_time.time()+secs, func)
 	g_next_handle += 1
+	return g_next_handle - 1
 
 def cancelCallback(handle):
 	try:
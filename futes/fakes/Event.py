@@ -9,6 +9,11 @@ class Event(object):
 		self.callbacks.append(other)
 		return self
 
+	def __isub__(self, other):
+		if other in self.callbacks:
+			self.callbacks.remove(other)
+		return self
+
 	def __call__(self, *args, **kwargs):
 		for callback in self.callbacks:
 			try:
@@ -0,0 +1,189 @@
+import random
+import heapq
+import bisect
+import math
+from ts_client_query import build_keyvalue
+
+DEFAULT_RATES = {
+	# talk spurts started per second, each spurt also ends with a stop event
+	"talk": 20.0,
+	# channel switches per second
+	"move": 2.0,
+	# client variable updates (mute toggles) per second
+	"update": 2.0,
+	# users entering and leaving per second
+	"enter": 0.5,
+	"leave": 0.5
+}
+
+# length of a talk spurt is log-normally distributed, median of 1.5 seconds
+TALK_SPURT_MU = math.log(1.5)
+TALK_SPURT_SIGMA = 0.8
+
+# popularity of users (as talkers) and channels follows Zipf's law
+ZIPF_EXPONENT = 1.0
+
+class LoadGenerator(object):
+	'''
+	Generates synthetic load to TSClientQueryService: a large population of
+	fake users spread over several server connections and channels, who talk,
+	switch channels, update their client variables, and enter and leave
+	servers.
+
+	Events of each kind arrive as a Poisson process with rate given in
+	"rates" (events per second, see DEFAULT_RATES). Talkers and channels are
+	chosen with Zipf distributed popularity, so that a few users do most of
+	the talking and most users sit in a few channels, like on a real server.
+
+	Events are generated by calling run() repeatedly with current time, e.g.
+	on each check() of the service. Use service's set_sent_events_recording()
+	and get_sent_events() to get exact times when the events were sent.
+	'''
+
+	def __init__(self, service, user_count=1000, server_count=1, channel_count=10, rates=None, protected_count=0, seed=0):
+		self.__service = service
+		self.__user_count = user_count
+		self.__server_count = server_count
+		self.__channel_count = channel_count
+		self.__rates = dict(DEFAULT_RATES, **(rates or {}))
+		# most popular users which never leave
+		self.__protected_count = protected_count
+		self.__random = random.Random(seed)
+		self.__schandlerids = []
+		self.__names = []
+		self.__talker_weights = []
+		self.__channel_weights = get_cumulative_weights(get_zipf_weights(channel_count))
+		self.__next_index = 0
+		self.__talking = set()
+		self.__muted = set()
+		self.__talk_stops = []
+		self.__next_times = {}
+		self.__event_counts = dict.fromkeys(self.__rates, 0)
+
+	def populate(self):
+		'''Adds server connections and the initial user population to the
+		service without sending any events, do this before the mod connects.
+		'''
+		self.__schandlerids = self.__service.get_server_connections()
+		while len(self.__schandlerids) < self.__server_count:
+			self.__service.add_server_connection(self.__schandlerids[-1] + 1)
+			self.__schandlerids = self.__service.get_server_connections()
+		for index in range(self.__user_count):
+			name = self.__create_name()
+			self.__service.set_user(name, notify=False, **self.__create_user_args(name))
+			self.__names.append(name)
+		self.__update_talker_weights()
+
+	def get_user_names(self):
+		'''Returns names of current users, most active talkers first.'''
+		return list(self.__names)
+
+	def get_event_counts(self):
+		'''Returns counts of generated events by kind.'''
+		return dict(self.__event_counts)
+
+	def run(self, now):
+		'''Generates events which are due at time "now" (in seconds).'''
+		if not self.__next_times:
+			for kind in self.__rates:
+				self.__next_times[kind] = self.__get_next_time(kind, now)
+		while self.__talk_stops and self.__talk_stops[0][0] <= now:
+			self.__stop_talking(heapq.heappop(self.__talk_stops)[1])
+		for kind in self.__next_times:
+			while self.__next_times[kind] <= now:
+				getattr(self, "_LoadGenerator__generate_" + kind)(self.__next_times[kind])
+				self.__event_counts[kind] += 1
+				self.__next_times[kind] = self.__get_next_time(kind, self.__next_times[kind])
+
+	def __get_next_time(self, kind, previous_time):
+		rate = self.__rates[kind]
+		if rate <= 0:
+			return float("inf")
+		return previous_time + self.__random.expovariate(rate)
+
+	def __create_name(self):
+		name = "LoadUser{0}".format(self.__next_index)
+		self.__next_index += 1
+		return name
+
+	def __create_user_args(self, name):
+		return {
+			"schandlerid": self.__random.choice(self.__schandlerids),
+			"cid": self.__choose_channel(),
+			"metadata": "<wot_nickname_start>{0}<wot_nickname_end>".format(name)
+		}
+
+	def __choose_channel(self, exclude=None):
+		while True:
+			cid = choose_weighted(self.__random, self.__channel_weights) + 1
+			if cid != exclude or self.__channel_count < 2:
+				return cid
+
+	def __update_talker_weights(self):
+		self.__talker_weights = get_cumulative_weights(get_zipf_weights(len(self.__names)))
+
+	def __generate_talk(self, time):
+		# a few tries to find someone who isn't already talking
+		for attempt in range(5):
+			name = self.__names[choose_weighted(self.__random, self.__talker_weights)]
+			if name not in self.__talking:
+				self.__talking.add(name)
+				self.__service.set_user(name, speaking=True)
+				spurt_secs = self.__random.lognormvariate(TALK_SPURT_MU, TALK_SPURT_SIGMA)
+				heapq.heappush(self.__talk_stops, (time + spurt_secs, name))
+				return
+
+	def __stop_talking(self, name):
+		if name in self.__talking:
+			self.__talking.remove(name)
+			self.__service.set_user(name, speaking=False)
+
+	def __generate_move(self, time):
+		user = self.__service.get_user(name=self.__random.choice(self.__names))
+		self.__service.set_user(user.name, cid=self.__choose_channel(exclude=int(user.cid)))
+
+	def __generate_update(self, time):
+		user = self.__service.get_user(name=self.__random.choice(self.__names))
+		if user.name in self.__muted:
+			self.__muted.remove(user.name)
+		else:
+			self.__muted.add(user.name)
+		self.__service.send_event(" ".join([
+			"notifyclientupdated",
+			build_keyvalue("schandlerid", user.schandlerid),
+			build_keyvalue("clid", user.clid),
+			build_keyvalue("client_input_muted", int(user.name in self.__muted))
+		]))
+
+	def __generate_enter(self, time):
+		name = self.__create_name()
+		self.__service.enter_user(name, **self.__create_user_args(name))
+		self.__names.append(name)
+		self.__update_talker_weights()
+
+	def __generate_leave(self, time):
+		if len(self.__names) <= self.__protected_count:
+			return
+		name = self.__names.pop(self.__random.randrange(self.__protected_count, len(self.__names)))
+		self.__talking.discard(name)
+		self.__muted.discard(name)
+		self.__service.remove_user(name)
+		self.__update_talker_weights()
+
+def get_zipf_weights(count):
+	return [1.0 / (rank ** ZIPF_EXPONENT) for rank in range(1, count + 1)]
+
+def get_cumulative_weights(weights):
+	cumulative = []
+	total = 0.0
+	for weight in weights:
+		total += weight
+		cumulative.append(total)
+	return cumulative
+
+def choose_weighted(rnd, cumulative_weights):
+	'''Returns index of a randomly chosen item, given cumulative weights of
+	the items.
+	'''
+	index = bisect.bisect_right(cumulative_weights, rnd.random() * cumulative_weights[-1])
+	return min(index, len(cumulative_weights) - 1)
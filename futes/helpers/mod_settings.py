@@ -29,6 +29,9 @@ def reset_settings_file():
 	parser.set("TSClientQueryService", "host", "localhost")
 	parser.set("TSClientQueryService", "port", "25639")
 	parser.set("TSClientQueryService", "polling_interval", "0.1")
+	parser.set("TSClientQueryService", "polling_interval_max", "0.1")
+	parser.set("TSClientQueryService", "command_window", "8")
+	parser.set("TSClientQueryService", "reader_thread", "off")
 	parser.add_section("VoiceChatNotifications")
 	parser.set("VoiceChatNotifications", "enabled", "on")
 	parser.set("VoiceChatNotifications", "self_enabled", "on")
@@ -37,6 +40,14 @@ def reset_settings_file():
 	parser.set("MinimapNotifications", "self_enabled", "on")
 	parser.set("MinimapNotifications", "action", "attackSender")
 	parser.set("MinimapNotifications", "repeat_interval", "3.5")
+	parser.add_section("Diagnostics")
+	parser.set("Diagnostics", "metrics_enabled", "off")
+	parser.set("Diagnostics", "metrics_dump_interval", "60")
+	parser.set("Diagnostics", "trace_enabled", "off")
+	parser.set("Diagnostics", "slow_call_threshold", "16")
+	parser.set("Diagnostics", "slow_call_count", "50")
+	parser.set("Diagnostics", "profiler_enabled", "off")
+	parser.set("Diagnostics", "profiler_interval", "10")
 	with open(path, "w") as f:
 		parser.write(f)
 
@@ -62,7 +62,8 @@ class TestCaseBase(unittest.TestCase):
 				"speak_stop_delay": "0" # makes tests execute faster
 			},
 			TSClientQueryService = {
-				"polling_interval": "0" # makes tests execute faster
+				"polling_interval": "0", # makes tests execute faster
+				"polling_interval_max": "0"
 			}
 		)
 		# create empty ts plugin installer file
@@ -189,6 +190,7 @@ class TestCaseBase(unittest.TestCase):
 					if "position" in player:
 						BigWorld.player().arena.positions[vehicle_id] = player["position"]
 						BigWorld.entities[vehicle_id].position = BigWorld.Vector(*player["position"])
+				BigWorld.player().arena.onNewVehicleListReceived()
 			if "camera" in state:
 				if "position" in state["camera"]:
 					BigWorld.camera().position = BigWorld.Vector(*state["camera"]["position"])
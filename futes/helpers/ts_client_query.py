@@ -23,7 +23,7 @@ class TSClientQueryService(object):
 
 	def __init__(self):
 		self.__sock_map = {}
-		self._clids = []
+		self._clids = {}
 		self._server = None
 		self._data = Data()
 		self.insert_connect_message(0, "TS3 Client")
@@ -31,7 +31,7 @@ class TSClientQueryService(object):
 			+ "ClientQuery interface, type \"help\" for a list of commands "
 			+ "and \"help <command>\" for information on a specific command.")
 		self.insert_connect_message(2, "selected " + build_keyvalue("schandlerid", self._data.schandler_id))
-		self.set_user(_SELF_USER_NAME)
+		self.set_user(_SELF_USER_NAME, is_me=True)
 
 	def start(self):
 		if not self._server:
@@ -58,27 +58,98 @@ class TSClientQueryService(object):
 	def send_event(self, event):
 		self._data.event_queue.put(event)
 
+	def set_events_per_check(self, count):
+		'''Sets maximum number of queued events sent on each check(), by
+		default events are sent one at a time.
+		'''
+		self._data.events_per_check = count
+
+	def get_queued_event_count(self):
+		return self._data.event_queue.qsize()
+
+	def set_sent_events_recording(self, enabled):
+		'''Enables or disables recording of sent events together with time
+		when they were written to the socket, see get_sent_events().
+		'''
+		self._data.sent_events = [] if enabled else None
+
+	def get_sent_events(self):
+		'''Returns list of (timestamp, event) tuples of events sent since
+		previous call.
+		'''
+		events = self._data.sent_events or []
+		if self._data.sent_events is not None:
+			self._data.sent_events = []
+		return events
+
+	def get_registered_events(self):
+		'''Returns names of events which the connected client has registered
+		to receive.
+		'''
+		if self._server and self._server.handler:
+			return list(self._server.handler._registered_events)
+		return []
+
 	def set_connected_to_server(self, connected):
 		self._data.connected_to_server = connected
 
 	def set_user(self, name, **kwargs):
 		if name not in self._clids:
-			self._clids.append(name)
-		clid = str(self._clids.index(name))
+			self._clids[name] = str(len(self._clids))
+		clid = self._clids[name]
 		if clid not in self._data.users:
 			self._data.users[clid] = User(service=self, name=name, clid=clid)
-		if "schandlerid" not in kwargs:
-			kwargs["schandlerid"] = self._data.schandler_id
+			if "schandlerid" not in kwargs:
+				kwargs["schandlerid"] = self._data.schandler_id
 		self._data.users[clid].set(**kwargs)
 
+	def get_server_connections(self):
+		'''Returns sorted list of server connection IDs which the client is
+		connected to.
+		'''
+		return sorted(set(int(user.schandlerid) for user in self._data.users.itervalues() if user.is_me))
+
+	def add_server_connection(self, schandlerid):
+		'''Adds another server connection, with own user of the client in
+		it.
+		'''
+		if int(schandlerid) in self.get_server_connections():
+			return
+		self.set_user("{0}#{1}".format(_SELF_USER_NAME, schandlerid), schandlerid=schandlerid, is_me=True)
+
+	def enter_user(self, name, **kwargs):
+		'''Adds a new user and notifies that it entered view.'''
+		assert name not in self._clids or self._clids[name] not in self._data.users, "User already exists"
+		self.set_user(name, notify=False, **kwargs)
+		user = self.get_user(name=name)
+		self.send_event(" ".join([
+			"notifycliententerview",
+			build_keyvalue("schandlerid", user.schandlerid),
+			build_keyvalue("reasonid", 0),
+			build_keyvalue("ctid", user.cid),
+			build_keyvalue("clid", user.clid),
+			build_keyvalue("client_unique_identifier", user.cluid),
+			build_keyvalue("client_nickname", user.name),
+			build_keyvalue("client_meta_data", user.metadata),
+			build_keyvalue("client_type", 0)
+		]))
+
+	def remove_user(self, name):
+		'''Removes a user and notifies that it left view.'''
+		user = self.get_user(name=name)
+		del self._data.users[user.clid]
+		self.send_event(" ".join([
+			"notifyclientleftview",
+			build_keyvalue("schandlerid", user.schandlerid),
+			build_keyvalue("reasonid", 8),
+			build_keyvalue("clid", user.clid)
+		]))
+
 	def get_user(self, name=None, clid=None):
 		if clid is not None:
 			return self._data.users[str(clid)]
 		elif name is not None:
-			for user_clid in self._data.users:
-				user = self._data.users[user_clid]
-				if user.name == name:
-					return user
+			return self._data.users.get(self._clids.get(name))
 		else:
 			raise RuntimeError("Parameter missing")
 
@@ -93,8 +164,17 @@ class User(object):
 		self._schandlerid = "1"
 		self._metadata = ""
 		self._speaking = False
+		self._is_me = False
+		self._notify = True
+
+	def set(self, notify=True, **kwargs):
+		self._notify = notify
+		try:
+			self.__set(**kwargs)
+		finally:
+			self._notify = True
 
-	def set(self, **kwargs):
+	def __set(self, **kwargs):
 		if "cid" in kwargs:
 			self.cid = str(kwargs["cid"])
 		if "cluid" in kwargs:
@@ -105,6 +185,8 @@ class User(object):
 			self.metadata = str(kwargs["metadata"])
 		if "speaking" in kwargs:
 			self.speaking = kwargs["speaking"]
+		if "is_me" in kwargs:
+			self._is_me = kwargs["is_me"]
 
 	@property
 	def name(self):
@@ -114,11 +196,23 @@ class User(object):
 	def clid(self):
 		return self._clid
 
+	@property
+	def is_me(self):
+		return self._is_me
+
 	@property
 	def cid(self):
 		return self._cid
 	@cid.setter
 	def cid(self, value):
+		if self._notify and self._cid != value:
+			self._service.send_event(" ".join([
+				"notifyclientmoved",
+				build_keyvalue("schandlerid", self._schandlerid),
+				build_keyvalue("ctid", value),
+				build_keyvalue("reasonid", 0),
+				build_keyvalue("clid", self._clid)
+			]))
 		self._cid = value
 
 	@property
@@ -140,7 +234,7 @@ class User(object):
 		return self._metadata
 	@metadata.setter
 	def metadata(self, value):
-		if self._metadata is not None and self._metadata != value:
+		if self._notify and self._metadata is not None and self._metadata != value:
 			self._service.send_event(" ".join([
 				"notifyclientupdated",
 				build_keyvalue("schandlerid", self._schandlerid),
@@ -154,7 +248,7 @@ class User(object):
 		return self._speaking
 	@speaking.setter
 	def speaking(self, value):
-		if self._speaking is not None and self._speaking != value:
+		if self._notify and self._speaking is not None and self._speaking != value:
 			self._service.send_event(" ".join([
 				"notifytalkstatuschange",
 				build_keyvalue("schandlerid", self._schandlerid),
@@ -182,6 +276,8 @@ class Data(object):
 		self.connected_to_server = False
 		self.users = {}
 		self.schandler_id = int(random.uniform(1, 10))
+		self.events_per_check = 1
+		self.sent_events = None
 
 class TSClientQueryServer(asyncore.dispatcher):
 	def __init__(self, host, port, sock_map, data_source):
@@ -296,16 +392,25 @@ class TSClientQueryHandler(asynchat.async_chat):
 		]))
 
 	def handle_command_clientvariable(self, clid, **requested_vars):
-		user = self._data_source.users[clid]
-		args = [build_keyvalue("clid", clid)]
-		if "client_meta_data" in requested_vars:
-			args.append(build_keyvalue("client_meta_data", user.metadata))
-		self.push(" ".join(args) + "\n\r")
+		# multiple clients can be requested at once: clid=1|clid=2 client_meta_data
+		clids = clid.split("|clid=")
+		if any(clid not in self._data_source.users for clid in clids):
+			return 512, "invalid clientID"
+		entries = []
+		for clid in clids:
+			user = self._data_source.users[clid]
+			args = [build_keyvalue("clid", clid)]
+			if "client_meta_data" in requested_vars:
+				args.append(build_keyvalue("client_meta_data", user.metadata))
+			entries.append(" ".join(args))
+		self.push("|".join(entries) + "\n\r")
 
 	def handle_command_clientlist(self, options=[]):
 		entries = []
 		for clid in self._data_source.users:
 			user = self._data_source.users[clid]
+			if user.schandlerid != str(self._data_source.schandler_id):
+				continue
 			args = [
 				build_keyvalue("clid", user.clid),
 				build_keyvalue("cid", user.cid),
@@ -339,17 +444,21 @@ class TSClientQueryHandler(asynchat.async_chat):
 		self.push("|".join([build_keyvalue("schandlerid", id) for id in schandlerids]) + "\n\r")
 
 	def get_my_user(self):
-		for clid in self._data_source.users:
-			user = self._data_source.users[clid]
-			if user.name == _SELF_USER_NAME:
+		my_users = [user for user in self._data_source.users.itervalues() if user.is_me]
+		for user in my_users:
+			if user.schandlerid == str(self._data_source.schandler_id):
 				return user
+		return my_users[0]
 
 	def tick(self):
-		try:
-			event = self._data_source.event_queue.get(block=False)
+		for index in range(self._data_source.events_per_check):
+			try:
+				event = self._data_source.event_queue.get(block=False)
+			except Empty:
+				return
 			if event.split(None, 1)[0] in self._registered_events:
 				self.push(event + "\n\r")
+				if self._data_source.sent_events is not None:
+					self._data_source.sent_events.append((time.time(), event))
 			else:
 				self._data_source.event_queue.put(event)
-		except Empty:
-			pass
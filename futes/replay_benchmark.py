@@ -0,0 +1,323 @@
+from helpers.testcasebase import TestCaseBase
+from helpers.utils import *
+from helpers.load_generator import LoadGenerator
+import mock
+import nosepipe
+import sys
+import os
+import re
+import json
+import time
+import random
+import platform
+import imp
+from functools import partial
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+RESULTS_FILEPATH = os.environ.get("BENCHMARK_RESULTS", os.path.join(os.getcwd(), "benchmark_results.json"))
+REPLAY_TRAFFIC_FILEPATH = os.environ.get("REPLAY_TRAFFIC_FILE")
+
+SCRIPT_DIRPATH = os.path.dirname(os.path.realpath(__file__))
+BENCHMARK_HELPERS_PATH = os.path.join(SCRIPT_DIRPATH, "..", "tessumod", "benchmark", "helpers.py")
+
+def get_peak_memory():
+	'''Returns peak resident memory of the process in kilobytes, or None if
+	not available on current platform.
+	'''
+	if resource is None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# reported in bytes on Mac, in kilobytes on Linux
+	return peak / 1024 if sys.platform == "darwin" else peak
+
+def record_result(name, **values):
+	'''Prints results of a benchmark and appends them as a JSON object to
+	RESULTS_FILEPATH.
+	'''
+	result = dict(values, benchmark=name, time=time.time(), python=platform.python_version(),
+		platform=platform.platform(), peak_memory_kb=get_peak_memory())
+	print
+	for key in sorted(values):
+		print "{0:<40} {1:>16}".format(name + " " + key, "{0:.3f}".format(values[key]) if isinstance(values[key], float) else values[key])
+	with open(RESULTS_FILEPATH, "a") as file:
+		file.write(json.dumps(result, sort_keys=True) + "\n")
+
+def median(values):
+	return percentile(values, 50)
+
+def percentile(values, percent):
+	values = sorted(values)
+	return values[min(len(values) * percent / 100, len(values) - 1)]
+
+def match_latencies(sent, received):
+	'''Pairs sent and received events which have the same key, in order.
+	Both are lists of (timestamp, key) tuples. Returns latencies of matched
+	events.
+	'''
+	sent_times = {}
+	for timestamp, key in sorted(sent):
+		sent_times.setdefault(key, []).append(timestamp)
+	latencies = []
+	for timestamp, key in sorted(received):
+		if sent_times.get(key):
+			latencies.append(timestamp - sent_times[key].pop(0))
+	return latencies
+
+@nosepipe.isolate
+class ReplayBenchmark(TestCaseBase):
+	'''
+	This benchmark suite replays ClientQuery sessions through the whole mod,
+	from mod_tessumod.init() down to fake game objects, and measures how fast
+	the mod handles them. Only time spent in game's tick (where the mod does
+	its work) counts as the mod's time and CPU time. Each benchmark runs in
+	its own process, so that reported peak memory (which includes the
+	emulated TeamSpeak client) is per benchmark.
+
+	Results are printed and appended as JSON objects, one per line, to file
+	given in BENCHMARK_RESULTS environment variable, by default
+	benchmark_results.json in current directory.
+
+	To execute, use command:
+		$ nosetests --with-process-isolation -s replay_benchmark.py
+
+	test_load_latency runs a synthetic load of thousands of users on several
+	server connections (see LoadGenerator) for LOAD_SECS seconds and measures
+	latency from the moment each talk status event is sent by the emulated
+	TeamSpeak client to the moment the mod has processed it.
+
+	By default test_replay_traffic replays synthetic traffic. To replay
+	recorded traffic instead (either bare ClientQuery lines or python.log with
+	debug logging enabled), use command:
+		$ REPLAY_TRAFFIC_FILE=python.log nosetests --with-process-isolation -s replay_benchmark.py:ReplayBenchmark.test_replay_traffic
+	'''
+
+	USER_COUNT = 200
+	TALK_EVENT_COUNT = 5000
+	MOVE_EVENT_COUNT = 2000
+	INDICATOR_SAMPLE_COUNT = 50
+	EVENTS_PER_CHECK = 50
+	TIMEOUT = 120
+	LOAD_USER_COUNT = 2000
+	LOAD_SERVER_COUNT = 2
+	LOAD_PLAYER_COUNT = 30
+	LOAD_RATES = {"talk": 50.0}
+	LOAD_SECS = 20
+
+	def setUp(self):
+		TestCaseBase.setUp(self)
+		self.change_mod_settings(
+			General = {
+				"log_level": "1" # logging of each received line would dominate results
+			}
+		)
+		from messenger.proto.events import g_messengerEvents
+		from gui.battle_control import g_sessionProvider
+		g_messengerEvents.voip.onPlayerSpeaking = mock.Mock(side_effect=self.__on_player_speaking)
+		g_sessionProvider.shared.feedback.onMinimapFeedbackReceived = mock.Mock()
+		self.__names = ["Player{0}".format(index) for index in range(self.USER_COUNT)]
+		self.__speaking_players = {}
+		self.__event_counts = {}
+		self.__tick_secs = 0
+		self.__tick_cpu_secs = 0
+
+	def __on_player_speaking(self, player_id, speaking):
+		self.__speaking_players[player_id] = (speaking, time.time())
+
+	def __get_chatclient(self):
+		return sys.modules["tessumod.infrastructure.di"].get_provided("chatclient")
+
+	def __get_user_count(self):
+		return len(list(self.__get_chatclient().get_users()))
+
+	def __count_events(self, *events):
+		cq = self.__get_chatclient().get_clientquery()
+		for event in events:
+			self.__event_counts[event] = 0
+			cq.on(event, partial(self.__increment_event_count, event))
+
+	def __increment_event_count(self, event, *args, **kwargs):
+		self.__event_counts[event] += 1
+
+	def __count_notify_lines(self):
+		self.__event_counts["notify"] = 0
+		# notify lines are consumed by a handler of priority 1
+		self.__get_chatclient().get_clientquery().on("line-received", self.__on_line_received, priority=2)
+
+	def __on_line_received(self, line, parsed=None):
+		if line.startswith("notify"):
+			self.__event_counts["notify"] += 1
+
+	def __get_event_count(self):
+		return sum(self.__event_counts.itervalues())
+
+	def __start(self):
+		self.start_ts_client(connected_to_server=True, users={
+			name: {"metadata": "<wot_nickname_start>{0}<wot_nickname_end>".format(name)} for name in self.__names
+		})
+		self.ts_client_query_server.set_events_per_check(self.EVENTS_PER_CHECK)
+		self.start_game(mode="battle", players=[{"name": name} for name in self.__names])
+
+	def __run_until(self, condition):
+		'''Runs emulated TeamSpeak client and game's tick until "condition"
+		returns True. Returns wall time which it took.
+		'''
+		import BigWorld
+		start_time = time.time()
+		while not condition():
+			self.ts_client_query_server.check()
+			tick_start_time = time.time()
+			tick_start_cpu = time.clock()
+			BigWorld.tick()
+			self.__tick_secs += time.time() - tick_start_time
+			self.__tick_cpu_secs += time.clock() - tick_start_cpu
+			self.assertLess(time.time(), start_time + self.TIMEOUT, "Execution took too long")
+		return time.time() - start_time
+
+	def __reset_tick_times(self):
+		self.__tick_secs = 0
+		self.__tick_cpu_secs = 0
+
+	def __join(self):
+		'''Waits until the mod knows all users (and self).'''
+		return self.__run_until(lambda: self.__get_user_count() == self.USER_COUNT + 1)
+
+	def __record_event_results(self, name, count, **values):
+		record_result(name,
+			events=count,
+			events_per_sec=count / self.__tick_secs,
+			cpu_per_event_us=self.__tick_cpu_secs / count * 1e6,
+			**values
+		)
+
+	def test_join_crowded_server(self):
+		self.__start()
+		secs = self.__join()
+		record_result("join", users=self.USER_COUNT, join_secs=secs, tick_secs=self.__tick_secs,
+			tick_cpu_secs=self.__tick_cpu_secs)
+
+	def test_talk_storm(self):
+		self.__start()
+		self.__join()
+		self.__count_events("user-changed-talking")
+		self.__reset_tick_times()
+		for index in range(self.TALK_EVENT_COUNT):
+			name = self.__names[index % self.USER_COUNT]
+			self.ts_client_query_server.set_user(name, speaking=(index / self.USER_COUNT) % 2 == 0)
+		self.__run_until(lambda: self.__get_event_count() == self.TALK_EVENT_COUNT)
+		self.__record_event_results("talk-storm", self.TALK_EVENT_COUNT)
+
+	def test_channel_switches(self):
+		self.__start()
+		self.__join()
+		self.__count_events("user-changed-my-channel")
+		self.__reset_tick_times()
+		for index in range(self.MOVE_EVENT_COUNT):
+			name = self.__names[index % self.USER_COUNT]
+			self.ts_client_query_server.set_user(name, cid=2 if (index / self.USER_COUNT) % 2 == 0 else 1)
+		self.__run_until(lambda: self.__get_event_count() == self.MOVE_EVENT_COUNT)
+		self.__record_event_results("channel-switches", self.MOVE_EVENT_COUNT)
+
+	def test_time_to_first_indicator(self):
+		self.__start()
+		self.__join()
+		latencies = []
+		rnd = random.Random(0)
+		for index in range(self.INDICATOR_SAMPLE_COUNT):
+			name = rnd.choice(self.__names)
+			player_id = self.get_player_id(name)
+			send_time = time.time()
+			self.ts_client_query_server.set_user(name, speaking=True)
+			self.__run_until(lambda: self.__speaking_players.get(player_id, (False,))[0])
+			latencies.append(self.__speaking_players[player_id][1] - send_time)
+			self.ts_client_query_server.set_user(name, speaking=False)
+			self.__run_until(lambda: not self.__speaking_players[player_id][0])
+		record_result("time-to-first-indicator",
+			samples=len(latencies),
+			median_ms=median(latencies) * 1000,
+			max_ms=max(latencies) * 1000
+		)
+
+	def test_load_latency(self):
+		self.start_ts_client(connected_to_server=True)
+		service = self.ts_client_query_server
+		generator = LoadGenerator(service, user_count=self.LOAD_USER_COUNT, server_count=self.LOAD_SERVER_COUNT,
+			rates=self.LOAD_RATES, protected_count=self.LOAD_PLAYER_COUNT)
+		generator.populate()
+		service.set_events_per_check(self.EVENTS_PER_CHECK)
+		# the most active talkers are in the battle
+		self.start_game(mode="battle", players=[{"name": name} for name in generator.get_user_names()[:self.LOAD_PLAYER_COUNT]])
+		self.__run_until(lambda: self.__get_user_count() == self.LOAD_USER_COUNT + self.LOAD_SERVER_COUNT)
+		received = []
+		def on_user_changed_talking(schandlerid, clid, old_value, new_value):
+			received.append((time.time(), (schandlerid, clid, new_value)))
+		self.__get_chatclient().get_clientquery().on("user-changed-talking", on_user_changed_talking)
+		self.__count_notify_lines()
+		service.set_sent_events_recording(True)
+		self.__reset_tick_times()
+		end_time = time.time() + self.LOAD_SECS
+		def generate():
+			now = time.time()
+			generator.run(now)
+			return now >= end_time
+		wall_secs = self.__run_until(generate)
+		# let the mod catch up with events which were generated but not yet handled
+		sent_events = []
+		def drain():
+			sent_events.extend(service.get_sent_events())
+			return service.get_queued_event_count() == 0 and self.__get_event_count() == len(sent_events)
+		wall_secs += self.__run_until(drain)
+		sent_talks = []
+		for timestamp, event in sent_events:
+			if event.startswith("notifytalkstatuschange"):
+				args = dict(arg.split("=", 1) for arg in event.split()[1:])
+				sent_talks.append((timestamp, (int(args["schandlerid"]), int(args["clid"]), args["status"] == "1")))
+		latencies = match_latencies(sent_talks, received)
+		self.assertEqual(len(latencies), len(sent_talks))
+		record_result("load-latency",
+			users=self.LOAD_USER_COUNT,
+			servers=self.LOAD_SERVER_COUNT,
+			events=len(sent_events),
+			events_per_sec=len(sent_events) / wall_secs,
+			cpu_per_event_us=self.__tick_cpu_secs / len(sent_events) * 1e6,
+			busy_fraction=self.__tick_secs / wall_secs,
+			talk_events=len(latencies),
+			p50_ms=percentile(latencies, 50) * 1000,
+			p95_ms=percentile(latencies, 95) * 1000,
+			p99_ms=percentile(latencies, 99) * 1000,
+			max_ms=max(latencies) * 1000,
+			**dict(("generated_" + kind, count) for kind, count in generator.get_event_counts().iteritems())
+		)
+
+	def test_replay_traffic(self):
+		# named differently to not to clash with futes' helpers package
+		benchmark_helpers = imp.load_source("benchmark_helpers", BENCHMARK_HELPERS_PATH)
+		if REPLAY_TRAFFIC_FILEPATH:
+			lines = benchmark_helpers.read_recorded_traffic(REPLAY_TRAFFIC_FILEPATH)
+		else:
+			lines = benchmark_helpers.generate_clientquery_traffic(user_count=self.USER_COUNT, talk_events=self.TALK_EVENT_COUNT)
+		# only notifications are replayed, the emulated client answers commands
+		lines = [line for line in lines if line.startswith("notify")]
+		clids = sorted(set(int(clid) for line in lines for clid in re.findall(r"\bclid=(\d+)", line)))
+		self.__names = ["Player{0}".format(index) for index in range(len(clids))]
+		self.USER_COUNT = len(clids)
+		self.__start()
+		self.__join()
+		# events which the mod has not registered to would never be received
+		registered_events = self.ts_client_query_server.get_registered_events()
+		lines = [line for line in lines if line.split(None, 1)[0] in registered_events]
+		# map recorded client and server connection IDs to the emulated ones
+		clid_map = {str(clid): self.ts_client_query_server.get_user(name=name).clid for clid, name in zip(clids, self.__names)}
+		schandlerid = self.ts_client_query_server.get_user(name=self.__names[0]).schandlerid
+		self.__count_notify_lines()
+		self.__reset_tick_times()
+		for line in lines:
+			line = re.sub(r"\bclid=(\d+)", lambda match: "clid=" + clid_map[match.group(1)], line)
+			line = re.sub(r"\bschandlerid=\d+", "schandlerid=" + schandlerid, line)
+			self.ts_client_query_server.send_event(line)
+		self.__run_until(lambda: self.__get_event_count() == len(lines))
+		self.__record_event_results("replay-traffic", len(lines),
+			source=os.path.basename(REPLAY_TRAFFIC_FILEPATH) if REPLAY_TRAFFIC_FILEPATH else "synthetic")
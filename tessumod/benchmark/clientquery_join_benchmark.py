@@ -0,0 +1,91 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''Measures how long it takes after connecting to a TeamSpeak client until
+game nicknames of all users on a crowded server are known, i.e. until speak
+indicators can be paired to players.
+
+Server round trips are simulated on virtual time so the results show
+how the amount of round trips, affected by metadata batching and command
+pipelining, translates to delay on a real connection. CPU time used by the
+mod for processing the responses is measured separately.
+
+Usage:
+	python clientquery_join_benchmark.py [user_count] [rtt_ms]
+'''
+
+import sys
+import time
+import mock
+
+import helpers
+from tessumod.infrastructure import timer
+from tessumod.adapters.teamspeak import TeamSpeakClient
+
+class BenchmarkClient(TeamSpeakClient):
+
+	def __init__(self, server):
+		super(BenchmarkClient, self).__init__()
+		self.__server = server
+
+	def is_connected(self):
+		return True
+
+	def send(self, data):
+		self.__server.receive(data)
+
+def run(user_count, rtt, batch_size, command_window):
+	timer.set_eventloop(mock.Mock())
+	server = helpers.SimulatedClientQueryServer(user_count, rtt=rtt)
+	client = BenchmarkClient(server)
+	client.CLIENT_METADATA_BATCH_SIZE = batch_size
+	client.set_command_window(command_window)
+
+	paired_clids = set()
+	def on_game_nickname(schandlerid, clid, old_value, new_value):
+		if new_value:
+			paired_clids.add(clid)
+	client.on("user-changed-game-nickname", on_game_nickname)
+
+	paired_time = None
+	start_cpu = time.clock()
+	client.emit("connected")
+	while server.has_pending_deliveries():
+		for line in server.deliver_next():
+			client.emit("line-received", line)
+		if paired_time is None and len(paired_clids) == user_count:
+			paired_time = server.now
+	cpu_time = time.clock() - start_cpu
+	assert len(paired_clids) == user_count, "Not all users were paired"
+	return paired_time, cpu_time, server.command_count
+
+def main():
+	user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+	rtt = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002
+	print "Joining server with {0} users, round trip time {1:.1f} ms".format(user_count, rtt * 1000)
+	print "{0:<36} {1:>10} {2:>16} {3:>12}".format("", "commands", "time-to-paired", "mod cpu")
+	for name, batch_size, command_window in [
+		("one by one, serialized", 1, 1),
+		("one by one, pipelined", 1, 8),
+		("batched, serialized", 50, 1),
+		("batched, pipelined", 50, 8),
+	]:
+		paired_time, cpu_time, command_count = run(user_count, rtt, batch_size, command_window)
+		print "{0:<36} {1:>10} {2:>13.1f} ms {3:>9.1f} ms".format(name, command_count, paired_time * 1000, cpu_time * 1000)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,139 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''Compares ClientQuery parameter parsing speed of the original per-character
+ParamsParser state machine against clientquery.parse_arguments().
+
+Usage:
+	python clientquery_parser_benchmark.py [recorded_traffic_file]
+'''
+
+import sys
+
+import helpers
+from tessumod.infrastructure import clientquery
+
+class LineEnd(object):
+	pass
+
+class LegacyParamsParser(object):
+	'''The per-character parser which parse_arguments() replaced, kept here as
+	reference for benchmarking.
+	'''
+
+	__UNESCAPE_LOOKUP = {
+		"\\": "\\",
+		"/": "/",
+		"s": " ",
+		"p": "|",
+		"a": "\a",
+		"b": "\b",
+		"f": "\f",
+		"n": "\n",
+		"r": "\r",
+		"t": "\t",
+		"v": "\v"
+	}
+
+	def parse(self, parameter_str):
+		self.__entry = {}
+		self.__entries = []
+		self.__change_parse_state(self.__parse_key)
+		for char in parameter_str:
+			self.__char_parser(char)
+		self.__char_parser(LineEnd)
+		return self.__entries
+
+	def __parse_common(self, char):
+		if char == " ":
+			self.__entry[self.__key_name] = self.__key_value
+			self.__change_parse_state(self.__parse_key)
+			return True
+		if char == LineEnd:
+			self.__entry[self.__key_name] = self.__key_value
+			self.__entries.append(self.__entry)
+			return True
+		if char == "|":
+			self.__entry[self.__key_name] = self.__key_value
+			self.__entries.append(self.__entry)
+			self.__entry = {}
+			self.__change_parse_state(self.__parse_key)
+			return True
+		return False
+
+	def __parse_key(self, char):
+		if not self.__parse_common(char):
+			if char == "=":
+				self.__change_parse_state(self.__parse_value)
+			else:
+				self.__key_name += char
+
+	def __parse_value(self, char):
+		if not self.__parse_common(char):
+			if char == "\\" and not self.__escaping:
+				self.__escaping = True
+			elif self.__escaping:
+				self.__key_value += self.__UNESCAPE_LOOKUP[char]
+				self.__escaping = False
+			else:
+				self.__key_value += char
+
+	def __change_parse_state(self, parse_func):
+		if parse_func == self.__parse_key:
+			self.__key_name = ""
+			self.__key_value = ""
+			self.__escaping = False
+		self.__char_parser = parse_func
+
+def get_payloads(lines):
+	payloads = []
+	for line in lines:
+		if line.startswith("notify") or line.startswith("error "):
+			parts = line.split(None, 1)
+			if len(parts) == 2:
+				payloads.append(parts[1])
+		else:
+			payloads.append(line)
+	return payloads
+
+def main():
+	if len(sys.argv) > 1:
+		lines = helpers.read_recorded_traffic(sys.argv[1])
+	else:
+		lines = helpers.generate_clientquery_traffic()
+	payloads = get_payloads(lines)
+
+	for payload in payloads:
+		assert LegacyParamsParser().parse(payload) == clientquery.parse_arguments(payload), payload
+
+	def run_legacy():
+		for payload in payloads:
+			LegacyParamsParser().parse(payload)
+
+	def run_current():
+		for payload in payloads:
+			clientquery.parse_arguments(payload)
+
+	legacy_secs = helpers.measure(run_legacy)
+	current_secs = helpers.measure(run_current)
+	print "Parsed {0} lines ({1} bytes)".format(len(payloads), sum(len(p) for p in payloads))
+	helpers.print_result("ParamsParser (legacy)", legacy_secs, len(payloads))
+	helpers.print_result("parse_arguments", current_secs, len(payloads))
+	print "Speedup: {0:.1f}x".format(legacy_secs / current_secs)
+
+if __name__ == "__main__":
+	main()
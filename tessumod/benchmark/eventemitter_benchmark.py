@@ -0,0 +1,128 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''Measures event emitting throughput of EventEmitterMixin with the real
+mixin stack of ClientQuery, comparing against the original implementation
+which re-sorted listeners on registration and guarded each handler call
+separately. Registering of listeners is measured as well.
+
+Usage:
+	python eventemitter_benchmark.py [user_count] [talk_events]
+'''
+
+import sys
+import mock
+
+import helpers
+from tessumod.infrastructure import clientquery, eventemitter, log, timer
+
+class LegacyEventEmitter(object):
+	'''The emitter which current EventEmitterMixin replaced, kept here as
+	reference for benchmarking. Overrides the emitter of ClientQuery when
+	placed first in bases.
+	'''
+
+	def __init__(self):
+		self.__listeners = {}
+		super(LegacyEventEmitter, self).__init__()
+
+	def emit(self, event, *args, **kwargs):
+		if event in self.__listeners:
+			for priority, function in self.__listeners[event]:
+				try:
+					function(*args, **kwargs)
+				except StopIteration:
+					return
+				except Exception:
+					log.LOG_CURRENT_EXCEPTION()
+
+	def on(self, event, function, priority=0):
+		assert callable(function)
+		if event not in self.__listeners:
+			self.__listeners[event] = []
+		self.__listeners[event].append((priority, function))
+		self.__listeners[event].sort(reverse=True, key=lambda listener: listener[0])
+		return self
+
+class BenchmarkClient(clientquery.ClientQuery):
+
+	def set_server(self, server):
+		self.__server = server
+
+	def is_connected(self):
+		return True
+
+	def send(self, data):
+		self.__server.receive(data)
+
+class LegacyBenchmarkClient(LegacyEventEmitter, BenchmarkClient):
+	pass
+
+def create_joined_client(client_cls, user_count):
+	server = helpers.SimulatedClientQueryServer(user_count, rtt=0)
+	client = client_cls()
+	client.set_server(server)
+	# listeners similar to those which the chat client adapter registers
+	for key in ("client-nickname", "client-meta-data", "talking", "my-channel"):
+		client.on("user-changed-" + key, lambda **kwargs: None)
+	client.emit("connected")
+	while server.has_pending_deliveries():
+		for line in server.deliver_next():
+			client.emit("line-received", line)
+	return client
+
+def get_talk_lines(user_count, talk_events):
+	lines = helpers.generate_clientquery_traffic(user_count=user_count, talk_events=talk_events)
+	return [line for line in lines if line.startswith("notify")]
+
+def register_listeners(emitter_cls, count):
+	emitter = emitter_cls()
+	for index in xrange(count):
+		emitter.on("user-changed-talking", lambda **kwargs: None, priority=index % 3)
+	emitter.emit("user-changed-talking", schandlerid=1, clid=1, old_value=False, new_value=True)
+
+def main():
+	user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+	talk_events = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+	timer.set_eventloop(mock.Mock())
+	lines = get_talk_lines(user_count, talk_events)
+	print "Emitting {0} notification lines to ClientQuery with {1} users".format(len(lines), user_count)
+
+	results = {}
+	for name, client_cls in [("legacy", LegacyBenchmarkClient), ("current", BenchmarkClient)]:
+		client = create_joined_client(client_cls, user_count)
+		def run_lines():
+			for line in lines:
+				client.emit("line-received", line)
+		def run_unhandled():
+			for index in xrange(len(lines)):
+				client.emit("user-changed-client-input-muted", schandlerid=1, clid=1, old_value=0, new_value=1)
+		results[name] = helpers.measure(run_lines, repeat=20), helpers.measure(run_unhandled, repeat=20)
+		helpers.print_result("line-received ({0})".format(name), results[name][0], len(lines), unit="emits")
+		helpers.print_result("event without listeners ({0})".format(name), results[name][1], len(lines), unit="emits")
+
+	for name, emitter_cls in [("legacy", LegacyEventEmitter), ("current", eventemitter.EventEmitterMixin)]:
+		secs = helpers.measure(lambda: register_listeners(emitter_cls, 1000))
+		results[name] += (secs,)
+		helpers.print_result("register 1000 listeners ({0})".format(name), secs, 1000, unit="listeners")
+
+	print "Speedup, line-received: {0:.1f}x".format(results["legacy"][0] / results["current"][0])
+	print "Speedup, without listeners: {0:.1f}x".format(results["legacy"][1] / results["current"][1])
+	print "Speedup, registering: {0:.1f}x".format(results["legacy"][2] / results["current"][2])
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,176 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import sys
+import os
+import random
+import timeit
+
+script_dirpath = os.path.dirname(os.path.realpath(__file__))
+project_rootpath = os.path.realpath(os.path.join(script_dirpath, "..", ".."))
+
+sys.path.extend([
+	os.path.realpath(os.path.join(project_rootpath, "futes", "fakes")),
+	os.path.realpath(os.path.join(project_rootpath, "tessumod", "src", "scripts", "client", "gui", "mods"))
+])
+
+from tessumod.infrastructure import clientquery
+
+def escape(value):
+	return (value.replace("\\", "\\\\").replace("/", "\\/").replace(" ", "\\s")
+		.replace("|", "\\p"))
+
+def read_recorded_traffic(filepath):
+	'''Reads ClientQuery lines from a file. Lines can be either bare protocol
+	lines or lines copied from python.log with debug logging enabled, in which
+	case only "recv:" lines are used.
+	'''
+	lines = []
+	with open(filepath, "r") as file:
+		for line in file:
+			line = line.rstrip("\r\n")
+			if "recv: " in line:
+				line = line.split("recv: ", 1)[1]
+			if line:
+				lines.append(line)
+	return lines
+
+def generate_clientquery_traffic(user_count=200, talk_events=1000, seed=0):
+	'''Generates ClientQuery lines which resemble traffic received from a
+	TeamSpeak client connected to a busy server: a "clientlist -uid" response,
+	metadata responses and a storm of talk status and client update
+	notifications.
+	'''
+	rnd = random.Random(seed)
+	lines = []
+	clients = []
+	for clid in range(1, user_count + 1):
+		clients.append(" ".join([
+			"clid=%d" % clid,
+			"cid=%d" % rnd.randint(1, 20),
+			"client_database_id=%d" % (clid + 1000),
+			"client_nickname=%s" % escape("Player %d [CLAN]" % clid),
+			"client_type=0",
+			"client_unique_identifier=%s" % escape("uid%08x/+=" % rnd.getrandbits(32))
+		]))
+	lines.append("|".join(clients))
+	lines.append("error id=0 msg=ok")
+	for clid in range(1, user_count + 1):
+		lines.append("clid=%d client_meta_data=%s" % (clid,
+			escape("<wot_nickname_start>Player_%d<wot_nickname_end>" % clid)))
+		lines.append("error id=0 msg=ok")
+	for index in range(talk_events):
+		clid = rnd.randint(1, user_count)
+		if index % 10 == 0:
+			lines.append("notifyclientupdated schandlerid=1 clid=%d client_input_muted=%d" % (clid, rnd.randint(0, 1)))
+		else:
+			lines.append("notifytalkstatuschange schandlerid=1 status=%d isreceivedwhisper=0 clid=%d" % (rnd.randint(0, 1), clid))
+	return lines
+
+def measure(function, repeat=5, number=1):
+	'''Returns best wall time (in seconds) of calling "function" "number" times.'''
+	return min(timeit.repeat(function, repeat=repeat, number=number))
+
+def print_result(name, secs, count, unit="lines"):
+	print "{0:<40} {1:>10.2f} ms {2:>12.0f} {3}/s".format(name, secs * 1000, count / secs, unit)
+
+class SimulatedClientQueryServer(object):
+	'''Answers ClientQuery commands of a TeamSpeak client connected to a server
+	with "user_count" users. Runs on virtual time: each response is delivered
+	"rtt" seconds after its command was sent, or later if the server is still
+	busy answering previous commands (each takes "command_cost" seconds).
+	'''
+
+	def __init__(self, user_count, rtt=0.002, command_cost=0.0001, schandlerid=1):
+		self.now = 0.0
+		self.__rtt = rtt
+		self.__command_cost = command_cost
+		self.__busy_until = 0.0
+		self.__deliveries = []
+		self.__sequence = 0
+		self.schandlerid = schandlerid
+		self.my_clid = 1
+		self.users = {}
+		for clid in range(1, user_count + 1):
+			self.users[clid] = {
+				"cid": 1,
+				"client_nickname": "Player %d [CLAN]" % clid,
+				"client_unique_identifier": "uid%08d=" % clid,
+				"client_meta_data": "<wot_nickname_start>Player_%d<wot_nickname_end>" % clid
+			}
+		self.command_count = 0
+
+	def receive(self, data):
+		'''Called with data the client writes to its socket.'''
+		for command_line in data.split("\n\r"):
+			command_line = command_line.strip()
+			if command_line:
+				self.command_count += 1
+				self.__execute(command_line)
+
+	def has_pending_deliveries(self):
+		return bool(self.__deliveries)
+
+	def deliver_next(self):
+		'''Advances virtual time to next pending response and returns its lines.'''
+		self.__deliveries.sort()
+		time, sequence, lines = self.__deliveries.pop(0)
+		self.now = time
+		return lines
+
+	def __execute(self, command_line):
+		name, _, params = command_line.partition(" ")
+		args = clientquery.parse_arguments(params) if params else [{}]
+		handler = getattr(self, "_handle_" + name, None)
+		lines = handler(args) if handler else []
+		if lines is None:
+			lines = []
+		if not lines or not lines[-1].startswith("error "):
+			lines.append("error id=0 msg=ok")
+		self.__busy_until = max(self.now + self.__rtt / 2, self.__busy_until) + self.__command_cost
+		self.__sequence += 1
+		self.__deliveries.append((self.__busy_until + self.__rtt / 2, self.__sequence, lines))
+
+	def __user_entry(self, clid, *keys):
+		user = self.users[clid]
+		return " ".join(["clid=%d" % clid] + ["%s=%s" % (key, escape(str(user[key]))) for key in keys])
+
+	def _handle_use(self, args):
+		self.schandlerid = int(args[0]["schandlerid"])
+		return ["selected schandlerid=%d" % self.schandlerid]
+
+	def _handle_currentschandlerid(self, args):
+		return ["schandlerid=%d" % self.schandlerid]
+
+	def _handle_serverconnectionhandlerlist(self, args):
+		return ["schandlerid=%d" % self.schandlerid]
+
+	def _handle_whoami(self, args):
+		return ["clid=%d cid=%d" % (self.my_clid, self.users[self.my_clid]["cid"])]
+
+	def _handle_servervariable(self, args):
+		return ["virtualserver_name=Benchmark\\sServer"]
+
+	def _handle_clientlist(self, args):
+		return ["|".join(self.__user_entry(clid, "cid", "client_nickname", "client_unique_identifier")
+			for clid in sorted(self.users))]
+
+	def _handle_clientvariable(self, args):
+		clids = [int(entry["clid"]) for entry in args]
+		if any(clid not in self.users for clid in clids):
+			return ["error id=512 msg=invalid\\sclientID"]
+		return ["|".join(self.__user_entry(clid, "client_meta_data") for clid in clids)]
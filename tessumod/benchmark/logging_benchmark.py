@@ -0,0 +1,89 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+'''Measures per line cost of debug logging in ClientQuery's line handling
+when log level is NOTE, comparing the original eager formatting of every
+received line against the level-checked logging.
+
+Usage:
+	python logging_benchmark.py [user_count] [talk_events]
+'''
+
+import sys
+import mock
+
+import helpers
+from tessumod.infrastructure import clientquery, eventemitter, log, timer
+
+class BenchmarkLogger(object):
+	'''Filters messages by log level as the game's logger does, logged
+	messages are discarded.
+	'''
+
+	@staticmethod
+	def debug(msg, *args):
+		if log.CURRENT_LOG_LEVEL <= log.LOG_LEVEL.DEBUG:
+			log.prefix_with_timestamp(msg)
+
+	note = warning = error = debug
+
+	@staticmethod
+	def exception():
+		pass
+
+class LineReceiver(clientquery.ClientQueryConnectionMixin, eventemitter.EventEmitterMixin, timer.TimerMixin):
+
+	def receive_lines(self, lines):
+		handler = self._ClientQueryConnectionMixin__on_protocol_line_received
+		for line in lines:
+			handler(line)
+
+class LegacyLineReceiver(LineReceiver):
+	'''Logs received lines as ClientQueryConnectionMixin did originally, kept
+	here as reference for benchmarking.
+	'''
+
+	def receive_lines(self, lines):
+		handler = self.__on_protocol_line_received
+		for line in lines:
+			handler(line)
+
+	def __on_protocol_line_received(self, line, parsed=None):
+		log.LOG_DEBUG("recv: {0}".format(line))
+		self.emit("line-received", line, parsed)
+
+def main():
+	user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+	talk_events = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+	timer.set_eventloop(mock.Mock())
+	log.install_logger_impl(BenchmarkLogger)
+	log.set_level(log.LOG_LEVEL.NOTE)
+	lines = helpers.generate_clientquery_traffic(user_count=user_count, talk_events=talk_events)
+	print "Receiving {0} lines with log level NOTE".format(len(lines))
+
+	results = {}
+	for name, receiver_cls in [("legacy", LegacyLineReceiver), ("current", LineReceiver)]:
+		receiver = receiver_cls()
+		results[name] = helpers.measure(lambda: receiver.receive_lines(lines), repeat=50)
+		helpers.print_result("line-received ({0})".format(name), results[name], len(lines))
+
+	print "Logging cost per line, legacy: {0:.0f} ns".format((results["legacy"] - results["current"]) / len(lines) * 1e9)
+	print "Speedup: {0:.1f}x".format(results["legacy"] / results["current"])
+
+if __name__ == "__main__":
+	main()
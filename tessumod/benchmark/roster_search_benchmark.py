@@ -0,0 +1,91 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''Compares finding WoT player names embedded in TeamSpeak nicknames with
+the previous loop, which returned first player name found from the nickname,
+with roster.find_longest_name(), which tests each name but picks the longest,
+and with roster.NameMatcher, which finds all names in a single pass over the
+nickname. Roster uses NameMatcher from Roster.NAME_MATCHER_MIN_NAMES players
+on.
+
+Usage:
+	python roster_search_benchmark.py [nickname_count]
+'''
+
+import sys
+import random
+
+import helpers
+from tessumod.roster import NameMatcher, find_longest_name
+
+def generate_names(count, rnd):
+	names = set()
+	while len(names) < count:
+		length = rnd.randint(4, 16)
+		names.add("".join(rnd.choice("abcdefghijklmnopqrstuvwxyz0123456789_") for i in range(length)))
+	return sorted(names)
+
+def generate_nicknames(names, count, rnd):
+	nicknames = []
+	for index in range(count):
+		if index % 2:
+			# nickname which doesn't contain any player name
+			nicknames.append("[clan] somebody %d" % index)
+		else:
+			nicknames.append("[clan] %s (matti)" % rnd.choice(names))
+	return nicknames
+
+def find_with_loop(names, nickname):
+	for name in names:
+		if name in nickname:
+			return name
+
+def main():
+	nickname_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	rnd = random.Random(0)
+	for roster_size in [30, 100, 1000]:
+		names = generate_names(roster_size, rnd)
+		nicknames = generate_nicknames(names, nickname_count, rnd)
+		matcher = NameMatcher(names)
+		for nickname in nicknames:
+			assert find_longest_name(names, nickname) == matcher.find_longest(nickname)
+
+		def run_loop():
+			for nickname in nicknames:
+				find_with_loop(names, nickname)
+
+		def run_longest_loop():
+			for nickname in nicknames:
+				find_longest_name(names, nickname)
+
+		def run_matcher():
+			for nickname in nicknames:
+				matcher.find_longest(nickname)
+
+		loop_secs = helpers.measure(run_loop)
+		longest_loop_secs = helpers.measure(run_longest_loop)
+		matcher_secs = helpers.measure(run_matcher)
+		build_secs = helpers.measure(lambda: NameMatcher(names))
+		print "Roster of {0} players, {1} nicknames".format(roster_size, nickname_count)
+		helpers.print_result("  loop over names", loop_secs, nickname_count, unit="nicknames")
+		helpers.print_result("  find_longest_name", longest_loop_secs, nickname_count, unit="nicknames")
+		helpers.print_result("  NameMatcher", matcher_secs, nickname_count, unit="nicknames")
+		print "  NameMatcher build: {0:.2f} ms, speedup over find_longest_name: {1:.1f}x".format(
+			build_secs * 1000, longest_loop_secs / matcher_secs)
+
+if __name__ == "__main__":
+	main()
@@ -15,15 +15,22 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
-from tessumod.infrastructure import gameapi, log, timer, di
+import time
+
+from tessumod.infrastructure import gameapi, log, timer, di, metrics, tracing
 from tessumod.adapters.settings import SettingsAdapter
 from tessumod.adapters.wotgame import (MinimapAdapter, ChatIndicatorAdapter, NotificationsAdapter, BattleAdapter,
 	PlayerAdapter, EnvironmentAdapter)
 from tessumod.adapters.usercache import UserCacheAdapter
 from tessumod.adapters.teamspeak import TeamSpeakChatClientAdapter
 from tessumod.adapters.datastorage import DataStorageAdapter
+from tessumod.adapters.metrics import MetricsAdapter
+from tessumod.adapters.tracing import TracingAdapter
+from tessumod.adapters.profiler import ProfilerAdapter
+from tessumod.pairingcache import PairingCache
+from tessumod.speakstate import SpeakStateDebouncer
 from tessumod.interactors import (Initialize, LoadSettings, CacheChatUser, PairChatUserToPlayer,
-	UpdateChatUserSpeakState, RemoveChatUser, ClearSpeakStatuses, NotifyChatClientDisconnected,
+	PairChatUsersToPlayers, UpdateChatUserSpeakState, RemoveChatUser, ClearSpeakStatuses, NotifyChatClientDisconnected,
 	ShowChatClientPluginInstallMessage, InstallChatClientPlugin, IgnoreChatClientPluginInstallMessage,
 	ShowChatClientPluginInfoUrl, NotifyConnectedToChatServer, PublishGameNickToChatServer, ShowCacheErrorMessage,
 	EnablePositionalDataToChatClient, ProvidePositionalDataToChatClient, BattleReplayStart,
@@ -41,6 +48,7 @@ def init():
 			"load-settings": LoadSettings,
 			"cache-chatuser": CacheChatUser,
 			"pair-chatuser-to-player": PairChatUserToPlayer,
+			"pair-chatusers-to-players": PairChatUsersToPlayers,
 			"update-chatuser-speakstate": UpdateChatUserSpeakState,
 			"remove-chatuser": RemoveChatUser,
 			"clear-speakstatuses": ClearSpeakStatuses,
@@ -71,8 +79,13 @@ def init():
 		di.provide("datastorage",   DataStorageAdapter())
 		di.provide("notifications", NotificationsAdapter(app))
 		di.provide("battle",        BattleAdapter(app))
-		di.provide("players",       PlayerAdapter())
+		di.provide("players",       PlayerAdapter(app))
 		di.provide("environment",   EnvironmentAdapter())
+		di.provide("pairingcache",  PairingCache())
+		di.provide("speakstate",    SpeakStateDebouncer())
+		di.provide("metrics",       MetricsAdapter())
+		di.provide("tracing",       TracingAdapter())
+		di.provide("profiler",      ProfilerAdapter())
 
 		try:
 			from tessumod import build_info
@@ -87,5 +100,15 @@ def init():
 
 def create_executable(cls):
 	def execute(*args, **kwargs):
+		if metrics.ENABLED or tracing.ENABLED:
+			started = time.time()
+			try:
+				return cls().execute(*args, **kwargs)
+			finally:
+				secs = time.time() - started
+				if metrics.ENABLED:
+					metrics.histogram("interactor-execute", cls.__name__).observe(secs)
+				if tracing.ENABLED:
+					tracing.record(cls.__name__, secs, args, kwargs)
 		return cls().execute(*args, **kwargs)
 	return execute
@@ -0,0 +1,58 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+from ..infrastructure import log
+
+class DiagnosticsDumpMixin(object):
+	'''Mixin class for adapters which collect diagnostics data while enabled
+	and write it to a file.
+
+	The file is written when collecting is disabled, and also when enabled
+	again while already enabled, so that saving the settings file gives a
+	snapshot without interrupting the collecting.
+
+	Classes using this mixin must implement:
+	 - is_collecting()      returns True while data is being collected
+	 - start_collecting()   starts collecting
+	 - stop_collecting()    stops collecting
+	 - write_dump(file)     writes collected data to 'file'
+	'''
+
+	def __init__(self):
+		super(DiagnosticsDumpMixin, self).__init__()
+		self.__filepath = None
+
+	def init(self, filepath):
+		self.__filepath = filepath
+
+	def set_enabled(self, enabled):
+		if enabled and self.is_collecting():
+			self.dump()
+		elif enabled:
+			self.start_collecting()
+		elif self.is_collecting():
+			self.dump()
+			self.stop_collecting()
+
+	def dump(self):
+		if not self.__filepath or not self.is_collecting():
+			return
+		try:
+			with open(self.__filepath, "w") as file:
+				self.write_dump(file)
+		except IOError:
+			log.LOG_CURRENT_EXCEPTION()
@@ -0,0 +1,78 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import json
+
+from ..infrastructure import metrics, log
+from ..infrastructure.timer import TimerMixin, get_timer_stats
+
+class MetricsAdapter(TimerMixin):
+	'''Writes collected metrics periodically to a file while metrics are
+	enabled. Each write appends one JSON object per line, the file is
+	truncated on the first write after enabling.
+
+	Stats of other components can be included in the writes with
+	add_stats_source().
+	'''
+
+	def __init__(self):
+		super(MetricsAdapter, self).__init__()
+		self.__filepath = None
+		self.__dump_interval = 60
+		self.__truncate = True
+		self.__stats_sources = {"timers": get_timer_stats}
+
+	def init(self, filepath):
+		self.__filepath = filepath
+
+	def add_stats_source(self, name, function):
+		'''Adds 'function' which returns a dict of stats. The stats are
+		written as gauges labeled with dict's keys under 'name'.
+		'''
+		self.__stats_sources[name] = function
+
+	def set_enabled(self, enabled):
+		if enabled == metrics.is_enabled():
+			return
+		if enabled:
+			metrics.set_enabled(True)
+			self.__truncate = True
+			self.on_timeout(self.__dump_interval, self.dump, repeat=True)
+		else:
+			self.off_timeout(self.dump)
+			self.dump()
+			metrics.set_enabled(False)
+
+	def set_dump_interval(self, interval):
+		self.__dump_interval = interval
+		if metrics.is_enabled():
+			self.off_timeout(self.dump)
+			self.on_timeout(self.__dump_interval, self.dump, repeat=True)
+
+	def dump(self):
+		if not self.__filepath:
+			return
+		for source_name, function in self.__stats_sources.iteritems():
+			for name, value in function().iteritems():
+				metrics.gauge(source_name, name).set(value)
+		try:
+			with open(self.__filepath, "w" if self.__truncate else "a") as file:
+				file.write(json.dumps(metrics.get_snapshot(), sort_keys=True) + "\n")
+			self.__truncate = False
+		except IOError:
+			log.LOG_CURRENT_EXCEPTION()
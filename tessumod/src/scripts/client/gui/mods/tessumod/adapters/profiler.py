@@ -0,0 +1,52 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import threading
+
+from ..infrastructure.profiler import SamplingProfiler
+from .diagnostics import DiagnosticsDumpMixin
+
+class ProfilerAdapter(DiagnosticsDumpMixin):
+	'''Runs a SamplingProfiler on the game thread and writes its samples in
+	collapsed stack format, which flame graph tools read directly.
+	'''
+
+	def __init__(self):
+		super(ProfilerAdapter, self).__init__()
+		# created within game thread
+		self.__thread_id = threading.current_thread().ident
+		self.__interval = 0.01
+		self.__profiler = None
+
+	def set_interval(self, interval):
+		'''Sets sampling interval (in seconds), takes effect on next enable.'''
+		self.__interval = interval
+
+	def is_collecting(self):
+		return self.__profiler is not None
+
+	def start_collecting(self):
+		self.__profiler = SamplingProfiler(self.__thread_id, self.__interval)
+		self.__profiler.start()
+
+	def stop_collecting(self):
+		self.__profiler.stop()
+		self.__profiler = None
+
+	def write_dump(self, file):
+		for line in self.__profiler.get_collapsed_stacks():
+			file.write(line + "\n")
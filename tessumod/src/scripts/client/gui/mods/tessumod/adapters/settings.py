@@ -19,6 +19,7 @@ import re
 import copy
 
 from ..constants import SettingConstants
+from ..nickpatterns import NickExtractPatterns
 from ..infrastructure.inifile import INIFile
 
 DEFAULT_INI = """
@@ -112,6 +113,24 @@ port: 25639
 ; Changing this value requires game restart
 polling_interval: 0.1
 
+; Maximum interval (as seconds) to poll clientquery's socket
+; Set higher than 'polling_interval' (e.g. 0.4) to back off while idle: the
+; polling interval then doubles on each poll where nothing is received up to
+; this value, and returns back to 'polling_interval' when data is received
+; or a command is sent. By default polling is done with fixed interval
+polling_interval_max: 0.1
+
+; Enables reading of clientquery's socket in a separate thread instead of
+; polling it with above interval, received data is then handled on every
+; frame which reduces reaction delay to speak notifications
+; Changing this value requires game restart
+reader_thread: off
+
+; Maximum number of commands sent to clientquery without waiting for their
+; responses, higher value speeds up e.g. joining to a crowded server
+; Value 1 sends commands one at a time
+command_window: 8
+
 [VoiceChatNotifications]
 ; Enable or disable speak notifications in player panels and showing of
 ; speaker icons above tanks
@@ -155,6 +174,43 @@ action: attackSender
 ; Adjust this until the animation animates continuously while someone is
 ; speaking.
 repeat_interval: 2
+
+[Diagnostics]
+; Enables collecting of performance metrics, e.g. amount of lines received
+; from clientquery, round-trip times of commands sent to clientquery and
+; execution times of the mod's actions. Collected metrics are written to
+; tessu_mod_metrics.json in the same folder as this file, one JSON object
+; per line. Useful for debugging performance problems.
+metrics_enabled: off
+
+; Interval (as seconds) of writing collected metrics to the file
+metrics_dump_interval: 60
+
+; Enables tracing of the mod's actions. Execution time of each action is
+; recorded, and latest actions which took longer than 'slow_call_threshold'
+; are kept together with their arguments. Recorded slow calls and execution
+; times are written to tessu_mod_slow_calls.log in the same folder as this
+; file when tracing is disabled, or whenever this file is saved while tracing
+; is enabled. Useful for finding causes of stutter in game.
+trace_enabled: off
+
+; Execution time (as milliseconds) after which an action is considered slow,
+; default is duration of one frame at 60 FPS
+slow_call_threshold: 16
+
+; Number of latest slow calls to keep
+slow_call_count: 50
+
+; Enables sampling profiler which periodically records what the mod is doing
+; in game's main thread. Sampled call stacks are written to
+; tessu_mod_profile.txt in the same folder as this file when profiler is
+; disabled, or whenever this file is saved while profiler is enabled. The file
+; is in collapsed stack format which can be viewed with flame graph tools,
+; e.g. https://www.speedscope.app
+profiler_enabled: off
+
+; Interval (as milliseconds) of sampling, takes effect when profiler is enabled
+profiler_interval: 10
 """
 
 class SettingsAdapter(object):
@@ -164,6 +220,7 @@ class SettingsAdapter(object):
 		self.__inifile.on("file-loaded", self.__on_file_loaded)
 		self.__app = app
 		self.__loaded_values = {}
+		self.__version = 0
 
 	def set_file_check_interval(self, interval):
 		self.__inifile.set_file_check_interval(interval)
@@ -171,11 +228,16 @@ class SettingsAdapter(object):
 	def get(self, key):
 		return copy.copy(self.__loaded_values[key])
 
+	def get_version(self):
+		'''Returns a number which changes whenever settings are loaded.'''
+		return self.__version
+
 	def init(self, settings_filepath):
 		self.__inifile.set_filepath(settings_filepath)
 		self.__inifile.init()
 
 	def __on_file_loaded(self):
+		polling_interval = self.__inifile.get_float("TSClientQueryService", "polling_interval", default=0.1)
 		self.__loaded_values = {
 			SettingConstants.LOG_LEVEL                      : self.__inifile.get_int("General", "log_level", default=1),
 			SettingConstants.FILE_CHECK_INTERVAL            : self.__inifile.get_float("General", "ini_check_interval", default=5),
@@ -183,16 +245,28 @@ class SettingsAdapter(object):
 			SettingConstants.GET_GAME_NICK_FROM_CHAT_CLIENT : self.__inifile.get_boolean("General", "get_wot_nick_from_ts_metadata", default=True),
 			SettingConstants.UPDATE_CACHE_IN_REPLAYS        : self.__inifile.get_boolean("General", "update_cache_in_replays", default=False),
 			SettingConstants.CHAT_NICK_SEARCH_ENABLED       : self.__inifile.get_boolean("General", "ts_nick_search_enabled", default=True),
-			SettingConstants.NICK_EXTRACT_PATTERNS          : [re.compile(pattern, re.IGNORECASE) for pattern in self.__inifile.get_list("General", "nick_extract_patterns", default=[])],
+			SettingConstants.NICK_EXTRACT_PATTERNS          : NickExtractPatterns(self.__inifile.get_list("General", "nick_extract_patterns", default=[]), re.IGNORECASE),
 			SettingConstants.NICK_MAPPINGS                  : {k.lower(): v.lower() for k, v in self.__inifile.get_dict("NameMappings", self.__inifile.get_string, default={}).iteritems()},
 			SettingConstants.CHAT_CLIENT_HOST               : self.__inifile.get_string("TSClientQueryService", "host", default="localhost"),
 			SettingConstants.CHAT_CLIENT_PORT               : self.__inifile.get_int("TSClientQueryService", "port", default=25639),
-			SettingConstants.CHAT_CLIENT_POLLING_INTERVAL   : self.__inifile.get_float("TSClientQueryService", "polling_interval", default=0.1),
+			SettingConstants.CHAT_CLIENT_POLLING_INTERVAL   : polling_interval,
+			SettingConstants.CHAT_CLIENT_MAX_POLL_INTERVAL  : self.__inifile.get_float("TSClientQueryService", "polling_interval_max", default=polling_interval),
+			SettingConstants.CHAT_CLIENT_COMMAND_WINDOW     : self.__inifile.get_int("TSClientQueryService", "command_window", default=8),
+			SettingConstants.CHAT_CLIENT_READER_THREAD      : self.__inifile.get_boolean("TSClientQueryService", "reader_thread", default=False),
 			SettingConstants.VOICE_CHAT_NOTIFY_ENABLED      : self.__inifile.get_boolean("VoiceChatNotifications", "enabled", default=True),
 			SettingConstants.VOICE_CHAT_NOTIFY_SELF_ENABLED : self.__inifile.get_boolean("VoiceChatNotifications", "self_enabled", default=True),
 			SettingConstants.MINIMAP_NOTIFY_ENABLED         : self.__inifile.get_boolean("MinimapNotifications", "enabled", default=True),
 			SettingConstants.MINIMAP_NOTIFY_SELF_ENABLED    : self.__inifile.get_boolean("MinimapNotifications", "self_enabled", default=True),
 			SettingConstants.MINIMAP_NOTIFY_ACTION          : self.__inifile.get_string("MinimapNotifications", "action", default="attackSender"),
-			SettingConstants.MINIMAP_NOTIFY_REPEAT_INTERVAL : self.__inifile.get_float("MinimapNotifications", "repeat_interval", default=3.5)
+			SettingConstants.MINIMAP_NOTIFY_REPEAT_INTERVAL : self.__inifile.get_float("MinimapNotifications", "repeat_interval", default=3.5),
+			SettingConstants.METRICS_ENABLED                : self.__inifile.get_boolean("Diagnostics", "metrics_enabled", default=False),
+			SettingConstants.METRICS_DUMP_INTERVAL          : self.__inifile.get_float("Diagnostics", "metrics_dump_interval", default=60),
+			SettingConstants.TRACE_ENABLED                  : self.__inifile.get_boolean("Diagnostics", "trace_enabled", default=False),
+			SettingConstants.TRACE_SLOW_CALL_THRESHOLD      : self.__inifile.get_float("Diagnostics", "slow_call_threshold", default=16),
+			SettingConstants.TRACE_SLOW_CALL_COUNT          : self.__inifile.get_int("Diagnostics", "slow_call_count", default=50),
+			SettingConstants.PROFILER_ENABLED               : self.__inifile.get_boolean("Diagnostics", "profiler_enabled", default=False),
+			SettingConstants.PROFILER_INTERVAL              : self.__inifile.get_float("Diagnostics", "profiler_interval", default=10)
 		}
+		self.__version += 1
 		self.__app["load-settings"](self.__loaded_values)
+		self.__app["pair-chatusers-to-players"]()
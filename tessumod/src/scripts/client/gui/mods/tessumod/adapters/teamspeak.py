@@ -28,6 +28,16 @@ from ..infrastructure import sharedmemory, clientquery, log
 
 class TeamSpeakChatClientAdapter(object):
 
+	# interactors which depend on each changed user value, talking status
+	# changes are by far the most frequent so they only update the speak
+	# state, users are paired again when players or settings change
+	USER_CHANGE_ROUTES = {
+		"client-nickname": ("cache-chatuser", "pair-chatuser-to-player", "update-chatuser-speakstate"),
+		"game-nickname":   ("pair-chatuser-to-player", "update-chatuser-speakstate"),
+		"talking":         ("update-chatuser-speakstate",),
+		"my-channel":      ("cache-chatuser", "pair-chatuser-to-player", "update-chatuser-speakstate")
+	}
+
 	def __init__(self, app):
 		self.__ts = TeamSpeakClient()
 		self.__app = app
@@ -37,13 +47,12 @@ class TeamSpeakChatClientAdapter(object):
 		self.__ts.on("disconnected-server", self.__on_disconnected_from_ts_server)
 		self.__ts.on("server-tab-changed", self.__on_server_tab_changed)
 		self.__ts.on("user-added", self.__on_user_added)
-		self.__ts.on("user-changed-client-nickname", self.__on_user_changed)
-		self.__ts.on("user-changed-game-nickname", self.__on_user_changed)
-		self.__ts.on("user-changed-talking", self.__on_user_changed)
-		self.__ts.on("user-changed-my-channel", self.__on_user_changed)
+		for name, interactors in self.USER_CHANGE_ROUTES.iteritems():
+			self.__ts.on("user-changed-" + name, partial(self.__on_user_changed, interactors))
 		self.__ts.on("user-removed", self.__on_user_removed)
 		self.__positional_data_api = PositionalDataAPI()
 		self.__selected_schandlerid = None
+		self.__users = {}
 
 	def init(self, plugin_filepath):
 		self.__plugin_filepath = os.path.normpath(plugin_filepath)
@@ -55,8 +64,14 @@ class TeamSpeakChatClientAdapter(object):
 	def set_port(self, port):
 		self.__ts.set_port(port)
 
-	def set_polling_interval(self, interval):
-		self.__ts.start_event_checking(interval)
+	def set_polling_interval(self, interval, max_interval):
+		self.__ts.start_event_checking(interval, max_interval)
+
+	def set_command_window(self, size):
+		self.__ts.set_command_window(size)
+
+	def set_reader_thread_enabled(self, enabled):
+		self.__ts.set_reader_thread_enabled(enabled)
 
 	def get_current_channel_id(self, schandlerid):
 		return self.__ts.get_my_cid(schandlerid)
@@ -93,12 +108,15 @@ class TeamSpeakChatClientAdapter(object):
 		return self.__ts.has_user(schandlerid=client_id[0], clid=client_id[1])
 
 	def get_user(self, client_id):
-		assert self.has_user(client_id)
-		return TeamSpeakUser(client_id, self.__ts)
+		user = self.__users.get(client_id, None)
+		if user is None:
+			assert self.has_user(client_id)
+			user = self.__users[client_id] = TeamSpeakUser(client_id, self.__ts.get_user(*client_id), self.__ts)
+		return user
 
 	def get_users(self):
-		for schandlerid, clid in self.__ts.iter_user_ids():
-			yield TeamSpeakUser((schandlerid, clid), self.__ts)
+		for client_id in self.__ts.iter_user_ids():
+			yield self.get_user(client_id)
 
 	def update_positional_data(self, camera_position, camera_direction, positions):
 		if self.__selected_schandlerid is not None:
@@ -116,6 +134,9 @@ class TeamSpeakChatClientAdapter(object):
 	def get_clientquery(self):
 		return self.__ts
 
+	def get_event_checking_stats(self):
+		return self.__ts.get_event_checking_stats()
+
 	def __on_connected_to_ts(self):
 		'''Called when TessuMod manages to connect TeamSpeak client. However, this
 		doesn't mean that the client is connected to any TeamSpeak server.
@@ -147,45 +168,61 @@ class TeamSpeakChatClientAdapter(object):
 	def __on_user_removed(self, schandlerid, clid):
 		client_id = (schandlerid, clid)
 		self.__app["remove-chatuser"](client_id=client_id)
+		self.__users.pop(client_id, None)
 
-	def __on_user_changed(self, schandlerid, clid, **kwargs):
+	def __on_user_changed(self, interactors, schandlerid, clid, **kwargs):
 		client_id = (schandlerid, clid)
-		self.__app["cache-chatuser"](client_id=client_id)
-		self.__app["pair-chatuser-to-player"](client_id=client_id)
-		self.__app["update-chatuser-speakstate"](client_id=client_id)
+		for interactor in interactors:
+			self.__app[interactor](client_id=client_id)
 
 	def __on_server_tab_changed(self, schandlerid):
 		log.LOG_NOTE("TeamSpeak client server tab was changed to {0}".format(schandlerid))
 		self.__selected_schandlerid = schandlerid
 
 class TeamSpeakUser(collections.Mapping):
+	'''View to a TeamSpeak user, values are read directly from the user's
+	record in ClientQuery. Values can be accessed either as attributes or
+	as items.
+	'''
 
-	__KEYS = {
-		"client_id": lambda self: self._get_client_id(),
-		"nick": lambda self: self._query_parameter("client-nickname"),
-		"game_nick": lambda self: self._query_parameter("game-nickname"),
-		"unique_id": lambda self: self._query_parameter("client-unique-identifier"),
-		"speaking": lambda self: self._query_parameter("talking"),
-		"is_me": lambda self: self._query_parameter("is-me"),
-		"in_my_channel": lambda self: self._query_parameter("my-channel")
-	}
+	__KEYS = ("client_id", "nick", "game_nick", "unique_id", "speaking", "is_me", "in_my_channel")
+
+	def __init__(self, client_id, record, cq):
+		self.client_id = client_id
+		self.__record = record
+		self.__cq = cq
 
-	def _get_client_id(self):
-		return self.__client_id
+	@property
+	def nick(self):
+		return self.__record.client_nickname
 
-	def _query_parameter(self, name):
-		return self.__cq.get_user_parameter(self.__client_id[0], self.__client_id[1], name)
+	@property
+	def game_nick(self):
+		return self.__cq.get_user_parameter(self.client_id[0], self.client_id[1], "game-nickname")
 
-	def __init__(self, client_id, cq):
-		self.__client_id = client_id
-		self.__cq = cq
+	@property
+	def unique_id(self):
+		return self.__record.client_unique_identifier
+
+	@property
+	def speaking(self):
+		return self.__record.talking
+
+	@property
+	def is_me(self):
+		return self.__record.is_me
+
+	@property
+	def in_my_channel(self):
+		return self.__record.my_channel
 
 	def __getitem__(self, name):
-		assert name in self.__KEYS
-		return self.__KEYS[name](self)
+		if name not in self.__KEYS:
+			raise KeyError(name)
+		return getattr(self, name)
 
 	def __iter__(self):
-		return iter(self.__KEYS.keys())
+		return iter(self.__KEYS)
 
 	def __len__(self):
 		return len(self.__KEYS)
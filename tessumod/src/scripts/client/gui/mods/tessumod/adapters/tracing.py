@@ -0,0 +1,57 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import time
+
+from ..infrastructure import tracing
+from .diagnostics import DiagnosticsDumpMixin
+
+class TracingAdapter(DiagnosticsDumpMixin):
+	'''Writes slow calls and a table of execution times per interactor,
+	sorted by total time, as plain text.
+	'''
+
+	def is_collecting(self):
+		return tracing.is_enabled()
+
+	def start_collecting(self):
+		tracing.set_enabled(True)
+
+	def stop_collecting(self):
+		tracing.set_enabled(False)
+
+	def set_slow_threshold(self, secs):
+		tracing.set_slow_threshold(secs)
+
+	def set_slow_call_count(self, count):
+		tracing.set_slow_call_count(count)
+
+	def write_dump(self, file):
+		lines = ["Dumped at {0}, slow call threshold {1:.2f} ms".format(time.strftime("%Y-%m-%d %H:%M:%S"), tracing.get_slow_threshold() * 1000), ""]
+		lines.append("Slow calls:")
+		for call_time, name, secs, arguments in tracing.get_slow_calls():
+			timestamp = time.strftime("%H:%M:%S", time.localtime(call_time)) + ".{0:03d}".format(int(call_time * 1000) % 1000)
+			lines.append("[{0}] {1:>9.2f} ms {2}({3})".format(timestamp, secs * 1000, name, arguments))
+		lines.append("")
+		lines.append("Execution times:")
+		lines.append("{0:<40} {1:>8} {2:>12} {3:>10} {4:>10}".format("name", "count", "total ms", "avg ms", "max ms"))
+		stats = tracing.get_call_stats()
+		for name in sorted(stats, key=lambda name: stats[name]["total"], reverse=True):
+			value = stats[name]
+			lines.append("{0:<40} {1:>8} {2:>12.2f} {3:>10.3f} {4:>10.2f}".format(name, value["count"],
+				value["total"] * 1000, value["total"] * 1000 / value["count"], value["max"] * 1000))
+		file.write("\n".join(lines) + "\n")
@@ -16,10 +16,13 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
 import os
+import time
 import xml.etree.ElementTree as ET
 
 from ..infrastructure import gameapi
 from ..infrastructure.timer import TimerMixin
+from ..infrastructure.updatequeue import UpdateQueue
+from ..roster import Roster
 
 from messenger.proto.events import g_messengerEvents
 from PlayerEvents import g_playerEvents
@@ -51,7 +54,7 @@ class BattleAdapter(TimerMixin):
 
 	def get_vehicle(self, player_id):
 		result = {}
-		vehicle_id = gameapi.Battle.find_vehicle_id(lambda vehicle: vehicle["accountDBID"] == player_id)
+		vehicle_id = gameapi.Battle.find_vehicle_id_by_dbid(player_id)
 		if vehicle_id is None:
 			return result
 		vehicle = gameapi.Battle.get_vehicle(vehicle_id)
@@ -88,7 +91,24 @@ class BattleAdapter(TimerMixin):
 		self.__app["battle-replay-start"]()
 		return original_method(original_self, *args, **kwargs)
 
-class PlayerAdapter(object):
+class PlayerAdapter(TimerMixin):
+
+	def __init__(self, app):
+		super(PlayerAdapter, self).__init__()
+		self.__app = app
+		self.__roster = None
+		self.__roster_version = None
+		gameapi.Player.onRosterChanged += self.__on_roster_changed
+
+	def get_roster_version(self):
+		return gameapi.Player.get_roster_version()
+
+	def get_roster(self):
+		version = gameapi.Player.get_roster_version()
+		if self.__roster is None or version != self.__roster_version:
+			self.__roster = Roster(self.get_players(in_battle=True, in_prebattle=True))
+			self.__roster_version = version
+		return self.__roster
 
 	def get_player_by_dbid(self, dbid):
 		return gameapi.Player.get_player_by_dbid(dbid)
@@ -102,33 +122,61 @@ class PlayerAdapter(object):
 	def get_players(self, in_battle=False, in_prebattle=False, clanmembers=False, friends=False):
 		return gameapi.Player.get_players(in_battle, in_prebattle, clanmembers, friends)
 
+	def __on_roster_changed(self):
+		# rosters change in bursts (e.g. when vehicles of a battle arrive),
+		# pair chat users once after the burst
+		self.on_timeout(0, self.__on_roster_change_done)
+
+	def __on_roster_change_done(self):
+		self.__app["pair-chatusers-to-players"]()
+
 class ChatIndicatorAdapter(object):
+	'''Shows speaking players in voice chat indicators. Speaking states set
+	during a tick are applied together on next tick, and only if they differ
+	from what is already shown.
+	'''
 
 	def __init__(self):
 		self.__speakers = set()
+		self.__updates = UpdateQueue(self.__on_updates)
 		gameapi.VoiceChat.patch_is_participant_speaking(self.__on_is_participant_speaking)
 
 	def set_player_speaking(self, player, speaking):
-		if speaking and player["id"] not in self.__speakers:
-			self.__speakers.add(player["id"])
-			gameapi.VoiceChat.set_player_speaking(player["id"], True)
-		elif not speaking and player["id"] in self.__speakers:
-			self.__speakers.remove(player["id"])
-			gameapi.VoiceChat.set_player_speaking(player["id"], False)
+		self.__updates.set(player["id"], speaking)
 
 	def clear_all_players_speaking(self):
+		self.__updates.clear()
 		for speaker in self.__speakers:
 			gameapi.VoiceChat.set_player_speaking(speaker, False)
 		self.__speakers.clear()
 
+	def __on_updates(self, updates):
+		for player_id, speaking in updates.iteritems():
+			if speaking and player_id not in self.__speakers:
+				self.__speakers.add(player_id)
+				gameapi.VoiceChat.set_player_speaking(player_id, True)
+			elif not speaking and player_id in self.__speakers:
+				self.__speakers.remove(player_id)
+				gameapi.VoiceChat.set_player_speaking(player_id, False)
+
 	def __on_is_participant_speaking(self, original_self, original_method, dbid):
 		'''Called by other game modules to determine current speaking status.'''
 		return True if dbid in self.__speakers else original_method(original_self, dbid)
 
-class MinimapAdapter(object):
+class MinimapAdapter(TimerMixin):
+	'''Animates minimap markers of speaking players.
+
+	Markers of all speaking players are repeated from one shared timer so that
+	their animations run in same phase. A new speaker's marker is shown
+	on next tick and joins the shared cycle, skipping the next repeat if it
+	would come too soon after. Speaking states set during a tick are applied
+	together, so a player who starts and stops within a tick is not shown.
+	'''
 
 	def __init__(self):
-		self.__running_animations = {}
+		super(MinimapAdapter, self).__init__()
+		self.__shown_times = {}
+		self.__updates = UpdateQueue(self.__on_updates)
 		self.__action = None
 		self.__interval = None
 
@@ -137,26 +185,46 @@ class MinimapAdapter(object):
 
 	def set_action_interval(self, interval):
 		self.__interval = interval
+		if self.__shown_times:
+			self.on_timeout(self.__interval, self.__on_repeat, repeat=True)
 
 	def set_player_speaking(self, player, speaking):
-		if not player["in_battle"]:
-			return
-		vehicle_id = player["vehicle_id"]
-		if speaking:
-			if vehicle_id not in self.__running_animations:
-				self.__running_animations[vehicle_id] = gameapi.MinimapMarkerAnimation(
-					vehicle_id, self.__interval, self.__action, self.__on_done)
-			self.__running_animations[vehicle_id].start()
-		else:
-			if vehicle_id in self.__running_animations:
-				self.__running_animations[vehicle_id].stop()
+		if player["in_battle"]:
+			self.__updates.set(player["vehicle_id"], speaking)
 
 	def clear_all_players_speaking(self):
-		for vehicle_id in self.__running_animations:
-			self.__running_animations[vehicle_id].stop()
-
-	def __on_done(self, vehicle_id):
-		self.__running_animations.pop(vehicle_id, None)
+		self.__updates.clear()
+		self.__shown_times.clear()
+		self.off_timeout(self.__on_repeat)
+
+	def __on_updates(self, updates):
+		now = time.time()
+		started_ids = []
+		for vehicle_id, speaking in updates.iteritems():
+			if speaking:
+				if vehicle_id not in self.__shown_times:
+					self.__shown_times[vehicle_id] = now
+					started_ids.append(vehicle_id)
+			else:
+				self.__shown_times.pop(vehicle_id, None)
+		if not self.__shown_times:
+			self.off_timeout(self.__on_repeat)
+		elif started_ids and len(started_ids) == len(self.__shown_times):
+			self.on_timeout(self.__interval, self.__on_repeat, repeat=True)
+		if started_ids:
+			gameapi.Minimap.show_markers(started_ids, self.__action)
+
+	def get_animated_count(self):
+		'''Returns number of markers being animated.'''
+		return len(self.__shown_times)
+
+	def __on_repeat(self):
+		now = time.time()
+		min_shown_time = now - self.__interval / 2.0
+		vehicle_ids = [vehicle_id for vehicle_id, shown_time in self.__shown_times.iteritems() if shown_time <= min_shown_time]
+		for vehicle_id in vehicle_ids:
+			self.__shown_times[vehicle_id] = now
+		gameapi.Minimap.show_markers(vehicle_ids, self.__action)
 
 class NotificationsAdapter(object):
 
@@ -33,3 +33,13 @@ class SettingConstants(object):
 	MINIMAP_NOTIFY_SELF_ENABLED    = 14
 	MINIMAP_NOTIFY_ACTION          = 15
 	MINIMAP_NOTIFY_REPEAT_INTERVAL = 16
+	CHAT_CLIENT_COMMAND_WINDOW     = 17
+	CHAT_CLIENT_READER_THREAD      = 18
+	CHAT_CLIENT_MAX_POLL_INTERVAL  = 19
+	METRICS_ENABLED                = 20
+	METRICS_DUMP_INTERVAL          = 21
+	TRACE_ENABLED                  = 22
+	TRACE_SLOW_CALL_THRESHOLD      = 23
+	TRACE_SLOW_CALL_COUNT          = 24
+	PROFILER_ENABLED               = 25
+	PROFILER_INTERVAL              = 26
@@ -16,12 +16,19 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
 import traceback
+import re
 import asynchat
 import asyncore
 import socket
 import sys
 import log
+import metrics
 import errno
+import select
+import threading
+import time
+import collections
+from functools import partial
 
 from timer import TimerMixin
 from eventemitter import EventEmitterMixin
@@ -85,8 +92,18 @@ class ClientQueryConnectionMixin(object):
 		self.__protocol.create_socket(socket.AF_INET, socket.SOCK_STREAM)
 		self.__protocol.connect(self.__address)
 
+	def set_max_line_length(self, length):
+		self.__protocol.set_max_line_length(length)
+
+	def set_reader_thread_enabled(self, enabled):
+		self.__protocol.set_reader_thread_enabled(enabled)
+
+	def is_reader_thread_enabled(self):
+		return self.__protocol.is_reader_thread_enabled()
+
 	def send(self, data):
-		log.LOG_DEBUG("send: {0}".format(data))
+		if log.is_enabled(log.LOG_LEVEL.DEBUG):
+			log.LOG_DEBUG("send: {0}".format(data))
 		self.__protocol.send(data)
 
 	def is_connected(self):
@@ -94,6 +111,7 @@ class ClientQueryConnectionMixin(object):
 
 	def __check_socket(self):
 		asyncore.loop(timeout=0, count=1, map=self.__socket_map)
+		self.__protocol.handle_received_lines()
 
 	def __keep_alive(self):
 		'''Keeps the connection alive. Normally TeamSpeak client disconnects
@@ -113,20 +131,49 @@ class ClientQueryConnectionMixin(object):
 			self.emit("disconnected")
 		self.on_timeout(5, self.__connect)
 
-	def __on_protocol_line_received(self, line):
-		log.LOG_DEBUG("recv: {0}".format(line))
-		self.emit("line-received", line)
+	def __on_protocol_line_received(self, line, parsed=None):
+		if log.is_enabled(log.LOG_LEVEL.DEBUG):
+			log.LOG_DEBUG("recv: {0}".format(line))
+		self.emit("line-received", line, parsed)
 
 	def __on_protocol_error(self, error):
 		self.emit("error", error)
 
 class ClientQueryProtocol(asynchat.async_chat, EventEmitterMixin):
-	'''This class handles low level communication with the client query interface.'''
+	'''This class handles low level communication with the client query interface.
+
+	By default received data is read when asyncore loop finds the socket
+	readable. With reader thread enabled the socket is read and received
+	lines are pre-parsed in a ClientQueryReaderThread instead, and
+	handle_received_lines() must be called periodically to handle them.
+	'''
+
+	TERMINATOR = "\n\r"
+	# protects game's memory against a runaway response, largest expected
+	# lines are "clientlist" responses from very crowded servers
+	MAX_LINE_LENGTH = 1024 * 1024
 
 	def __init__(self, map):
 		asynchat.async_chat.__init__(self, map=map)
 		EventEmitterMixin.__init__(self)
-		self.set_terminator("\n\r")
+		self.__line_buffer = LineBuffer(self.TERMINATOR, self.MAX_LINE_LENGTH)
+		self.__reader_thread_enabled = False
+		self.__reader_thread = None
+
+	def set_max_line_length(self, length):
+		'''Sets maximum length of a received line in bytes. Exceeding the limit
+		emits an error and closes the connection.
+		'''
+		self.__line_buffer.set_max_line_length(length)
+
+	def set_reader_thread_enabled(self, enabled):
+		'''Enables or disables reading of the socket in a separate thread.
+		Takes effect on next connect.
+		'''
+		self.__reader_thread_enabled = enabled
+
+	def is_reader_thread_enabled(self):
+		return self.__reader_thread_enabled
 
 	def connect(self, address):
 		try:
@@ -144,12 +191,31 @@ class ClientQueryProtocol(asynchat.async_chat, EventEmitterMixin):
 			else:
 				raise
 
+	def close(self):
+		if self.__reader_thread:
+			self.__reader_thread.stop()
+			self.__reader_thread = None
+		asynchat.async_chat.close(self)
+
+	def readable(self):
+		'''Hook method which is called by asyncore to check if the socket
+		should be checked for incoming data. Reader thread, if running, takes
+		care of reading instead.
+		'''
+		return self.__reader_thread is None
+
 	def handle_connect(self):
 		'''Hook method which is called by async_chat when connection is
 		established. Initializes variables and prepares for protocol testing.
 		'''
 		self.__handle_line = self.__handle_proto_message
-		self._in_line = ""
+		self.__line_buffer.clear()
+		if self.__reader_thread_enabled:
+			# previous thread may still be finishing, so it must not share the
+			# buffer with the new one
+			line_buffer = LineBuffer(self.TERMINATOR, self.__line_buffer.get_max_line_length())
+			self.__reader_thread = ClientQueryReaderThread(self.socket, line_buffer)
+			self.__reader_thread.start()
 
 	def handle_close(self):
 		'''Hook method which is called by async_chat when connection is closed
@@ -158,18 +224,46 @@ class ClientQueryProtocol(asynchat.async_chat, EventEmitterMixin):
 		asynchat.async_chat.handle_close(self)
 		self.emit("disconnected")
 
-	def collect_incoming_data(self, data):
-		'''Hook method which is called by async_chat to provide incoming data.
-		Data is provided just enough until terminator is found.
+	def handle_read(self):
+		'''Hook method which is called by asyncore when the socket has data
+		available. Replaces async_chat's implementation which rescans and
+		reallocates its buffer for each found line.
 		'''
-		self._in_line += data
+		try:
+			data = self.recv(self.ac_in_buffer_size)
+		except socket.error as err:
+			if err.args[0] != errno.EWOULDBLOCK:
+				self.handle_error()
+			return
 
-	def found_terminator(self):
-		'''Hook method which is called by async_chat to indicate end-of-line.
-		Feeds collected line to data handling.
-		'''
-		self.__handle_line(self._in_line)
-		self._in_line = ""
+		for line in self.__line_buffer.feed(data):
+			if not self.connected:
+				return
+			self.__handle_line(line)
+
+		if self.__line_buffer.is_overflown():
+			self.__handle_overflow()
+
+	def handle_received_lines(self):
+		'''Handles lines received by reader thread since previous call.'''
+		if self.__reader_thread is None:
+			return
+		for type, value in self.__reader_thread.pop_received():
+			if type == ClientQueryReaderThread.LINE:
+				self.__handle_line(*value)
+			elif type == ClientQueryReaderThread.OVERFLOW:
+				self.__handle_overflow()
+			elif type == ClientQueryReaderThread.ERROR:
+				self.emit("error", value)
+			elif type == ClientQueryReaderThread.CLOSED:
+				self.handle_close()
+			if not self.connected:
+				return
+
+	def __handle_overflow(self):
+		self.__line_buffer.clear()
+		self.emit("error", Error("Received line exceeds maximum length of {0} bytes".format(self.__line_buffer.get_max_line_length())))
+		self.handle_close()
 
 	def log_info(self, message, type="info"):
 		'''Undocumented feature of asyncore. Called by asyncore to print log
@@ -182,33 +276,165 @@ class ClientQueryProtocol(asynchat.async_chat, EventEmitterMixin):
 		else:
 			log.LOG_ERROR(message)
 
-	def __handle_proto_message(self, line):
+	def __handle_proto_message(self, line, parsed=None):
 		self.__handle_line = self.__handle_welcome_message
 		if line != "TS3 Client":
 			self.emit("error", Error("Not a Client Query Protocol"))
 			self.close()
 
-	def __handle_welcome_message(self, line):
+	def __handle_welcome_message(self, line, parsed=None):
 		self.__handle_line = self.__handle_schandlerid_message
 
-	def __handle_schandlerid_message(self, line):
+	def __handle_schandlerid_message(self, line, parsed=None):
 		self.__handle_line = self.__handle_data_message
 		self.emit("connected")
 
-	def __handle_data_message(self, line):
-		self.emit("line-received", line)
+	def __handle_data_message(self, line, parsed=None):
+		if metrics.ENABLED:
+			started = time.time()
+			self.emit("line-received", line, parsed)
+			metrics.histogram("clientquery-line-handling").observe(time.time() - started)
+		else:
+			self.emit("line-received", line, parsed)
 
+class LineBuffer(object):
+	'''Collects received data and splits it to lines.
+
+	Received data is appended to a single buffer and only the newly received
+	part (plus possible partial terminator) is scanned, all complete lines are
+	consumed from the buffer at once.
+	'''
+
+	def __init__(self, terminator, max_line_length):
+		self.__buffer = bytearray()
+		self.__terminator = terminator
+		self.__max_line_length = max_line_length
+
+	def set_max_line_length(self, length):
+		self.__max_line_length = length
+
+	def get_max_line_length(self):
+		return self.__max_line_length
+
+	def clear(self):
+		del self.__buffer[:]
+
+	def feed(self, data):
+		'''Adds "data" to the buffer and returns a list of completed lines.'''
+		buffer = self.__buffer
+		terminator = self.__terminator
+		scan_offset = max(len(buffer) - len(terminator) + 1, 0)
+		buffer.extend(data)
+		lines = []
+		line_start = 0
+		while True:
+			index = buffer.find(terminator, scan_offset)
+			if index < 0:
+				break
+			lines.append(str(buffer[line_start:index]))
+			line_start = scan_offset = index + len(terminator)
+		if line_start:
+			del buffer[:line_start]
+		return lines
+
+	def is_overflown(self):
+		'''Returns True if incomplete line in the buffer is longer than allowed.'''
+		return len(self.__buffer) > self.__max_line_length
+
+class ClientQueryReaderThread(threading.Thread):
+	'''Thread which blocks until the socket has data, splits the data to lines
+	and parses notify-lines, so that the game thread needs only to dispatch
+	them.
+
+	Received items are passed to the game thread with a deque, whose append()
+	and popleft() are atomic, so no locking is needed.
+	'''
+
+	LINE = 0
+	OVERFLOW = 1
+	CLOSED = 2
+	ERROR = 3
+
+	SELECT_TIMEOUT = 1.0
+	RECV_SIZE = 4096
+
+	def __init__(self, sock, line_buffer):
+		super(ClientQueryReaderThread, self).__init__(name="TessuModClientQueryReader")
+		self.daemon = True
+		self.__socket = sock
+		self.__line_buffer = line_buffer
+		self.__received = collections.deque()
+		self.__stopped = False
+
+	def stop(self):
+		self.__stopped = True
+
+	def pop_received(self):
+		'''Returns items received since previous call as (type, value)
+		tuples.
+		'''
+		received = self.__received
+		items = []
+		while received:
+			items.append(received.popleft())
+		return items
+
+	def run(self):
+		try:
+			while not self.__stopped:
+				if not select.select([self.__socket], [], [], self.SELECT_TIMEOUT)[0]:
+					continue
+				try:
+					data = self.__socket.recv(self.RECV_SIZE)
+				except socket.error as err:
+					if err.args[0] == errno.EWOULDBLOCK:
+						continue
+					raise
+				if not data:
+					break
+				for line in self.__line_buffer.feed(data):
+					self.__received.append((self.LINE, (line, parse_notify_line(line))))
+				if self.__line_buffer.is_overflown():
+					self.__received.append((self.OVERFLOW, None))
+					return
+		except (socket.error, select.error, ValueError):
+			# raised when the socket is closed by game thread
+			if self.__stopped:
+				return
+		except Exception as error:
+			# the connection would otherwise look alive without receiving anything
+			self.__received.append((self.ERROR, Error("Reader thread failed: {0}".format(error))))
+		self.__received.append((self.CLOSED, None))
 
 class ClientQuerySendCommandMixin(object):
-	'''Mixin class which provides ability to send ClientQuery commands.'''
+	'''Mixin class which provides ability to send ClientQuery commands.
+
+	Commands are pipelined: up to "command window" amount of commands are
+	written to the socket without waiting for responses of previous commands.
+	ClientQuery answers commands in the order they were sent so responses are
+	matched to commands in first-in-first-out order.
+	'''
+
+	COMMAND_WINDOW = 1
 
 	def __init__(self):
-		self.__actions = []
+		self.__queued_actions = collections.deque()
+		self.__sent_actions = collections.deque()
+		self.__command_window = self.COMMAND_WINDOW
 		self.__schandlerid = None
+		self.__use_command = None
 		super(ClientQuerySendCommandMixin, self).__init__()
 		self.on("line-received", self.__on_line_received)
 		self.on("disconnected", self.__on_disconnected)
 
+	def set_command_window(self, size):
+		'''Sets maximum number of commands which can be waiting for response
+		at the same time. Value of 1 disables pipelining.
+		'''
+		assert size >= 1
+		self.__command_window = size
+		self.__send_queued_actions()
+
 	def send_command(self, command, input, schandlerid=None):
 		'''Method for sending ClientQuery commands.
 
@@ -220,67 +446,107 @@ class ClientQuerySendCommandMixin(object):
 		        is separated from another with pipe (|).
 		    "schandlerid" is server connection ID where to send the command.
 		        Any other value than None sends "use" command to switch the
-		        connection before the actual command is given.
+		        connection before the actual command is given, unless the
+		        connection is already selected.
 
 		Returns ClientQueryCommand object which will emit "error" or "result"
 		event on command completion.
 		'''
 		assert self.is_connected()
-		action = {"command": ClientQueryCommand(command, input)}
-		action["command"].on("result", self.__on_command_done)
-		action["command"].on("error", self.__on_command_done)
-		if schandlerid is not None:
-			action["schandlerid"] = int(schandlerid)
-			action["use-command"] = ClientQueryCommand("use", [{"schandlerid": schandlerid}])
-			action["use-command"].on("result", self.__on_use_command_finish)
-			action["use-command"].on("error", self.__on_use_command_failed)
-		self.__actions.append(action)
-		# send action right away if no other actions are waiting
-		if len(self.__actions) == 1:
-			self.__send_action(action)
-		return action["command"]
-
-	def __on_use_command_finish(self, result):
-		self.__schandlerid = int(result["args"][0]["schandlerid"])
-		if self.__actions:
-			del self.__actions[0]["use-command"]
-			self.__send_action(self.__actions[0])
-
-	def __on_use_command_failed(self, error):
-		if self.__actions:
-			self.__actions[0]["command"].emit("error", error)
-			del self.__actions[0]
-		if self.__actions:
-			self.__send_action(self.__actions[0])
-
-	def __on_command_done(self, *args, **kwargs):
-		if self.__actions:
-			del self.__actions[0]
-		if self.__actions:
-			self.__send_action(self.__actions[0])
-
-	def __send_action(self, action):
-		if "use-command" in action:
-			if self.__schandlerid != action["schandlerid"]:
-				self.send(action["use-command"].serialize())
-			else:
-				del action["use-command"]
-				self.send(action["command"].serialize())
-		else:
+		command = ClientQueryCommand(command, input)
+		command.on("result", partial(self.__on_command_done, command))
+		command.on("error", partial(self.__on_command_done, command))
+		self.__queued_actions.append({
+			"command": command,
+			"schandlerid": None if schandlerid is None else int(schandlerid)
+		})
+		self.__send_queued_actions()
+		return command
+
+	def has_pending_commands(self):
+		'''Returns True if there are commands waiting to be sent or waiting
+		for their responses.
+		'''
+		return bool(self.__sent_actions or self.__queued_actions)
+
+	def __send_queued_actions(self):
+		while self.__queued_actions and len(self.__sent_actions) < self.__command_window:
+			action = self.__queued_actions[0]
+			schandlerid = action["schandlerid"]
+			if schandlerid is not None and schandlerid != self.__schandlerid:
+				self.__send_use_command(schandlerid)
+				continue
+			self.__queued_actions.popleft()
+			if schandlerid is not None:
+				# command relies on server connection switch which might still
+				# be waiting for response
+				action["use-command"] = self.__use_command
+			if metrics.ENABLED:
+				action["sent-time"] = time.time()
+			self.__sent_actions.append(action)
 			self.send(action["command"].serialize())
-
-	def __on_line_received(self, line):
-		if self.__actions:
-			action = self.__actions[0]
-			if "use-command" in action:
-				action["use-command"].handle_line(line)
-			else:
-				action["command"].handle_line(line)
+		if metrics.ENABLED:
+			metrics.gauge("clientquery-commands-queued").set(len(self.__queued_actions))
+
+	def __send_use_command(self, schandlerid):
+		use_command = ClientQueryCommand("use", [{"schandlerid": schandlerid}])
+		use_command.on("result", partial(self.__on_use_command_finish, use_command))
+		use_command.on("error", partial(self.__on_use_command_failed, use_command))
+		self.__schandlerid = schandlerid
+		self.__use_command = use_command
+		action = {"command": use_command, "internal": True}
+		if metrics.ENABLED:
+			action["sent-time"] = time.time()
+		self.__sent_actions.append(action)
+		self.send(use_command.serialize())
+
+	def __on_use_command_finish(self, use_command, result):
+		if self.__use_command is use_command:
+			self.__use_command = None
+		self.__on_command_done(use_command)
+
+	def __on_use_command_failed(self, use_command, error):
+		if self.__use_command is use_command:
+			self.__use_command = None
+			self.__schandlerid = None
+		# commands sent after the failed "use" command were executed against
+		# wrong server connection, fail them now and ignore their responses
+		failed_commands = []
+		for index in range(len(self.__sent_actions)):
+			action = self.__sent_actions[index]
+			if action.get("use-command") is use_command:
+				failed_commands.append(action["command"])
+				self.__sent_actions[index] = {"command": self.__create_discard_command(), "internal": True}
+		for command in failed_commands:
+			command.emit("error", error)
+		self.__on_command_done(use_command)
+
+	def __create_discard_command(self):
+		command = ClientQueryCommand("discard", [])
+		command.on("result", partial(self.__on_command_done, command))
+		command.on("error", partial(self.__on_command_done, command))
+		return command
+
+	def __on_command_done(self, command, *args, **kwargs):
+		if self.__sent_actions and self.__sent_actions[0]["command"] is command:
+			action = self.__sent_actions.popleft()
+			if metrics.ENABLED and "sent-time" in action:
+				metrics.histogram("clientquery-command-rtt", command.get_name()).observe(time.time() - action["sent-time"])
+		self.__send_queued_actions()
+
+	def __on_line_received(self, line, parsed=None):
+		if self.__sent_actions:
+			self.__sent_actions[0]["command"].handle_line(line)
 
 	def __on_disconnected(self):
-		for action in self.__actions:
-			action["command"].emit("error", Error("Disconnected"))
-		del self.__actions[:]
+		actions = list(self.__sent_actions) + list(self.__queued_actions)
+		self.__sent_actions.clear()
+		self.__queued_actions.clear()
+		self.__schandlerid = None
+		self.__use_command = None
+		for action in actions:
+			if not action.get("internal"):
+				action["command"].emit("error", Error("Disconnected"))
 
 class ClientQueryCommand(EventEmitterMixin):
 	'''Container for a single command, handles receiving response lines and
@@ -307,6 +573,9 @@ class ClientQueryCommand(EventEmitterMixin):
 		self.__received_lines = []
 		super(ClientQueryCommand, self).__init__()
 
+	def get_name(self):
+		return self.__command
+
 	def serialize(self):
 		items = []
 		for item_args in self.__input:
@@ -339,81 +608,55 @@ class ClientQueryCommand(EventEmitterMixin):
 		else:
 			self.__received_lines.append(line)
 
+# see ESCAPING in http://media.teamspeak.com/ts3_literature/TeamSpeak%203%20Server%20Query%20Manual.pdf
+_UNESCAPE_LOOKUP = {
+	"\\": "\\",
+	"/": "/",
+	"s": " ",
+	"p": "|",
+	"a": "\a",
+	"b": "\b",
+	"f": "\f",
+	"n": "\n",
+	"r": "\r",
+	"t": "\t",
+	"v": "\v"
+}
+_UNESCAPE_PATTERN = re.compile(r"\\([\\/spabfnrtv])")
+
+def _unescape_match(match):
+	return _UNESCAPE_LOOKUP[match.group(1)]
+
 def parse_arguments(data):
 	'''Parses given ClientQuery parameters, returning parameters as a
 	list of dicts.
-	'''
-	return ParamsParser().parse(data)
-
-class ParamsParser(object):
-
-	# see ESCAPING in http://media.teamspeak.com/ts3_literature/TeamSpeak%203%20Server%20Query%20Manual.pdf
-	__UNESCAPE_LOOKUP = {
-		"\\": "\\",
-		"/": "/",
-		"s": " ",
-		"p": "|",
-		"a": "\a",
-		"b": "\b",
-		"f": "\f",
-		"n": "\n",
-		"r": "\r",
-		"t": "\t",
-		"v": "\v"
-	}
-
-	def parse(self, parameter_str):
-		self.__entry = {}
-		self.__entries = []
-		self.__change_parse_state(self.__parse_key)
-		for char in parameter_str:
-			self.__char_parser(char)
-		self.__char_parser(LineEnd)
-		return self.__entries
-
-	def __parse_common(self, char):
-		if char == " ":
-			self.__entry[self.__key_name] = self.__key_value
-			self.__change_parse_state(self.__parse_key)
-			return True
-		if char == LineEnd:
-			self.__entry[self.__key_name] = self.__key_value
-			self.__entries.append(self.__entry)
-			return True
-		if char == "|":
-			self.__entry[self.__key_name] = self.__key_value
-			self.__entries.append(self.__entry)
-			self.__entry = {}
-			self.__change_parse_state(self.__parse_key)
-			return True
-		return False
 
-	def __parse_key(self, char):
-		if not self.__parse_common(char):
-			if char == "=":
-				self.__change_parse_state(self.__parse_value)
-			else:
-				self.__key_name += char
-
-	def __parse_value(self, char):
-		if not self.__parse_common(char):
-			if char == "\\" and not self.__escaping:
-				self.__escaping = True
-			elif self.__escaping:
-				self.__key_value += self.__UNESCAPE_LOOKUP[char]
-				self.__escaping = False
-			else:
-				self.__key_value += char
-
-	def __change_parse_state(self, parse_func):
-		if parse_func == self.__parse_key:
-			self.__key_name = ""
-			self.__key_value = ""
-			self.__escaping = False
-		self.__char_parser = parse_func
-
-class LineEnd(object):
-	pass
+	Entries are separated with pipe (|), parameters within an entry with space
+	( ) and parameter's key from its value with first equal sign (=). Escaped
+	pipes and spaces never appear as raw characters, so plain splitting is
+	safe and only values containing a backslash need unescaping.
+	'''
+	entries = []
+	for entry_str in data.split("|"):
+		entry = {}
+		for param in entry_str.split(" "):
+			key, _, value = param.partition("=")
+			if "\\" in value:
+				value = _UNESCAPE_PATTERN.sub(_unescape_match, value)
+			entry[key] = value
+		entries.append(entry)
+	return entries
+
+def parse_notify_line(line):
+	'''Parses a line if it is a notify event. Returns tuple of event name and
+	its arguments (None if no arguments), or None if the line is something else.
+	'''
+	results = line.split(None, 1)
+	if results and results[0].startswith("notify"):
+		if len(results) == 1:
+			return results[0], None
+		return results[0], parse_arguments(results[1])
+	return None
 
 class ClientQueryEventsMixin(object):
 	'''Mixin class which provides ability to send to register and listen for
@@ -469,14 +712,23 @@ class ClientQueryEventsMixin(object):
 	def __on_disconnected(self):
 		del self.__registered_events[:]
 
-	def __on_line_received(self, line):
-		results = line.split(None, 1)
-		if self.is_valid_event(results[0]):
-			if len(results) == 1:
-				self.emit(results[0])
-			else:
-				self.emit(results[0], parse_arguments(results[1]))
-			raise StopIteration()
+	def __on_line_received(self, line, parsed=None):
+		if parsed is None:
+			results = line.split(None, 1)
+			if self.is_valid_event(results[0]):
+				if len(results) == 1:
+					self.emit(results[0])
+				else:
+					self.emit(results[0], parse_arguments(results[1]))
+				raise StopIteration()
+		else:
+			name, args = parsed
+			if self.is_valid_event(name):
+				if args is None:
+					self.emit(name)
+				else:
+					self.emit(name, args)
+				raise StopIteration()
 
 class ClientQueryServerConnectionMixin(object):
 	'''Mixin class which provides basic server connection info and events.
@@ -565,12 +817,53 @@ class ClientQueryServerConnectionMixin(object):
 				data["cid"] = int(args[0]["ctid"])
 				self.emit("my-cid-changed", schandlerid)
 
+def _to_bool(value):
+	return bool(int(value))
+
+class ClientQueryUser(object):
+	'''Record of a single user on a TeamSpeak server.'''
+
+	__slots__ = ("schandlerid", "clid", "cid", "client_nickname", "client_unique_identifier",
+		"client_meta_data", "talking", "my_channel", "is_me")
+
+	def __init__(self, schandlerid, clid):
+		self.schandlerid = schandlerid
+		self.clid = clid
+		self.cid = None
+		self.client_nickname = None
+		self.client_unique_identifier = None
+		self.client_meta_data = None
+		self.talking = None
+		self.my_channel = None
+		self.is_me = None
+
+def _user_field(attribute, converter=None):
+	'''Returns tuple of user record's "attribute", name of the event emitted
+	when the attribute changes and "converter" for values received from
+	ClientQuery.
+	'''
+	return (attribute, "user-changed-" + attribute.replace("_", "-"), converter)
+
 class ClientQueryServerUsersMixin(object):
 
-	__USER_VALUE_CONVERTERS = {
-		"cid": lambda x: int(x),
-		"talking": lambda x: bool(int(x))
+	# amount of clients whose metadata is requested with a single command
+	CLIENT_METADATA_BATCH_SIZE = 50
+
+	# maps ClientQuery's parameter names to user record fields, other
+	# parameters are ignored
+	__USER_FIELDS = {
+		"cid": _user_field("cid", int),
+		"client_nickname": _user_field("client_nickname"),
+		"client_unique_identifier": _user_field("client_unique_identifier"),
+		"client_meta_data": _user_field("client_meta_data"),
+		"talking": _user_field("talking", _to_bool)
 	}
+	__MY_CHANNEL_FIELD = _user_field("my_channel")
+	__IS_ME_FIELD = _user_field("is_me")
+
+	# maps parameter names accepted by get_user_parameter() to attributes
+	__USER_PARAMETERS = dict((alias, name) for name in ClientQueryUser.__slots__
+		for alias in (name, name.replace("_", "-")))
 
 	def __init__(self):
 		super(ClientQueryServerUsersMixin, self).__init__()
@@ -591,9 +884,18 @@ class ClientQueryServerUsersMixin(object):
 			return clid in self.__scusers[schandlerid]
 		return False
 
+	def get_user(self, schandlerid, clid):
+		'''Returns ClientQueryUser record of a user, or None if there is no
+		such user.
+		'''
+		return self.__scusers.get(schandlerid, {}).get(clid, None)
+
 	def get_user_parameter(self, schandlerid, clid, parameter):
-		user = self.__scusers.get(schandlerid, {}).get(clid, {})
-		return user.get(parameter, None)
+		user = self.__scusers.get(schandlerid, {}).get(clid, None)
+		attribute = self.__USER_PARAMETERS.get(parameter, None)
+		if user is None or attribute is None:
+			return None
+		return getattr(user, attribute)
 
 	def iter_user_ids(self):
 		for schandlerid in self.__scusers:
@@ -630,20 +932,35 @@ class ClientQueryServerUsersMixin(object):
 		if error:
 			log.LOG_ERROR("clientlist command failed", error)
 		else:
+			schandlerid = result["schandlerid"]
+			clids = []
 			for client in result["clients"]:
-				self.__set_server_user(schandlerid=result["schandlerid"], **client)
-				self.command_clientvariable(
-					schandlerid=result["schandlerid"],
-					clid=client["clid"],
-					variablename="client_meta_data",
-					callback=self.__on_get_client_metadata_finish
-				)
-
-	def __on_get_client_metadata_finish(self, error, result):
+				self.__set_server_user(schandlerid=schandlerid, **client)
+				clids.append(client["clid"])
+			batch_size = self.CLIENT_METADATA_BATCH_SIZE
+			for index in range(0, len(clids), batch_size):
+				self.__get_clients_metadata(schandlerid, clids[index:index+batch_size])
+
+	def __get_clients_metadata(self, schandlerid, clids):
+		self.command_clientvariables(
+			schandlerid=schandlerid,
+			clids=clids,
+			variablename="client_meta_data",
+			callback=partial(self.__on_get_clients_metadata_finish, schandlerid, clids)
+		)
+
+	def __on_get_clients_metadata_finish(self, schandlerid, clids, error, results):
 		if error:
-			log.LOG_ERROR("Failed to get client's metadata", error)
+			if len(clids) > 1:
+				# whole batch fails if any of the clients has left the server in
+				# the meantime, fall back to requesting each client separately
+				for clid in clids:
+					self.__get_clients_metadata(schandlerid, [clid])
+			else:
+				log.LOG_ERROR("Failed to get client's metadata", error)
 		else:
-			self.__set_server_user(**result)
+			for result in results:
+				self.__set_server_user(**result)
 
 	def __on_notifycliententerview(self, args):
 		input = args[0]
@@ -654,8 +971,7 @@ class ClientQueryServerUsersMixin(object):
 		self.__remove_server_user(**args[0])
 
 	def __on_notifytalkstatuschange(self, args):
-		args[0]["talking"] = args[0]["status"]
-		self.__set_server_user(**args[0])
+		self.__set_server_user(schandlerid=args[0]["schandlerid"], clid=args[0]["clid"], talking=args[0]["status"])
 
 	def __on_notifyclientmoved(self, args):
 		input = args[0]
@@ -668,41 +984,34 @@ class ClientQueryServerUsersMixin(object):
 	def __set_server_user(self, schandlerid, clid, **kwargs):
 		schandlerid = int(schandlerid)
 		clid = int(clid)
-		if schandlerid not in self.__scusers:
+		users = self.__scusers.get(schandlerid, None)
+		if users is None:
 			return
-		users = self.__scusers[schandlerid]
-		exists = clid in users
-		if exists:
-			user = users[clid]
-		else:
-			user = users[clid] = {
-				"schandlerid": schandlerid,
-				"clid": clid,
-				"cid": None,
-				"client-nickname": None,
-				"client-unique-identifier": None,
-				"client-meta-data": None,
-				"talking": None,
-				"my-channel": None,
-				"is-me": None
-			}
+		user = users.get(clid, None)
+		exists = user is not None
+		if not exists:
+			user = users[clid] = ClientQueryUser(schandlerid, clid)
 
+		fields = self.__USER_FIELDS
 		for key, value in kwargs.iteritems():
-			self.__set_user_value(user, key, value, user_exists=exists)
-		self.__set_user_value(user, "my-channel", user["cid"] == self.get_my_cid(schandlerid), user_exists=exists)
-		self.__set_user_value(user, "is-me", user["clid"] == self.get_my_clid(schandlerid), user_exists=exists)
+			field = fields.get(key, None)
+			if field is not None:
+				self.__set_user_value(user, field, value, exists)
+		self.__set_user_value(user, self.__MY_CHANNEL_FIELD, user.cid == self.get_my_cid(schandlerid), exists)
+		self.__set_user_value(user, self.__IS_ME_FIELD, clid == self.get_my_clid(schandlerid), exists)
 
 		if not exists:
 			self.emit("user-added", schandlerid=schandlerid, clid=clid)
 
-	def __set_user_value(self, user, key, value, user_exists):
-		key = key.replace("_", "-")
-		old_value = user.get(key, None)
-		new_value = self.__USER_VALUE_CONVERTERS.get(key, lambda x: x)(value)
-		if new_value != old_value:
-			user[key] = new_value
+	def __set_user_value(self, user, field, value, user_exists):
+		attribute, event, converter = field
+		if converter is not None:
+			value = converter(value)
+		old_value = getattr(user, attribute)
+		if value != old_value:
+			setattr(user, attribute, value)
 			if user_exists:
-				self.emit("user-changed-"+key, schandlerid=user["schandlerid"], clid=user["clid"], old_value=old_value, new_value=new_value)
+				self.emit(event, schandlerid=user.schandlerid, clid=user.clid, old_value=old_value, new_value=value)
 
 	def __remove_server_user(self, schandlerid, clid, **kwargs):
 		schandlerid = int(schandlerid)
@@ -739,6 +1048,23 @@ class ClientQueryCommandsImplMixin(object):
 			callback(error, None)
 		self.send_command("clientvariable", [{"clid": clid, variablename: None}], schandlerid=schandlerid).on("result", on_success).on("error", on_error)
 
+	def command_clientvariables(self, clids, variablename, schandlerid=None, callback=noop):
+		'''Requests variable "variablename" for all clients in "clids" with a
+		single command. Callback receives a list of results, one per client.
+		'''
+		def on_success(result):
+			rets = []
+			for args in result["args"]:
+				ret = {"schandlerid": schandlerid}
+				ret.update(args)
+				rets.append(ret)
+			callback(None, rets)
+		def on_error(error):
+			callback(error, None)
+		input = [{"clid": clid} for clid in clids]
+		input[-1] = collections.OrderedDict([("clid", clids[-1]), (variablename, None)])
+		self.send_command("clientvariable", input, schandlerid=schandlerid).on("result", on_success).on("error", on_error)
+
 	def command_clientupdate(self, variablename, variablevalue, schandlerid=None, callback=noop):
 		def on_success(result):
 			callback(None, {"schandlerid": schandlerid})
@@ -795,12 +1121,74 @@ class ClientQuery(ClientQueryConnectionMixin, EventEmitterMixin, TimerMixin, Cli
 	ClientQueryCommandsImplMixin, ClientQueryEventsMixin, ClientQueryServerConnectionMixin,
 	ClientQueryServerUsersMixin):
 
+	# smallest interval the polling backs off to from interval of zero
+	MIN_BACKOFF_INTERVAL = 0.01
+
 	def __init__(self):
 		super(ClientQuery, self).__init__()
+		self.__min_interval = 0
+		self.__max_interval = 0
+		self.__interval = 0
+		self.__activity = False
+		self.__check_count = 0
+		self.__idle_check_count = 0
+		# must see the lines before ClientQueryEventsMixin, which consumes
+		# notify-lines with priority of 1
+		self.on("line-received", self.__on_line_received, priority=2)
+
+	def start_event_checking(self, interval, max_interval=None):
+		'''Starts checking for received data with given "interval".
+
+		While nothing is received and no commands are waiting for responses
+		the interval is doubled on each check, up to "max_interval". When data
+		arrives or a command is sent the interval snaps back to "interval".
+		Without "max_interval" the checking is done with fixed interval.
+
+		With reader thread enabled the data is already waiting in a queue, so
+		the queue is checked on every frame regardless of the intervals.
+		'''
+		if self.is_reader_thread_enabled():
+			interval = max_interval = 0
+		if max_interval is None:
+			max_interval = interval
+		self.__min_interval = interval
+		self.__max_interval = max(interval, max_interval)
+		self.__interval = interval
+		self.__schedule_check()
+
+	def get_event_checking_stats(self):
+		'''Returns dict of event checking counters, including the currently
+		effective polling interval.
+		'''
+		return {
+			"interval": self.__interval,
+			"min-interval": self.__min_interval,
+			"max-interval": self.__max_interval,
+			"checks": self.__check_count,
+			"idle-checks": self.__idle_check_count
+		}
+
+	def send_command(self, command, input, schandlerid=None):
+		result = super(ClientQuery, self).send_command(command, input, schandlerid)
+		if self.__interval > self.__min_interval:
+			self.__interval = self.__min_interval
+			self.__schedule_check()
+		return result
 
-	def start_event_checking(self, interval):
+	def __schedule_check(self):
 		self.off_timeout(self.__check_events)
-		self.on_timeout(interval, self.__check_events, repeat=True)
+		self.on_timeout(self.__interval, self.__check_events)
 
 	def __check_events(self):
+		self.__activity = False
 		self.emit("check-events")
+		self.__check_count += 1
+		if self.__activity or self.has_pending_commands():
+			self.__interval = self.__min_interval
+		else:
+			self.__idle_check_count += 1
+			self.__interval = min(max(self.__interval * 2, self.MIN_BACKOFF_INTERVAL), self.__max_interval)
+		self.__schedule_check()
+
+	def __on_line_received(self, line, parsed=None):
+		self.__activity = True
@@ -15,13 +15,53 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
+import bisect
+import collections
+import time
+
 import log
+import metrics
+
+def _handler_key(function):
+	'''Returns key by which event handler 'function' is stored. Bound methods
+	of unhashable objects (e.g. list.append) are keyed by their object's
+	identity.
+	'''
+	try:
+		hash(function)
+		return function
+	except TypeError:
+		return (id(function.__self__), function.__name__)
+
+class _OnceListener(object):
+	'''Wraps an event handler registered with once(), unregistering it on
+	first call.
+	'''
+
+	def __init__(self, emitter, event, function):
+		self.emitter = emitter
+		self.event = event
+		self.function = function
+
+	def __call__(self, *args, **kwargs):
+		self.emitter.off(self.event, self.function)
+		self.function(*args, **kwargs)
 
 class EventEmitterMixin(object):
-	'''Mixin class which provides ability to emit and receive send events.'''
+	'''Mixin class which provides ability to emit and receive send events.
+
+	Event handlers are kept in ordered buckets per priority, and priorities
+	of each event in a descending list. Priority of each handler is kept by
+	event, so that a handler can be found from its bucket without searching.
+	Emitting an event calls handlers from a tuple which is built on first
+	emit and cached until handlers of that event are changed.
+	'''
 
 	def __init__(self):
-		self.__listeners = {}
+		self.__buckets = {}
+		self.__priorities = {}
+		self.__handler_priorities = {}
+		self.__dispatch_cache = {}
 		super(EventEmitterMixin, self).__init__()
 
 	def emit(self, event, *args, **kwargs):
@@ -30,25 +70,86 @@ class EventEmitterMixin(object):
 
 		Raising StopIteration exception from inside event handler prevents
 		calling of any further event handlers.
-		''' 
-		if event in self.__listeners:
-			for priority, function in self.__listeners[event]:
-				try:
+		'''
+		try:
+			listeners = self.__dispatch_cache[event]
+		except KeyError:
+			listeners = self.__build_dispatch(event)
+		if not listeners:
+			return
+		measured = metrics.ENABLED
+		if measured:
+			started = time.time()
+		# exceptions are rare, so instead of guarding each handler separately
+		# whole loop is guarded and the iteration continues after an error
+		iterator = iter(listeners)
+		while True:
+			try:
+				for function in iterator:
 					function(*args, **kwargs)
-				except StopIteration:
-					return
-				except Exception:
-					log.LOG_CURRENT_EXCEPTION()
+				break
+			except StopIteration:
+				break
+			except Exception:
+				log.LOG_CURRENT_EXCEPTION()
+		if measured:
+			metrics.histogram("event-emit", event).observe(time.time() - started)
 
 	def on(self, event, function, priority=0):
 		'''Registers an event handler "function" for "event".
 		When event is emitted each registered event handler is called in the
 		order of "priority".
 		Calling order of event handlers with same "priority" is undefined.
+		Registering same "function" again for "event" replaces the previous
+		registration.
+		'''
+		assert callable(function)
+		self.__add(event, function, function, priority)
+		return self
+
+	def once(self, event, function, priority=0):
+		'''Same as on(), but the event handler is unregistered after it
+		has been called once.
 		'''
 		assert callable(function)
-		if event not in self.__listeners:
-			self.__listeners[event] = []
-		self.__listeners[event].append((priority, function))
-		self.__listeners[event].sort(reverse=True, key=lambda listener: listener[0])
+		self.__add(event, function, _OnceListener(self, event, function), priority)
+		return self
+
+	def off(self, event, function):
+		'''Unregisters event handler "function" from "event", which was
+		previously registered with on() or once().
+		'''
+		key = _handler_key(function)
+		try:
+			priority = self.__handler_priorities[event].pop(key)
+		except KeyError:
+			return self
+		buckets = self.__buckets[event]
+		del buckets[priority][key]
+		if not buckets[priority]:
+			del buckets[priority]
+			self.__priorities[event].remove(-priority)
+		self.__dispatch_cache.pop(event, None)
 		return self
+
+	def __add(self, event, function, listener, priority):
+		key = _handler_key(function)
+		handler_priorities = self.__handler_priorities.setdefault(event, {})
+		if key in handler_priorities:
+			self.off(event, function)
+		buckets = self.__buckets.setdefault(event, {})
+		if priority not in buckets:
+			buckets[priority] = collections.OrderedDict()
+			# priorities are stored negated to keep them in descending order
+			bisect.insort(self.__priorities.setdefault(event, []), -priority)
+		buckets[priority][key] = listener
+		handler_priorities[key] = priority
+		self.__dispatch_cache.pop(event, None)
+
+	def __build_dispatch(self, event):
+		listeners = ()
+		if event in self.__buckets:
+			buckets = self.__buckets[event]
+			listeners = tuple(listener for priority in self.__priorities[event] for listener in buckets[-priority].itervalues())
+		self.__dispatch_cache[event] = listeners
+		return listeners
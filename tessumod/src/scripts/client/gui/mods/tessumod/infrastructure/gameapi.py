@@ -34,6 +34,7 @@ import VOIP
 from VOIP.VOIPManager import VOIPManager
 import BattleReplay
 import ResMgr
+from PlayerEvents import g_playerEvents
 
 from functools import partial
 from traceback import format_exception
@@ -85,45 +86,15 @@ class EventLoop(object):
 	def cancel_callback(cls, id):
 		BigWorld.cancelCallback(id)
 
-	@classmethod
-	def create_callback_repeater(cls, function):
-		return _EventRepeater(function)
-
-class _EventRepeater(object):
-
-	def __init__(self, function):
-		self.__id       = None
-		self.__timeout  = None
-		self.__started  = False
-		self.__function = function
-
-	def start(self, timeout):
-		self.__timeout = timeout
-		self.stop()
-		self.__start_callback()
-		self.__started  = True
-
-	def __start_callback(self):
-		if self.__id is None:
-			self.__id = EventLoop.callback(self.__timeout, self.__on_timeout)
-
-	def stop(self):
-		if self.__id is not None:
-			EventLoop.cancel_callback(self.__id)
-			self.__id = None
-		self.__started = False
-
-	def is_active(self):
-		return self.__started
-
-	def __on_timeout(self):
-		self.__id = None
-		self.__function()
-		if self.__started:
-			self.__start_callback()
-
 class Battle(object):
 
+	# index of vehicle IDs by account dbid, built for arena in
+	# '__indexed_arena' and updated on arena's vehicle events
+	__indexed_arena = None
+	__indexed_vehicle_count = 0
+	__vehicle_ids_by_dbid = {}
+	__vehicle_list_version = 0
+
 	@classmethod
 	def get_camera_position(cls):
 		camera = BigWorld.camera()
@@ -163,6 +134,121 @@ class Battle(object):
 			pass
 		return None
 
+	@classmethod
+	def find_vehicle_id_by_dbid(cls, dbid):
+		'''Returns 'vehicle_id' of vehicle owned by player with account 'dbid'.
+		Returns None if not found.
+		'''
+		arena = cls.__get_indexed_arena()
+		if arena is None:
+			return None
+		vehicle_id = cls.__vehicle_ids_by_dbid.get(dbid, None)
+		if vehicle_id is None:
+			if len(arena.vehicles) == cls.__indexed_vehicle_count:
+				return None
+		elif vehicle_id in arena.vehicles and arena.vehicles[vehicle_id]["accountDBID"] == dbid:
+			return vehicle_id
+		# vehicle list has been changed without an event
+		cls.__rebuild_vehicle_index()
+		return cls.__vehicle_ids_by_dbid.get(dbid, None)
+
+	@classmethod
+	def get_vehicle_list_version(cls):
+		'''Returns a number which changes whenever players' vehicles change
+		in current arena, or the arena changes. Returns None if there is no
+		arena.
+		'''
+		arena = cls.__get_indexed_arena()
+		if arena is None:
+			return None
+		if len(arena.vehicles) != cls.__indexed_vehicle_count:
+			cls.__rebuild_vehicle_index()
+		return cls.__vehicle_list_version
+
+	@classmethod
+	def index_vehicles(cls):
+		'''Starts indexing vehicles of current arena, so that changes to them
+		are notified with Player.onRosterChanged.
+		'''
+		cls.__get_indexed_arena()
+
+	@classmethod
+	def clear_vehicle_index(cls):
+		'''Releases the index and arena it was built for.'''
+		cls.__stop_indexing()
+		cls.__indexed_vehicle_count = 0
+		cls.__vehicle_ids_by_dbid = {}
+
+	@classmethod
+	def __get_indexed_arena(cls):
+		try:
+			arena = BigWorld.player().arena
+		except AttributeError:
+			return None
+		if arena is not cls.__indexed_arena:
+			cls.__start_indexing(arena)
+		return arena
+
+	@classmethod
+	def __start_indexing(cls, arena):
+		cls.__stop_indexing()
+		cls.__indexed_arena = arena
+		arena.onNewVehicleListReceived += cls.__on_new_vehicle_list_received
+		arena.onVehicleAdded += cls.__on_vehicle_added
+		arena.onVehicleUpdated += cls.__on_vehicle_updated
+		cls.__rebuild_vehicle_index()
+		cls.__vehicle_list_changed()
+
+	@classmethod
+	def __stop_indexing(cls):
+		arena = cls.__indexed_arena
+		if arena is not None:
+			arena.onNewVehicleListReceived -= cls.__on_new_vehicle_list_received
+			arena.onVehicleAdded -= cls.__on_vehicle_added
+			arena.onVehicleUpdated -= cls.__on_vehicle_updated
+		cls.__indexed_arena = None
+
+	@classmethod
+	def __rebuild_vehicle_index(cls):
+		vehicles = cls.__indexed_arena.vehicles
+		vehicle_ids_by_dbid = dict((vehicles[id]["accountDBID"], id) for id in vehicles)
+		cls.__indexed_vehicle_count = len(vehicles)
+		if vehicle_ids_by_dbid != cls.__vehicle_ids_by_dbid:
+			cls.__vehicle_ids_by_dbid = vehicle_ids_by_dbid
+			cls.__vehicle_list_changed()
+
+	@classmethod
+	def __index_vehicle(cls, vehicle_id):
+		vehicles = cls.__indexed_arena.vehicles
+		cls.__indexed_vehicle_count = len(vehicles)
+		if vehicle_id not in vehicles:
+			return
+		dbid = vehicles[vehicle_id]["accountDBID"]
+		# updates are mostly of vehicle's state, which doesn't affect players
+		if cls.__vehicle_ids_by_dbid.get(dbid, None) != vehicle_id:
+			cls.__vehicle_ids_by_dbid[dbid] = vehicle_id
+			cls.__vehicle_list_changed()
+
+	@classmethod
+	def __vehicle_list_changed(cls):
+		cls.__vehicle_list_version += 1
+		Player.onRosterChanged()
+
+	@classmethod
+	def __on_new_vehicle_list_received(cls, *args):
+		if cls.__indexed_arena is not None:
+			cls.__rebuild_vehicle_index()
+
+	@classmethod
+	def __on_vehicle_added(cls, vehicle_id, *args):
+		if cls.__indexed_arena is not None:
+			cls.__index_vehicle(vehicle_id)
+
+	@classmethod
+	def __on_vehicle_updated(cls, vehicle_id, *args):
+		if cls.__indexed_arena is not None:
+			cls.__index_vehicle(vehicle_id)
+
 	@classmethod
 	def get_vehicle(cls, vehicle_id):
 		'''Returns vehicle info with matching 'vehicle_id' if available.
@@ -177,12 +263,15 @@ class Battle(object):
 
 class Player(object):
 
+	# called whenever get_roster_version() changes
+	onRosterChanged = Event()
+
 	@classmethod
 	def get_player_by_dbid(cls, dbid):
 		'''Extracts player information with matching account 'dbid' from
 		various locations.
 		'''
-		vehicle_id = Battle.find_vehicle_id(lambda v: v["accountDBID"] == dbid)
+		vehicle_id = Battle.find_vehicle_id_by_dbid(dbid)
 		if vehicle_id is not None:
 			vehicle = Battle.get_vehicle(vehicle_id)
 			return dict(id=dbid, name=vehicle["name"], in_battle=True, vehicle_id=vehicle_id, is_alive=vehicle["isAlive"])
@@ -191,6 +280,13 @@ class Player(object):
 			return dict(id=dbid, name=info["name"], in_battle=False)
 		return None
 
+	@classmethod
+	def get_roster_version(cls):
+		'''Returns a value which changes whenever players in battle or
+		prebattle rosters change.
+		'''
+		return (Battle.get_vehicle_list_version(), g_prebattleListener.get_version())
+
 	@classmethod
 	def get_my_name(cls):
 		'''Returns current player's nickname. None if not available.'''
@@ -226,6 +322,7 @@ class Player(object):
 	@classmethod
 	def get_players(cls, in_battle=False, in_prebattle=False, clanmembers=False, friends=False):
 		yielded_names = []
+		debug = log.is_enabled(log.LOG_LEVEL.DEBUG)
 
 		if in_battle:
 			try:
@@ -233,42 +330,50 @@ class Player(object):
 				names = []
 				for id in vehicles:
 					vehicle = vehicles[id]
-					names.append(vehicle["name"])
+					if debug:
+						names.append(vehicle["name"])
 					if vehicle["name"] not in yielded_names:
 						yield dict(name=vehicle["name"], id=vehicle["accountDBID"], in_battle=True)
 						yielded_names.append(vehicle["name"])
-				log.LOG_DEBUG("Found players from battle", names)
+				if debug:
+					log.LOG_DEBUG("Found players from battle", names)
 			except AttributeError:
 				pass
 
 		if in_prebattle:
 			names = []
 			for player in g_prebattleListener.get_players():
-				names.append(player["name"])
+				if debug:
+					names.append(player["name"])
 				if player["name"] not in yielded_names:
 					yield dict(player, in_battle=False)
 					yielded_names.append(player["name"])
-			log.LOG_DEBUG("Found players from prebattle", names)
+			if debug:
+				log.LOG_DEBUG("Found players from prebattle", names)
 
 		users_storage = storage_getter('users')()
 
 		if clanmembers:
 			names = []
 			for member in users_storage.getClanMembersIterator(False):
-				names.append(member.getName())
+				if debug:
+					names.append(member.getName())
 				if member.getName() not in yielded_names:
 					yield dict(name=member.getName(), id=member.getID(), in_battle=False)
 					yielded_names.append(member.getName())
-			log.LOG_DEBUG("Found clan members", names)
+			if debug:
+				log.LOG_DEBUG("Found clan members", names)
 
 		if friends:
 			names = []
 			for friend in users_storage.getList(FriendsFindCriteria()):
-				names.append(friend.getName())
+				if debug:
+					names.append(friend.getName())
 				if friend.getName() not in yielded_names:
 					yield dict(name=friend.getName(), id=friend.getID(), in_battle=False)
 					yielded_names.append(friend.getName())
-			log.LOG_DEBUG("Found friends", names)
+			if debug:
+				log.LOG_DEBUG("Found friends", names)
 
 class Notifications(object):
 
@@ -414,32 +519,20 @@ class VoiceChat(object):
 			return patch_function(self, original_method, dbid)
 		VOIPManager.isParticipantTalking = wrapper_isParticipantTalking
 
-class MinimapMarkerAnimation(object):
-
-	def __init__(self, vehicle_id, interval, action, on_done):
-		self.__interval   = interval
-		self.__action     = action
-		self.__vehicle_id = vehicle_id
-		self.__on_done    = on_done
-		self.__timer      = EventLoop.create_callback_repeater(self.__updateMinimap)
-
-	def start(self):
-		if not self.__timer.is_active():
-			self.__timer.start(self.__interval)
-			self.__updateMinimap()
-
-	def stop(self):
-		self.__timer.stop()
+class Minimap(object):
 
-	def __updateMinimap(self):
-		if self.__timer.is_active():
-			try:
-				g_sessionProvider.shared.feedback.onMinimapFeedbackReceived(
-					FEEDBACK_EVENT_ID.MINIMAP_SHOW_MARKER, self.__vehicle_id, self.__action)
-			except AttributeError:
-				log.LOG_CURRENT_EXCEPTION()
-		else:
-			self.__on_done(self.__vehicle_id)
+	@classmethod
+	def show_markers(cls, vehicle_ids, action):
+		'''Starts marker animation of given 'action' on minimap for each
+		vehicle in 'vehicle_ids'.
+		'''
+		try:
+			feedback_received = g_sessionProvider.shared.feedback.onMinimapFeedbackReceived
+		except AttributeError:
+			log.LOG_CURRENT_EXCEPTION()
+			return
+		for vehicle_id in vehicle_ids:
+			feedback_received(FEEDBACK_EVENT_ID.MINIMAP_SHOW_MARKER, vehicle_id, action)
 
 class Environment(object):
 
@@ -467,15 +560,22 @@ class PrebattleListener(GlobalListener):
 
 	def __init__(self):
 		self.__players = {}
+		self.__version = 0
 
 	def get_players(self):
 		return self.__players.values()
 
+	def get_version(self):
+		'''Returns a number which changes whenever the players change.'''
+		return self.__version
+
 	def onPrbFunctionalFinished(self):
 		self.__players.clear()
+		self.__players_changed()
 
 	def onUnitFunctionalFinished(self):
 		self.__players.clear()
+		self.__players_changed()
 
 	def onPlayerAdded(self, functional, info):
 		self.__add_player_info(info)
@@ -488,9 +588,17 @@ class PrebattleListener(GlobalListener):
 
 	def __add_player_info(self, info):
 		self.__players[info.dbID] = dict(id=info.dbID, name=info.name)
+		self.__players_changed()
+
+	def __players_changed(self):
+		self.__version += 1
+		Player.onRosterChanged()
 
 g_prebattleListener = PrebattleListener()
 
+g_playerEvents.onAvatarBecomePlayer += Battle.index_vehicles
+g_playerEvents.onAvatarBecomeNonPlayer += Battle.clear_vehicle_index
+
 def PrbControlLoader_onAccountShowGUI(original):
 	def decorator(self, ctx):
 		original(self, ctx)
@@ -26,6 +26,20 @@ class LOG_LEVEL(object):
 
 CURRENT_LOG_LEVEL = LOG_LEVEL.NOTE
 
+def set_level(level):
+	'''Sets minimum level of messages which are logged.'''
+	global CURRENT_LOG_LEVEL
+	CURRENT_LOG_LEVEL = level
+
+def is_enabled(level):
+	'''Returns True if messages of given level are logged.
+
+	Values passed as extra arguments to LOG_* functions are formatted only
+	if the message is logged. When the message itself needs to be built,
+	check this first to avoid building messages which are never logged.
+	'''
+	return CURRENT_LOG_LEVEL <= level
+
 def install_logger_impl(impl):
 	global LOG_DEBUG, LOG_DEBUG, LOG_NOTE, LOG_WARNING, LOG_ERROR, LOG_CURRENT_EXCEPTION
 	LOG_DEBUG = impl.debug
@@ -0,0 +1,161 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import bisect
+import time
+
+# Checked by instrumented code before measuring anything, keeps overhead of
+# disabled metrics to a single attribute lookup
+ENABLED = False
+
+# upper bounds (in seconds) of histogram buckets used for durations
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_g_instruments = {}
+_g_started_time = time.time()
+
+def set_enabled(enabled):
+	'''Enables or disables collecting of metrics. Enabling resets previously
+	collected values.
+	'''
+	global ENABLED
+	if enabled and not ENABLED:
+		reset()
+	ENABLED = enabled
+
+def is_enabled():
+	return ENABLED
+
+def counter(name, label=None):
+	'''Returns counter of given "name" and optional "label", e.g. name of an
+	event. Creates the counter on first call.
+	'''
+	return _get_instrument(Counter, name, label)
+
+def gauge(name, label=None):
+	'''Returns gauge of given "name" and optional "label".'''
+	return _get_instrument(Gauge, name, label)
+
+def histogram(name, label=None):
+	'''Returns duration histogram of given "name" and optional "label".'''
+	return _get_instrument(Histogram, name, label)
+
+def _get_instrument(cls, name, label):
+	key = (cls, name, label)
+	try:
+		return _g_instruments[key]
+	except KeyError:
+		instrument = _g_instruments[key] = cls()
+		return instrument
+
+def reset():
+	'''Resets values of all instruments.'''
+	global _g_started_time
+	_g_started_time = time.time()
+	for instrument in _g_instruments.itervalues():
+		instrument.reset()
+
+def get_snapshot():
+	'''Returns values of all instruments as a dict which can be serialized
+	to JSON. Each instrument is keyed by its name, and by its label within
+	the name if it has one. A name should be used either always with or
+	always without a label.
+	'''
+	now = time.time()
+	snapshot = {
+		"time": now,
+		"elapsed": now - _g_started_time,
+		"counters": {},
+		"gauges": {},
+		"histograms": {}
+	}
+	for (cls, name, label), instrument in _g_instruments.iteritems():
+		values = snapshot[instrument.SNAPSHOT_KEY]
+		if label is None:
+			values[name] = instrument.get_value()
+		else:
+			values.setdefault(name, {})[str(label)] = instrument.get_value()
+	return snapshot
+
+class Counter(object):
+	'''Counts occurrences of something, e.g. received lines.'''
+
+	__slots__ = ("value",)
+	SNAPSHOT_KEY = "counters"
+
+	def __init__(self):
+		self.reset()
+
+	def inc(self, amount=1):
+		self.value += amount
+
+	def reset(self):
+		self.value = 0
+
+	def get_value(self):
+		return self.value
+
+class Gauge(object):
+	'''Holds latest value of something, e.g. size of a queue.'''
+
+	__slots__ = ("value",)
+	SNAPSHOT_KEY = "gauges"
+
+	def __init__(self):
+		self.reset()
+
+	def set(self, value):
+		self.value = value
+
+	def reset(self):
+		self.value = 0
+
+	def get_value(self):
+		return self.value
+
+class Histogram(object):
+	'''Counts observed durations (in seconds) in fixed LATENCY_BUCKETS,
+	and keeps their count, sum and maximum.
+	'''
+
+	__slots__ = ("counts", "count", "sum", "max")
+	SNAPSHOT_KEY = "histograms"
+
+	def __init__(self):
+		self.reset()
+
+	def observe(self, value):
+		# last bucket counts values over the largest bound
+		self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+		self.count += 1
+		self.sum += value
+		if value > self.max:
+			self.max = value
+
+	def reset(self):
+		self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+		self.count = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+	def get_value(self):
+		return {
+			"count": self.count,
+			"sum": self.sum,
+			"max": self.max,
+			"buckets": [[bound, count] for bound, count in zip(LATENCY_BUCKETS + (None,), self.counts)]
+		}
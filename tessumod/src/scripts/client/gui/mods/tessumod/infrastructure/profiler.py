@@ -0,0 +1,103 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import sys
+import time
+import threading
+
+PACKAGE_DIRPATH = os.path.dirname(os.path.dirname(__file__))
+
+def _normalize_path(path):
+	return path.replace("\\", "/")
+
+class SamplingProfiler(threading.Thread):
+	'''Thread which periodically samples Python stack of another thread,
+	keeping only frames of files within "root_dirpath" (by default the mod's
+	package). Samples with equal stacks are counted together and can be
+	output in collapsed stack format, which is understood by flame graph
+	tools (e.g. flamegraph.pl or speedscope).
+
+	Sampling happens in this thread, the sampled thread is not slowed down
+	apart from sharing the GIL.
+	'''
+
+	def __init__(self, thread_id, interval=0.01, root_dirpath=PACKAGE_DIRPATH):
+		super(SamplingProfiler, self).__init__(name="TessuModProfiler")
+		self.daemon = True
+		self.__thread_id = thread_id
+		self.__interval = interval
+		self.__root_dirpath = _normalize_path(root_dirpath).rstrip("/") + "/"
+		self.__labels = {}
+		self.__stack_counts = {}
+		self.__sample_count = 0
+		self.__lock = threading.Lock()
+		self.__stopped = False
+
+	def stop(self):
+		self.__stopped = True
+
+	def get_sample_count(self):
+		'''Returns number of taken samples, including those which had no
+		frames within root dirpath.
+		'''
+		return self.__sample_count
+
+	def get_stack_counts(self):
+		'''Returns dict of sampled stacks (tuples of frame labels from
+		outermost to innermost) and their sample counts.
+		'''
+		with self.__lock:
+			return dict(self.__stack_counts)
+
+	def get_collapsed_stacks(self):
+		'''Returns sampled stacks in collapsed stack format, one stack per
+		line with frames separated by semicolons followed by sample count.
+		'''
+		return ["{0} {1}".format(";".join(stack), count) for stack, count in sorted(self.get_stack_counts().iteritems())]
+
+	def run(self):
+		while not self.__stopped:
+			self.__sample()
+			time.sleep(self.__interval)
+
+	def __sample(self):
+		frame = sys._current_frames().get(self.__thread_id)
+		if frame is None:
+			return
+		stack = []
+		while frame is not None:
+			label = self.__get_label(frame.f_code)
+			if label:
+				stack.append(label)
+			frame = frame.f_back
+		self.__sample_count += 1
+		if stack:
+			stack = tuple(reversed(stack))
+			with self.__lock:
+				self.__stack_counts[stack] = self.__stack_counts.get(stack, 0) + 1
+
+	def __get_label(self, code):
+		try:
+			return self.__labels[code]
+		except KeyError:
+			filepath = _normalize_path(code.co_filename)
+			label = None
+			if filepath.startswith(self.__root_dirpath):
+				label = "{0}:{1}".format(filepath[len(self.__root_dirpath):], code.co_name)
+			self.__labels[code] = label
+			return label
@@ -15,9 +15,238 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
+import math
+import time
+
+import log
+
 def set_eventloop(eventloop):
-	global g_eventloop
+	global g_eventloop, g_timerwheel
 	g_eventloop = eventloop
+	g_timerwheel = TimerWheel(eventloop)
+
+def get_timer_stats():
+	'''Returns statistics of timers registered with TimerMixin, see
+	TimerWheel.get_stats().
+	'''
+	return g_timerwheel.get_stats()
+
+class _Timer(object):
+
+	__slots__ = ("function", "ticks", "repeat", "expires", "slot", "level")
+
+	def __init__(self, function, ticks, repeat):
+		self.function = function
+		self.ticks = ticks
+		self.repeat = repeat
+		self.expires = None
+		self.slot = None
+		self.level = None
+
+class TimerWheel(object):
+	'''Hierarchical timer wheel which multiplexes any number of timed calls
+	to a single event loop callback.
+
+	Time is divided to ticks of RESOLUTION seconds. Timers expiring within
+	SLOT_COUNT ticks are kept in the first level's slots, one slot per tick,
+	and timers further away in higher levels where each slot spans all slots
+	of the level below. Higher level slots are cascaded down as time reaches
+	them. Adding and cancelling a timer are both constant time operations.
+
+	The event loop callback is registered only when there are timers, and
+	only for the next tick which has something to do. Timers of zero seconds
+	are called on next event loop callback. When the callback arrives late,
+	repeating timers are called once and then continue from current time.
+	'''
+
+	RESOLUTION = 0.01
+	SLOT_BITS = 6
+	SLOT_COUNT = 1 << SLOT_BITS
+	LEVEL_COUNT = 4
+
+	def __init__(self, eventloop, clock=time.time):
+		self.__eventloop = eventloop
+		self.__clock = clock
+		self.__origin = clock()
+		self.__levels = [[set() for i in range(self.SLOT_COUNT)] for level in range(self.LEVEL_COUNT)]
+		self.__level_counts = [0] * self.LEVEL_COUNT
+		self.__immediate = set()
+		self.__tick = 0
+		self.__callback_id = None
+		self.__callback_tick = None
+		self.__callback_count = 0
+		self.__overrun_count = 0
+		self.__max_overrun = 0
+
+	def add(self, secs, function, repeat=False):
+		'''Calls "function" after "secs" seconds, and then repeatedly with
+		interval of "secs" seconds if "repeat" is True. Returns a handle which
+		can be passed to cancel().
+		'''
+		ticks = max(0, int(math.ceil(secs / self.RESOLUTION - 1e-9)))
+		if repeat:
+			ticks = max(1, ticks)
+		timer = _Timer(function, ticks, repeat)
+		now = self.__get_clock_tick()
+		if not self.__is_active():
+			# nothing has happened while idle, move straight to current time
+			self.__tick = max(self.__tick, now)
+		now = max(now, self.__tick)
+		if ticks:
+			self.__insert(timer, now + ticks)
+		else:
+			timer.expires = now
+			timer.slot = self.__immediate
+			timer.slot.add(timer)
+		if self.__callback_tick is None or timer.expires < self.__callback_tick:
+			self.__schedule(timer.expires, now)
+		return timer
+
+	def cancel(self, timer):
+		'''Cancels call registered with add().'''
+		if timer.slot is not None:
+			timer.slot.discard(timer)
+			timer.slot = None
+			if timer.level is not None:
+				self.__level_counts[timer.level] -= 1
+		timer.expires = None
+		timer.repeat = False
+		if not self.__is_active():
+			self.__unschedule()
+
+	def get_stats(self):
+		'''Returns dict of:
+		 - active-timers: number of timers waiting to be called
+		 - callbacks: number of event loop callbacks handled so far
+		 - overruns: number of callbacks which arrived a tick or more late
+		 - max-overrun: longest lateness of a callback, in seconds
+		'''
+		return {
+			"active-timers": sum(self.__level_counts) + len(self.__immediate),
+			"callbacks": self.__callback_count,
+			"overruns": self.__overrun_count,
+			"max-overrun": self.__max_overrun * self.RESOLUTION
+		}
+
+	def __is_active(self):
+		return bool(self.__immediate) or any(self.__level_counts)
+
+	def __get_clock_tick(self):
+		return int((self.__clock() - self.__origin) / self.RESOLUTION)
+
+	def __insert(self, timer, expires):
+		timer.expires = expires
+		delta = expires - self.__tick
+		level = 0
+		while delta >= self.SLOT_COUNT << (self.SLOT_BITS * level) and level < self.LEVEL_COUNT - 1:
+			level += 1
+		if delta >= self.SLOT_COUNT << (self.SLOT_BITS * level):
+			# too far away, keep cascading the timer until it is close enough
+			expires = self.__tick + (self.SLOT_COUNT << (self.SLOT_BITS * level)) - 1
+		timer.level = level
+		timer.slot = self.__levels[level][(expires >> (self.SLOT_BITS * level)) & (self.SLOT_COUNT - 1)]
+		timer.slot.add(timer)
+		self.__level_counts[level] += 1
+
+	def __schedule(self, tick, now):
+		self.__unschedule()
+		self.__callback_tick = tick
+		self.__callback_id = self.__eventloop.callback((tick - now) * self.RESOLUTION, self.__on_callback)
+
+	def __unschedule(self):
+		if self.__callback_id is not None:
+			self.__eventloop.cancel_callback(self.__callback_id)
+		self.__callback_id = None
+		self.__callback_tick = None
+
+	def __on_callback(self):
+		target = self.__callback_tick
+		self.__callback_id = None
+		self.__callback_tick = None
+		self.__callback_count += 1
+		overrun = self.__get_clock_tick() - target
+		if overrun > 0:
+			self.__overrun_count += 1
+			self.__max_overrun = max(self.__max_overrun, overrun)
+			target += overrun
+		self.__run_immediate()
+		while self.__tick < target and any(self.__level_counts):
+			self.__tick += 1
+			self.__run_tick(target)
+		self.__tick = max(self.__tick, target)
+		next_tick = self.__find_next_tick()
+		if next_tick is None:
+			self.__unschedule()
+		elif next_tick != self.__callback_tick:
+			self.__schedule(next_tick, self.__tick)
+
+	def __run_immediate(self):
+		if not self.__immediate:
+			return
+		timers = list(self.__immediate)
+		self.__immediate.clear()
+		for timer in timers:
+			timer.slot = None
+		for timer in timers:
+			if timer.expires is None:
+				# cancelled by a previous timer
+				continue
+			try:
+				timer.function()
+			except:
+				log.LOG_CURRENT_EXCEPTION()
+
+	def __run_tick(self, now):
+		tick = self.__tick
+		level = 1
+		while level < self.LEVEL_COUNT and tick & ((1 << (self.SLOT_BITS * level)) - 1) == 0:
+			self.__cascade(level)
+			level += 1
+		slot = self.__levels[0][tick & (self.SLOT_COUNT - 1)]
+		if not slot:
+			return
+		timers = list(slot)
+		slot.clear()
+		self.__level_counts[0] -= len(timers)
+		for timer in timers:
+			timer.slot = None
+		for timer in timers:
+			if timer.expires != tick:
+				# cancelled by a previous timer of this tick
+				continue
+			if timer.repeat:
+				# continue from current time so that a late callback doesn't
+				# call all the missed repeats at once
+				self.__insert(timer, now + timer.ticks)
+			try:
+				timer.function()
+			except:
+				log.LOG_CURRENT_EXCEPTION()
+
+	def __cascade(self, level):
+		slot = self.__levels[level][(self.__tick >> (self.SLOT_BITS * level)) & (self.SLOT_COUNT - 1)]
+		if not slot:
+			return
+		timers = list(slot)
+		slot.clear()
+		self.__level_counts[level] -= len(timers)
+		for timer in timers:
+			self.__insert(timer, timer.expires)
+
+	def __find_next_tick(self):
+		if not self.__is_active():
+			return None
+		if self.__immediate:
+			return self.__tick
+		last_tick = self.__tick + self.SLOT_COUNT
+		if any(self.__level_counts[1:]):
+			# wake up at latest on next cascade
+			last_tick = (self.__tick | (self.SLOT_COUNT - 1)) + 1
+		if self.__level_counts[0]:
+			for tick in xrange(self.__tick + 1, last_tick):
+				if self.__levels[0][tick & (self.SLOT_COUNT - 1)]:
+					return tick
+		return last_tick
 
 class TimerMixin(object):
 	'''Mixin class which provides ability to register functions for timed calls
@@ -37,21 +266,14 @@ class TimerMixin(object):
 		'''
 		self.off_timeout(function)
 		if repeat:
-			repeater = g_eventloop.create_callback_repeater(function)
-			repeater.start(secs)
-			self.__function_map[function] = repeater
+			self.__function_map[function] = g_timerwheel.add(secs, function, repeat=True)
 		else:
 			def clear_function_map_wrapper():
 				del self.__function_map[function]
 				function()
-			self.__function_map[function] = g_eventloop.callback(secs, clear_function_map_wrapper)
+			self.__function_map[function] = g_timerwheel.add(secs, clear_function_map_wrapper)
 
 	def off_timeout(self, function):
 		'''Unregisters previously registered timed function call.'''
 		if function in self.__function_map:
-			value = self.__function_map[function]
-			if hasattr(value, "stop"):
-				value.stop()
-			else:
-				g_eventloop.cancel_callback(value)
-			del self.__function_map[function]
+			g_timerwheel.cancel(self.__function_map.pop(function))
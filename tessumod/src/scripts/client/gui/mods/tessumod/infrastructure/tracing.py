@@ -0,0 +1,88 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import collections
+import time
+
+# Checked by traced code before measuring anything
+ENABLED = False
+
+# longest stored representation of a slow call's arguments
+MAX_ARGUMENTS_LENGTH = 300
+
+_g_slow_threshold = 0.016
+_g_slow_calls = collections.deque(maxlen=50)
+_g_call_stats = {}
+
+def set_enabled(enabled):
+	'''Enables or disables tracing. Enabling clears previously recorded
+	calls.
+	'''
+	global ENABLED
+	if enabled and not ENABLED:
+		reset()
+	ENABLED = enabled
+
+def is_enabled():
+	return ENABLED
+
+def set_slow_threshold(secs):
+	'''Sets duration (in seconds) after which a call is considered slow.'''
+	global _g_slow_threshold
+	_g_slow_threshold = secs
+
+def get_slow_threshold():
+	return _g_slow_threshold
+
+def set_slow_call_count(count):
+	'''Sets number of latest slow calls to keep.'''
+	global _g_slow_calls
+	_g_slow_calls = collections.deque(_g_slow_calls, maxlen=count)
+
+def reset():
+	_g_slow_calls.clear()
+	_g_call_stats.clear()
+
+def record(name, secs, args, kwargs):
+	'''Records call of "name" which took "secs" seconds. If the call was slow,
+	its arguments are kept as well.
+	'''
+	try:
+		stats = _g_call_stats[name]
+	except KeyError:
+		stats = _g_call_stats[name] = [0, 0.0, 0.0]
+	stats[0] += 1
+	stats[1] += secs
+	if secs > stats[2]:
+		stats[2] = secs
+	if secs >= _g_slow_threshold:
+		arguments = ", ".join([repr(arg) for arg in args] + ["{0}={1!r}".format(key, value) for key, value in kwargs.iteritems()])
+		if len(arguments) > MAX_ARGUMENTS_LENGTH:
+			arguments = arguments[:MAX_ARGUMENTS_LENGTH] + "..."
+		_g_slow_calls.append((time.time(), name, secs, arguments))
+
+def get_call_stats():
+	'''Returns dict of call counts, total and maximum durations (in seconds)
+	per name.
+	'''
+	return {name: {"count": count, "total": total, "max": longest} for name, (count, total, longest) in _g_call_stats.iteritems()}
+
+def get_slow_calls():
+	'''Returns list of latest slow calls, oldest first, as tuples of (time,
+	name, duration in seconds, formatted arguments).
+	'''
+	return list(_g_slow_calls)
@@ -0,0 +1,48 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+from timer import TimerMixin
+
+class UpdateQueue(TimerMixin):
+	'''Collects values set during a tick and passes them to "function" on
+	next tick, as a dict of key and value. Only the last value set for each
+	key is passed.
+	'''
+
+	def __init__(self, function):
+		super(UpdateQueue, self).__init__()
+		self.__function = function
+		self.__values = {}
+
+	def set(self, key, value):
+		'''Sets "value" of "key" to be passed on next flush.'''
+		if not self.__values:
+			self.on_timeout(0, self.flush)
+		self.__values[key] = value
+
+	def flush(self):
+		'''Passes values set so far immediately.'''
+		self.off_timeout(self.flush)
+		values = self.__values
+		self.__values = {}
+		if values:
+			self.__function(values)
+
+	def clear(self):
+		'''Forgets values set so far.'''
+		self.off_timeout(self.flush)
+		self.__values = {}
@@ -20,7 +20,7 @@ import os
 import copy
 from functools import partial
 
-from infrastructure import log, timer, di
+from infrastructure import log, di
 from constants import SettingConstants
 
 @di.inject("settings")
@@ -29,6 +29,11 @@ from constants import SettingConstants
 @di.inject("usercache")
 @di.inject("chatclient")
 @di.inject("environment")
+@di.inject("metrics")
+@di.inject("tracing")
+@di.inject("profiler")
+@di.inject("pairingcache")
+@di.inject("speakstate")
 class Initialize(object):
 
 	def execute(self):
@@ -38,6 +43,12 @@ class Initialize(object):
 		self.settings.init(os.path.join(settings_dirpath, "tessu_mod.ini"))
 		self.usercache.init(os.path.join(settings_dirpath, "tessu_mod_cache.ini"))
 		self.datastorage.init(os.path.join(settings_dirpath, "states"))
+		self.metrics.init(os.path.join(settings_dirpath, "tessu_mod_metrics.json"))
+		self.tracing.init(os.path.join(settings_dirpath, "tessu_mod_slow_calls.log"))
+		self.profiler.init(os.path.join(settings_dirpath, "tessu_mod_profile.txt"))
+		self.metrics.add_stats_source("pairing-cache", self.pairingcache.get_stats)
+		self.metrics.add_stats_source("event-checking", self.chatclient.get_event_checking_stats)
+		self.metrics.add_stats_source("speak-state", self.speakstate.get_stats)
 		self.chatclient.init(os.path.join(mods_dirpath, "tessumod.ts3_plugin"))
 		self.notifications.init()
 
@@ -45,12 +56,15 @@ class Initialize(object):
 @di.inject("minimap")
 @di.inject("settings")
 @di.inject("usercache")
+@di.inject("metrics")
+@di.inject("tracing")
+@di.inject("profiler")
 class LoadSettings(object):
 
 	def execute(self, variables):
 		variables = copy.copy(variables)
 		value = variables.pop(SettingConstants.LOG_LEVEL)
-		log.CURRENT_LOG_LEVEL = value
+		log.set_level(value)
 		value = variables.pop(SettingConstants.FILE_CHECK_INTERVAL)
 		self.settings.set_file_check_interval(value)
 		self.usercache.set_file_check_interval(value)
@@ -64,8 +78,13 @@ class LoadSettings(object):
 		self.chatclient.set_host(value)
 		value = variables.pop(SettingConstants.CHAT_CLIENT_PORT)
 		self.chatclient.set_port(value)
+		value = variables.pop(SettingConstants.CHAT_CLIENT_READER_THREAD)
+		self.chatclient.set_reader_thread_enabled(value)
 		value = variables.pop(SettingConstants.CHAT_CLIENT_POLLING_INTERVAL)
-		self.chatclient.set_polling_interval(value)
+		max_value = variables.pop(SettingConstants.CHAT_CLIENT_MAX_POLL_INTERVAL)
+		self.chatclient.set_polling_interval(value, max(value, max_value))
+		value = variables.pop(SettingConstants.CHAT_CLIENT_COMMAND_WINDOW)
+		self.chatclient.set_command_window(max(value, 1))
 		value = variables.pop(SettingConstants.VOICE_CHAT_NOTIFY_ENABLED)
 		value = variables.pop(SettingConstants.VOICE_CHAT_NOTIFY_SELF_ENABLED)
 		value = variables.pop(SettingConstants.MINIMAP_NOTIFY_ENABLED)
@@ -74,6 +93,20 @@ class LoadSettings(object):
 		self.minimap.set_action(value)
 		value = variables.pop(SettingConstants.MINIMAP_NOTIFY_REPEAT_INTERVAL)
 		self.minimap.set_action_interval(value)
+		value = variables.pop(SettingConstants.METRICS_DUMP_INTERVAL)
+		self.metrics.set_dump_interval(max(value, 1))
+		value = variables.pop(SettingConstants.METRICS_ENABLED)
+		self.metrics.set_enabled(value)
+		value = variables.pop(SettingConstants.TRACE_SLOW_CALL_THRESHOLD)
+		self.tracing.set_slow_threshold(value / 1000.0)
+		value = variables.pop(SettingConstants.TRACE_SLOW_CALL_COUNT)
+		self.tracing.set_slow_call_count(max(value, 1))
+		value = variables.pop(SettingConstants.TRACE_ENABLED)
+		self.tracing.set_enabled(value)
+		value = variables.pop(SettingConstants.PROFILER_INTERVAL)
+		self.profiler.set_interval(max(value, 1) / 1000.0)
+		value = variables.pop(SettingConstants.PROFILER_ENABLED)
+		self.profiler.set_enabled(value)
 		assert not variables, "Not all variables have been handled"
 
 @di.inject("usercache")
@@ -83,35 +116,47 @@ class CacheChatUser(object):
 	def execute(self, client_id):
 		if self.chatclient.has_user(client_id):
 			user = self.chatclient.get_user(client_id)
-			if user["in_my_channel"]:
-				self.usercache.add_chat_user(user["unique_id"], user["nick"])
+			if user.in_my_channel:
+				self.usercache.add_chat_user(user.unique_id, user.nick)
 
 @di.inject("usercache")
 @di.inject("chatclient")
 @di.inject("players")
 @di.inject("settings")
+@di.inject("pairingcache")
 class PairChatUserToPlayer(object):
 
 	def execute(self, client_id):
-		if not self.chatclient.has_user(client_id):
-			return
+		if self.chatclient.has_user(client_id):
+			self.pair_user(self.chatclient.get_user(client_id))
 
-		user = self.chatclient.get_user(client_id)
-		if not user["in_my_channel"]:
+	def pair_user(self, user):
+		if not user.in_my_channel:
 			return
 
-		players = list(self.players.get_players(in_battle=True, in_prebattle=True))
+		# same user is matched again on changes of its values and whenever
+		# players or settings change, reuse the previous result if nothing
+		# affecting the matching has changed
+		context = (self.players.get_roster_version(), self.settings.get_version())
+		key = (user.unique_id, user.nick, user.game_nick)
+		found, player = self.pairingcache.find(context, key)
+		if not found:
+			player = self.__find_player(user)
+			self.pairingcache.store(context, key, player)
+
+		if player:
+			self.usercache.add_player(id=player["id"], name=player["name"])
+			self.usercache.pair(player["id"], user.unique_id)
+		elif log.is_enabled(log.LOG_LEVEL.DEBUG):
+			log.LOG_DEBUG("Failed to match TS user", user.nick)
+
+	def __find_player(self, user):
+		roster = self.players.get_roster()
 		mappings = self.settings.get(SettingConstants.NICK_MAPPINGS)
 		extract_patterns = self.settings.get(SettingConstants.NICK_EXTRACT_PATTERNS)
 		use_ts_nick_search = self.settings.get(SettingConstants.CHAT_NICK_SEARCH_ENABLED)
 		use_metadata = self.settings.get(SettingConstants.GET_GAME_NICK_FROM_CHAT_CLIENT)
 
-		def find_player(nick, comparator=lambda a, b: a == b):
-			if hasattr(nick, "lower"):
-				for player in players:
-					if comparator(player["name"].lower(), nick.lower()):
-						return player
-
 		def map_nick(nick):
 			if hasattr(nick, "lower"):
 				try:
@@ -122,52 +167,49 @@ class PairChatUserToPlayer(object):
 		def match_using_metadata():
 			# find player using TS user's WOT nickname in metadata (available if user
 			# has TessuMod installed)
-			if user["game_nick"]:
-				player = find_player(user["game_nick"])
+			if user.game_nick:
+				player = roster.find_by_name(user.game_nick)
 				if player:
-					log.LOG_DEBUG("Matched TS user to player with TS metadata", user["nick"], user["game_nick"], player)
+					log.LOG_DEBUG("Matched TS user to player with TS metadata", user.nick, user.game_nick, player)
 				return player
 
 		def match_using_extract_patterns():
 			# no metadata, try find player by using WOT nickname extracted from TS
 			# user's nickname using nick_extract_patterns
-			for pattern in extract_patterns:
-				matches = pattern.match(user["nick"])
-				if matches is not None and matches.groups():
-					extracted_nick = matches.group(1).strip()
-					player = find_player(extracted_nick)
-					if player:
-						log.LOG_DEBUG("Matched TS user to player with pattern", user["nick"], player, pattern.pattern)
-						return player
-					# extracted nickname didn't match any player, try find player by
-					# mapping the extracted nickname to WOT nickname (if available)
-					player = find_player(map_nick(extracted_nick))
-					if player:
-						log.LOG_DEBUG("Matched TS user to player with pattern and mapping", user["nick"], player, pattern.pattern)
-						return player
+			for extracted_nick, pattern in extract_patterns.extract(user.nick):
+				player = roster.find_by_name(extracted_nick)
+				if player:
+					log.LOG_DEBUG("Matched TS user to player with pattern", user.nick, player, pattern.pattern)
+					return player
+				# extracted nickname didn't match any player, try find player by
+				# mapping the extracted nickname to WOT nickname (if available)
+				player = roster.find_by_name(map_nick(extracted_nick))
+				if player:
+					log.LOG_DEBUG("Matched TS user to player with pattern and mapping", user.nick, player, pattern.pattern)
+					return player
 
 		def match_using_mappings():
 			# extract patterns didn't help, try find player by mapping TS nickname to
 			# WOT nickname (if available)
-			player = find_player(map_nick(user["nick"]))
+			player = roster.find_by_name(map_nick(user.nick))
 			if player:
-				log.LOG_DEBUG("Matched TS user to player via mapping", user["nick"], player)
+				log.LOG_DEBUG("Matched TS user to player via mapping", user.nick, player)
 				return player
 
 		def match_using_name_comparison():
 			# still no match, as a last straw, try find player by searching each known
 			# WOT nickname from the TS nickname
 			if use_ts_nick_search:
-				player = find_player(user["nick"], comparator=lambda a, b: a in b)
+				player = roster.find_by_name_in(user.nick)
 				if player:
-					log.LOG_DEBUG("Matched TS user to player with TS nick search", user["nick"], player)
+					log.LOG_DEBUG("Matched TS user to player with TS nick search", user.nick, player)
 					return player
 			# or alternatively, try find player by just comparing that TS nickname and
 			# WOT nicknames are same
 			else:
-				player = find_player(user["nick"])
+				player = roster.find_by_name(user.nick)
 				if player:
-					log.LOG_DEBUG("Matched TS user to player by comparing names", user["nick"], player)
+					log.LOG_DEBUG("Matched TS user to player by comparing names", user.nick, player)
 					return player
 
 		matchers = []
@@ -182,13 +224,17 @@ class PairChatUserToPlayer(object):
 		for matcher in matchers:
 			player = matcher()
 			if player is not None:
-				break
+				return player
 
-		if player:
-			self.usercache.add_player(id=player["id"], name=player["name"])
-			self.usercache.pair(player["id"], user["unique_id"])
-		else:
-			log.LOG_DEBUG("Failed to match TS user", user["nick"])
+class PairChatUsersToPlayers(PairChatUserToPlayer):
+	'''Pairs all chat users again. Players may have joined battle or
+	prebattle, or settings used in matching may have changed since the users
+	were paired.
+	'''
+
+	def execute(self):
+		for user in self.chatclient.get_users():
+			self.pair_user(user)
 
 @di.inject("usercache")
 @di.inject("chatclient")
@@ -196,35 +242,37 @@ class PairChatUserToPlayer(object):
 @di.inject("chatindicator")
 @di.inject("players")
 @di.inject("settings")
-class UpdateChatUserSpeakState(timer.TimerMixin):
+@di.inject("speakstate")
+class UpdateChatUserSpeakState(object):
 
 	def execute(self, client_id):
 		if not self.chatclient.has_user(client_id):
 			return
 
 		user = self.chatclient.get_user(client_id)
-		if not user["in_my_channel"]:
+		if not user.in_my_channel:
 			return
 
-		if user["speaking"]:
+		update = partial(self.__update_chat_user_speak_status, client_id)
+		if user.speaking:
 			# set speaking state immediately
-			self.__update_chat_user_speak_status(client_id)
+			self.speakstate.start(client_id, update)
 		else:
 			# keep speaking state for a little longer
 			secs = self.settings.get(SettingConstants.SPEAK_STOP_DELAY)
-			self.on_timeout(secs, partial(self.__update_chat_user_speak_status, client_id))
+			self.speakstate.stop(client_id, secs, update)
 
 	def __update_chat_user_speak_status(self, client_id):
 		if not self.chatclient.has_user(client_id):
 			return
 		user = self.chatclient.get_user(client_id)
-		for player_id in self.usercache.get_paired_player_ids(user["unique_id"]):
+		for player_id in self.usercache.get_paired_player_ids(user.unique_id):
 			player = self.players.get_player_by_dbid(player_id)
 			if player:
 				try:
 					self.chatindicator.set_player_speaking(
 						player=player,
-						speaking=user["speaking"] and self.__is_voice_chat_speak_allowed(player["id"])
+						speaking=user.speaking and self.__is_voice_chat_speak_allowed(player["id"])
 					)
 				except:
 					log.LOG_CURRENT_EXCEPTION()
@@ -233,7 +281,7 @@ class UpdateChatUserSpeakState(timer.TimerMixin):
 					try:
 						self.minimap.set_player_speaking(
 							player=player,
-							speaking=user["speaking"] and player["is_alive"] and self.__is_minimap_speak_allowed(player["id"])
+							speaking=user.speaking and player["is_alive"] and self.__is_minimap_speak_allowed(player["id"])
 						)
 					except:
 						log.LOG_CURRENT_EXCEPTION()
@@ -257,17 +305,19 @@ class UpdateChatUserSpeakState(timer.TimerMixin):
 @di.inject("minimap")
 @di.inject("usercache")
 @di.inject("players")
+@di.inject("speakstate")
 class RemoveChatUser(object):
 
 	def execute(self, client_id):
+		self.speakstate.cancel(client_id)
 		if not self.chatclient.has_user(client_id):
 			return
 		user = self.chatclient.get_user(client_id)
-		if user["speaking"]:
+		if user.speaking:
 			self.__stop_user_feedback(user)
 
 	def __stop_user_feedback(self, user):
-		for player_id in self.usercache.get_paired_player_ids(user["unique_id"]):
+		for player_id in self.usercache.get_paired_player_ids(user.unique_id):
 			player = self.players.get_player_by_dbid(player_id)
 			if player:
 				self.__update_player_speak_status(player)
@@ -285,10 +335,12 @@ class RemoveChatUser(object):
 
 @di.inject("minimap")
 @di.inject("chatindicator")
+@di.inject("speakstate")
 class ClearSpeakStatuses(object):
 
 	def execute(self):
 		'''Clears speak status of all players.'''
+		self.speakstate.cancel_all()
 		self.minimap.clear_all_players_speaking()
 		self.chatindicator.clear_all_players_speaking()
 
@@ -393,10 +445,10 @@ class ProvidePositionalDataToChatClient(object):
 		camera_direction = self.battle.get_camera_direction()
 		positions = {}
 		for user in self.chatclient.get_users():
-			for player_id in self.usercache.get_paired_player_ids(user["unique_id"]):
+			for player_id in self.usercache.get_paired_player_ids(user.unique_id):
 				vehicle = self.battle.get_vehicle(player_id=player_id)
 				if vehicle and vehicle["is-alive"] and vehicle["position"]:
-					positions[user["client_id"]] = vehicle["position"]
+					positions[user.client_id] = vehicle["position"]
 		if camera_position and camera_direction and positions:
 			self.chatclient.update_positional_data(camera_position, camera_direction, positions)
 
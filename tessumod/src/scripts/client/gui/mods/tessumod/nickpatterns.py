@@ -0,0 +1,92 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import re
+
+# constructs which would change meaning when patterns are combined together:
+# numbered and named backreferences, and global inline flags
+_UNCOMBINABLE_PATTERN = re.compile(r"\\[1-9]|\(\?P=|\(\?[iLmsux]+\)")
+
+class NickExtractPatterns(object):
+	'''Set of 'nick_extract_patterns' regular expressions which extract WOT
+	nicknames from TS nicknames.
+
+	Patterns are combined into single alternation which finds the first
+	matching pattern with one pass, only patterns from that on are evaluated
+	separately. Extraction results are memoized per TS nickname.
+	'''
+
+	MAX_CACHED_NICKS = 1000
+
+	def __init__(self, patterns, flags=re.IGNORECASE):
+		self.__patterns = [re.compile(pattern, flags) if isinstance(pattern, basestring) else pattern for pattern in patterns]
+		self.__combined = None
+		self.__pattern_indexes = {}
+		self.__cache = {}
+		self.__combine()
+
+	def __len__(self):
+		return len(self.__patterns)
+
+	def __iter__(self):
+		return iter(self.__patterns)
+
+	def extract(self, nick):
+		'''Returns tuple of (extracted nickname, pattern) pairs, in order of
+		the patterns, from each pattern which matches to "nick".
+		'''
+		result = self.__cache.get(nick, None)
+		if result is None:
+			if isinstance(nick, basestring):
+				result = self.__extract(nick)
+			else:
+				result = ()
+			if len(self.__cache) >= self.MAX_CACHED_NICKS:
+				self.__cache.clear()
+			self.__cache[nick] = result
+		return result
+
+	def __combine(self):
+		if len(set(pattern.flags for pattern in self.__patterns)) != 1:
+			return
+		sources = []
+		group_index = 1
+		for index, pattern in enumerate(self.__patterns):
+			if _UNCOMBINABLE_PATTERN.search(pattern.pattern):
+				return
+			sources.append("(" + pattern.pattern + ")")
+			self.__pattern_indexes[group_index] = index
+			group_index += 1 + pattern.groups
+		try:
+			self.__combined = re.compile("|".join(sources), self.__patterns[0].flags)
+		except re.error:
+			self.__pattern_indexes.clear()
+
+	def __extract(self, nick):
+		first_index = 0
+		if self.__combined is not None:
+			match = self.__combined.match(nick)
+			if match is None:
+				return ()
+			# the group wrapping matched pattern closes last
+			first_index = self.__pattern_indexes[match.lastindex]
+		results = []
+		for pattern in self.__patterns[first_index:]:
+			match = pattern.match(nick)
+			if match is not None and match.groups() and match.group(1) is not None:
+				results.append((match.group(1).strip(), pattern))
+		return tuple(results)
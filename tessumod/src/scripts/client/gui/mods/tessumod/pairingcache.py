@@ -0,0 +1,63 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+from infrastructure import log
+
+class PairingCache(object):
+	'''Remembers results of matching chat users to players.
+
+	Results are stored with a key identifying the chat user and a context
+	identifying everything else the result depends on, e.g. roster of players
+	and settings. All results are forgotten when the context changes.
+	'''
+
+	MAX_ENTRIES = 1000
+
+	def __init__(self):
+		self.__context = None
+		self.__results = {}
+		self.__hits = 0
+		self.__misses = 0
+
+	def find(self, context, key):
+		'''Returns tuple of (found, result) where 'found' is True if a result
+		has been stored for 'key' in 'context'.
+		'''
+		if context == self.__context and key in self.__results:
+			self.__hits += 1
+			return True, self.__results[key]
+		self.__misses += 1
+		return False, None
+
+	def store(self, context, key, result):
+		'''Stores 'result' for 'key' in 'context'.'''
+		if context != self.__context or len(self.__results) >= self.MAX_ENTRIES:
+			if self.__results:
+				log.LOG_DEBUG("Pairing cache cleared", self.get_stats())
+			self.__results.clear()
+			self.__context = context
+		self.__results[key] = result
+
+	def get_stats(self):
+		'''Returns dict of cache's hit and miss counts, and amount of stored
+		results.
+		'''
+		return {
+			"hits": self.__hits,
+			"misses": self.__misses,
+			"size": len(self.__results)
+		}
@@ -0,0 +1,137 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import collections
+
+class NameMatcher(object):
+	'''Aho-Corasick automaton which finds given names from a text in a
+	single pass over the text.
+	'''
+
+	def __init__(self, names):
+		# state 0 is the root, each state has its transitions, a failure link
+		# and the longest name which ends at the state
+		self.__transitions = [{}]
+		self.__failures = [0]
+		self.__longest_names = [None]
+		for name in names:
+			self.__add_name(name)
+		self.__build_failure_links()
+
+	def __add_name(self, name):
+		state = 0
+		for char in name:
+			next_state = self.__transitions[state].get(char, None)
+			if next_state is None:
+				next_state = len(self.__transitions)
+				self.__transitions[state][char] = next_state
+				self.__transitions.append({})
+				self.__failures.append(0)
+				self.__longest_names.append(None)
+			state = next_state
+		self.__longest_names[state] = name
+
+	def __build_failure_links(self):
+		queue = collections.deque(self.__transitions[0].itervalues())
+		while queue:
+			state = queue.popleft()
+			for char, next_state in self.__transitions[state].iteritems():
+				queue.append(next_state)
+				failure = self.__failures[state]
+				while failure and char not in self.__transitions[failure]:
+					failure = self.__failures[failure]
+				failure = self.__transitions[failure].get(char, 0)
+				self.__failures[next_state] = failure
+				if self.__longest_names[next_state] is None:
+					self.__longest_names[next_state] = self.__longest_names[failure]
+
+	def find_longest(self, text):
+		'''Returns the longest name found from "text", or None if the text
+		contains none of the names. Of names with equal length the one which
+		appears first in the text is returned.
+		'''
+		transitions = self.__transitions
+		failures = self.__failures
+		longest_names = self.__longest_names
+		result = None
+		result_length = 0
+		state = 0
+		for char in text:
+			while state and char not in transitions[state]:
+				state = failures[state]
+			state = transitions[state].get(char, 0)
+			name = longest_names[state]
+			if name is not None and len(name) > result_length:
+				result = name
+				result_length = len(name)
+		return result
+
+def find_longest_name(names, text):
+	'''Same as NameMatcher.find_longest(), but tests each of the "names"
+	separately, which is faster than the automaton with small amount of names.
+	'''
+	result = None
+	result_position = 0
+	for name in names:
+		if name not in text or not name:
+			continue
+		position = text.find(name)
+		if result is None or len(name) > len(result) or (len(name) == len(result) and position < result_position):
+			result = name
+			result_position = position
+	return result
+
+class Roster(object):
+	'''Index of players in battle and prebattle rosters which allows finding
+	players by name case insensitively without going through all players.
+	'''
+
+	# minimum amount of players before names are searched with NameMatcher
+	NAME_MATCHER_MIN_NAMES = 120
+
+	def __init__(self, players):
+		self.__players_by_name = {}
+		self.__names = []
+		self.__matcher = None
+		for player in players:
+			name = player["name"].lower()
+			if name not in self.__players_by_name:
+				self.__players_by_name[name] = player
+				self.__names.append(name)
+
+	def __len__(self):
+		return len(self.__names)
+
+	def find_by_name(self, name):
+		'''Returns player whose name equals to 'name', or None if not found.'''
+		if hasattr(name, "lower"):
+			return self.__players_by_name.get(name.lower(), None)
+
+	def find_by_name_in(self, text):
+		'''Returns player whose name is contained in 'text', or None if not
+		found. If several names are found the longest one wins.
+		'''
+		if hasattr(text, "lower"):
+			text = text.lower()
+			if len(self.__names) < self.NAME_MATCHER_MIN_NAMES:
+				name = find_longest_name(self.__names, text)
+			else:
+				if self.__matcher is None:
+					self.__matcher = NameMatcher(self.__names)
+				name = self.__matcher.find_longest(text)
+			if name is not None:
+				return self.__players_by_name[name]
@@ -0,0 +1,89 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+from functools import partial
+
+from infrastructure.timer import TimerMixin
+
+class SpeakStateDebouncer(TimerMixin):
+	'''Delays ending of chat users' speak states.
+
+	Each chat user has at most one pending stop timer which is restarted in
+	place when the user stops speaking again, and cancelled when the user
+	starts speaking before the timer expires.
+	'''
+
+	def __init__(self):
+		super(SpeakStateDebouncer, self).__init__()
+		self.__timeouts = {}
+		self.__stop_functions = {}
+		self.__started = set()
+
+	def start(self, client_id, function):
+		'''Calls 'function' to start speak state of 'client_id'. If the
+		previous speak state is still pending to stop the stop is cancelled
+		instead, as the speak state is still shown.
+		'''
+		if self.__cancel_timeout(client_id) and client_id in self.__started:
+			return
+		self.__started.add(client_id)
+		function()
+
+	def stop(self, client_id, secs, function):
+		'''Calls 'function' to stop speak state of 'client_id' after 'secs'
+		seconds. Replaces previously pending stop of 'client_id', if any.
+		'''
+		self.__stop_functions[client_id] = function
+		if client_id not in self.__timeouts:
+			self.__timeouts[client_id] = partial(self.__on_timeout, client_id)
+		self.on_timeout(secs, self.__timeouts[client_id])
+
+	def cancel(self, client_id):
+		'''Cancels pending stop of 'client_id' and forgets its speak state.'''
+		self.__cancel_timeout(client_id)
+		self.__started.discard(client_id)
+
+	def cancel_all(self):
+		'''Cancels all pending stops and forgets all speak states.'''
+		for client_id in self.__timeouts.keys():
+			self.__cancel_timeout(client_id)
+		self.__started.clear()
+
+	def get_timer_count(self):
+		'''Returns number of pending stops.'''
+		return len(self.__timeouts)
+
+	def get_stats(self):
+		'''Returns dict of amounts of pending stops and started speak
+		states.
+		'''
+		return {
+			"pending-stops": len(self.__timeouts),
+			"started": len(self.__started)
+		}
+
+	def __cancel_timeout(self, client_id):
+		if client_id not in self.__timeouts:
+			return False
+		self.off_timeout(self.__timeouts.pop(client_id))
+		del self.__stop_functions[client_id]
+		return True
+
+	def __on_timeout(self, client_id):
+		del self.__timeouts[client_id]
+		self.__started.discard(client_id)
+		self.__stop_functions.pop(client_id)()
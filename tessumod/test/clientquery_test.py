@@ -0,0 +1,421 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import socket
+import asyncore
+import time
+import mock
+
+import helpers
+from tessumod.infrastructure import clientquery, eventemitter, timer
+
+class TestClientQueryParseArguments(object):
+
+	def test_parses_single_entry(self):
+		assert clientquery.parse_arguments("schandlerid=1 status=1 isreceivedwhisper=0 clid=5") == [
+			{"schandlerid": "1", "status": "1", "isreceivedwhisper": "0", "clid": "5"}
+		]
+
+	def test_parses_multiple_entries(self):
+		assert clientquery.parse_arguments("clid=1 cid=2|clid=3 cid=4") == [
+			{"clid": "1", "cid": "2"},
+			{"clid": "3", "cid": "4"}
+		]
+
+	def test_parses_key_without_value(self):
+		assert clientquery.parse_arguments("clid=1 client_meta_data") == [
+			{"clid": "1", "client_meta_data": ""}
+		]
+
+	def test_keeps_equal_signs_within_value(self):
+		assert clientquery.parse_arguments("client_unique_identifier=BAAD+f00d/ab=") == [
+			{"client_unique_identifier": "BAAD+f00d/ab="}
+		]
+
+	def test_unescapes_values(self):
+		assert clientquery.parse_arguments(r"msg=a\sb\pc\\d\/e\tf") == [
+			{"msg": "a b|c\\d/e\tf"}
+		]
+
+	def test_parses_empty_string(self):
+		assert clientquery.parse_arguments("") == [{"": ""}]
+
+class TestClientQueryProtocol(object):
+
+	def setUp(self):
+		self.__received_data = []
+		self.__lines = []
+		self.__errors = []
+		self.__protocol = clientquery.ClientQueryProtocol({})
+		self.__protocol.recv = lambda size: self.__received_data.pop(0)
+		self.__protocol.close = mock.Mock()
+		self.__protocol.on("line-received", lambda line, parsed: self.__lines.append(line))
+		self.__protocol.on("error", self.__errors.append)
+		self.__protocol.connected = True
+		self.__protocol.handle_connect()
+		self.__receive("TS3 Client\n\rWelcome\n\rselected schandlerid=1\n\r")
+
+	def __receive(self, *chunks):
+		for chunk in chunks:
+			self.__received_data.append(chunk)
+			self.__protocol.handle_read()
+
+	def test_splits_multiple_lines_from_one_chunk(self):
+		self.__receive("clid=1\n\rclid=2\n\rclid=3\n\r")
+		assert self.__lines == ["clid=1", "clid=2", "clid=3"]
+
+	def test_joins_line_split_into_several_chunks(self):
+		self.__receive("clid=1 cid", "=2|clid=3", " cid=4\n\r")
+		assert self.__lines == ["clid=1 cid=2|clid=3 cid=4"]
+
+	def test_handles_terminator_split_between_chunks(self):
+		self.__receive("clid=1\n", "\rclid=2\n\r")
+		assert self.__lines == ["clid=1", "clid=2"]
+
+	def test_closes_connection_when_line_is_too_long(self):
+		self.__protocol.set_max_line_length(10)
+		self.__receive("clid=1\n\r", "0123456789", "0")
+		assert self.__lines == ["clid=1"]
+		assert len(self.__errors) == 1
+		assert self.__protocol.close.called
+
+	def test_gives_each_reader_thread_own_line_buffer(self):
+		self.__protocol.set_reader_thread_enabled(True)
+		with mock.patch.object(clientquery, "ClientQueryReaderThread") as thread_class:
+			self.__protocol.handle_connect()
+			self.__protocol.handle_connect()
+		buffers = [args[1] for args, kwargs in thread_class.call_args_list]
+		assert len(buffers) == 2
+		assert buffers[0] is not buffers[1]
+
+def wait_until(condition, timeout=5):
+	end_time = time.time() + timeout
+	while not condition():
+		assert time.time() < end_time, "Timed out"
+		time.sleep(0.01)
+
+class TestClientQueryProtocolWithReaderThread(object):
+
+	def setUp(self):
+		self.__server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.__server_socket.bind(("127.0.0.1", 0))
+		self.__server_socket.listen(1)
+		self.__socket_map = {}
+		self.__lines = []
+		self.__events = []
+		self.__errors = []
+		# let stopped threads finish quickly
+		self.__select_timeout = clientquery.ClientQueryReaderThread.SELECT_TIMEOUT
+		clientquery.ClientQueryReaderThread.SELECT_TIMEOUT = 0.01
+		self.__protocol = clientquery.ClientQueryProtocol(self.__socket_map)
+		self.__protocol.set_reader_thread_enabled(True)
+		self.__protocol.on("error", self.__errors.append)
+		self.__protocol.on("line-received", lambda line, parsed: self.__lines.append((line, parsed)))
+		self.__protocol.on("connected", lambda: self.__events.append("connected"))
+		self.__protocol.on("disconnected", lambda: self.__events.append("disconnected"))
+		self.__protocol.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.__protocol.connect(self.__server_socket.getsockname())
+		self.__connection, address = self.__server_socket.accept()
+		wait_until(self.__check_connected)
+
+	def tearDown(self):
+		self.__protocol.close()
+		self.__connection.close()
+		self.__server_socket.close()
+		clientquery.ClientQueryReaderThread.SELECT_TIMEOUT = self.__select_timeout
+
+	def __check_connected(self):
+		asyncore.loop(timeout=0, count=1, map=self.__socket_map)
+		return self.__protocol.connected
+
+	def __check_received(self, condition):
+		def check():
+			asyncore.loop(timeout=0, count=1, map=self.__socket_map)
+			self.__protocol.handle_received_lines()
+			return condition()
+		wait_until(check)
+
+	def test_receives_parsed_notify_events(self):
+		self.__connection.sendall("TS3 Client\n\rWelcome\n\rselected schandlerid=1\n\r")
+		self.__check_received(lambda: "connected" in self.__events)
+		self.__connection.sendall("notifytalkstatuschange schandlerid=1 status=1 clid=5\n\rclid=1 cid=2\n\r")
+		self.__check_received(lambda: len(self.__lines) == 2)
+		assert self.__lines == [
+			("notifytalkstatuschange schandlerid=1 status=1 clid=5",
+				("notifytalkstatuschange", [{"schandlerid": "1", "status": "1", "clid": "5"}])),
+			("clid=1 cid=2", None)
+		]
+
+	def test_emits_disconnected_when_connection_closes(self):
+		self.__connection.close()
+		self.__check_received(lambda: "disconnected" in self.__events)
+
+	def test_disconnects_on_unexpected_error_in_reader_thread(self):
+		with mock.patch.object(clientquery, "parse_notify_line", side_effect=RuntimeError("boom")):
+			self.__connection.sendall("TS3 Client\n\r")
+			self.__check_received(lambda: "disconnected" in self.__events)
+		assert len(self.__errors) == 1
+		assert "boom" in str(self.__errors[0])
+
+	def test_receives_lines_after_reconnect(self):
+		self.__connection.sendall("TS3 Client\n\rWelcome\n\rselected schandlerid=1\n\rclid=1 c")
+		self.__check_received(lambda: "connected" in self.__events)
+		self.__protocol.close()
+		self.__connection.close()
+		self.__protocol.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.__protocol.connect(self.__server_socket.getsockname())
+		self.__connection, address = self.__server_socket.accept()
+		wait_until(self.__check_connected)
+		self.__connection.sendall("TS3 Client\n\rWelcome\n\rselected schandlerid=1\n\rclid=2 cid=3\n\r")
+		self.__check_received(lambda: len(self.__lines) == 1)
+		assert self.__lines == [("clid=2 cid=3", None)]
+
+class FakeCommandSender(clientquery.ClientQuerySendCommandMixin, clientquery.ClientQueryCommandsImplMixin,
+	eventemitter.EventEmitterMixin):
+
+	def __init__(self):
+		super(FakeCommandSender, self).__init__()
+		self.sent_data = []
+
+	def is_connected(self):
+		return True
+
+	def send(self, data):
+		self.sent_data.append(data)
+
+	def receive(self, *lines):
+		for line in lines:
+			self.emit("line-received", line)
+
+class TestClientQuerySendCommandMixin(object):
+
+	def setUp(self):
+		self.__sender = FakeCommandSender()
+		self.__results = []
+		self.__errors = []
+
+	def __send_command(self, command, schandlerid=None):
+		return (self.__sender.send_command(command, [], schandlerid=schandlerid)
+			.on("result", lambda result: self.__results.append((command, result["data"])))
+			.on("error", lambda error: self.__errors.append((command, error))))
+
+	def test_sends_one_command_at_a_time_by_default(self):
+		self.__send_command("whoami")
+		self.__send_command("clientlist")
+		assert self.__sender.sent_data == ["whoami \n\r"]
+		self.__sender.receive("clid=1 cid=1", "error id=0 msg=ok")
+		assert self.__sender.sent_data == ["whoami \n\r", "clientlist \n\r"]
+
+	def test_pipelines_commands_within_window(self):
+		self.__sender.set_command_window(2)
+		self.__send_command("whoami")
+		self.__send_command("clientlist")
+		self.__send_command("servervariable")
+		assert self.__sender.sent_data == ["whoami \n\r", "clientlist \n\r"]
+		self.__sender.receive("clid=1 cid=1", "error id=0 msg=ok", "clid=2", "error id=0 msg=ok")
+		assert self.__results == [("whoami", "clid=1 cid=1"), ("clientlist", "clid=2")]
+		assert self.__sender.sent_data[2:] == ["servervariable \n\r"]
+
+	def test_switches_server_connection_only_when_needed(self):
+		self.__sender.set_command_window(10)
+		self.__send_command("whoami", schandlerid=1)
+		self.__send_command("clientlist", schandlerid=1)
+		self.__send_command("whoami", schandlerid=2)
+		assert self.__sender.sent_data == [
+			"use schandlerid=1\n\r",
+			"whoami \n\r",
+			"clientlist \n\r",
+			"use schandlerid=2\n\r",
+			"whoami \n\r"
+		]
+		self.__sender.receive(
+			"selected schandlerid=1", "error id=0 msg=ok",
+			"clid=1", "error id=0 msg=ok",
+			"clid=1|clid=2", "error id=0 msg=ok",
+			"selected schandlerid=2", "error id=0 msg=ok",
+			"clid=3", "error id=0 msg=ok"
+		)
+		assert self.__results == [("whoami", "clid=1"), ("clientlist", "clid=1|clid=2"), ("whoami", "clid=3")]
+
+	def test_fails_commands_depending_on_failed_server_connection_switch(self):
+		self.__sender.set_command_window(10)
+		self.__send_command("whoami", schandlerid=1)
+		self.__send_command("clientlist", schandlerid=1)
+		self.__send_command("currentschandlerid")
+		self.__sender.receive(
+			"error id=1794 msg=not\\sconnected",
+			"error id=1794 msg=not\\sconnected",
+			"error id=1794 msg=not\\sconnected",
+			"schandlerid=1", "error id=0 msg=ok"
+		)
+		assert [command for command, error in self.__errors] == ["whoami", "clientlist"]
+		assert self.__results == [("currentschandlerid", "schandlerid=1")]
+		self.__send_command("whoami", schandlerid=1)
+		assert self.__sender.sent_data[-2:] == ["use schandlerid=1\n\r", "whoami \n\r"]
+
+	def test_fails_pending_commands_on_disconnect(self):
+		self.__sender.set_command_window(2)
+		self.__send_command("whoami", schandlerid=1)
+		self.__send_command("clientlist")
+		self.__send_command("servervariable")
+		self.__sender.emit("disconnected")
+		assert [command for command, error in self.__errors] == ["whoami", "clientlist", "servervariable"]
+
+	def test_requests_variable_of_multiple_clients_with_one_command(self):
+		callback = mock.Mock()
+		self.__sender.command_clientvariables(clids=[1, 2, 3], variablename="client_meta_data", callback=callback)
+		assert self.__sender.sent_data == ["clientvariable clid=1|clid=2|clid=3 client_meta_data\n\r"]
+		self.__sender.receive("clid=1 client_meta_data=a|clid=2 client_meta_data|clid=3 client_meta_data=c", "error id=0 msg=ok")
+		callback.assert_called_with(None, [
+			{"schandlerid": None, "clid": "1", "client_meta_data": "a"},
+			{"schandlerid": None, "clid": "2", "client_meta_data": ""},
+			{"schandlerid": None, "clid": "3", "client_meta_data": "c"}
+		])
+
+class TestClientQueryEventChecking(object):
+
+	def setUp(self):
+		self.__eventloop = helpers.FakeEventLoop()
+		timer.set_eventloop(self.__eventloop)
+		self.__client = clientquery.ClientQuery()
+		self.__client.is_connected = lambda: True
+		self.__client.send = mock.Mock()
+
+	def __check_events(self, count=1):
+		for i in range(count):
+			self.__eventloop.advance(self.__eventloop.get_timeout())
+
+	def test_checks_with_fixed_interval_by_default(self):
+		self.__client.start_event_checking(0.1)
+		self.__check_events(3)
+		assert self.__eventloop.get_timeout() == 0.1
+
+	def test_backs_off_when_idle(self):
+		self.__client.start_event_checking(0.1, 0.5)
+		assert self.__eventloop.get_timeout() == 0.1
+		self.__check_events()
+		assert self.__eventloop.get_timeout() == 0.2
+		self.__check_events()
+		assert self.__eventloop.get_timeout() == 0.4
+		self.__check_events()
+		assert self.__eventloop.get_timeout() == 0.5
+
+	def test_backs_off_from_zero_interval(self):
+		self.__client.start_event_checking(0, 0.5)
+		self.__check_events()
+		assert self.__eventloop.get_timeout() == clientquery.ClientQuery.MIN_BACKOFF_INTERVAL
+
+	def test_returns_to_min_interval_when_line_is_received(self):
+		self.__client.emit("connected")
+		while self.__client.has_pending_commands():
+			self.__client.emit("line-received", "error id=0 msg=ok")
+		self.__client.start_event_checking(0.1, 0.5)
+		self.__check_events(3)
+		line = "notifytalkstatuschange schandlerid=1 status=1 isreceivedwhisper=0 clid=2"
+		self.__client.on("check-events", lambda: self.__client.emit("line-received", line))
+		self.__check_events()
+		assert self.__eventloop.get_timeout() == 0.1
+
+	def test_returns_to_min_interval_when_command_is_sent(self):
+		self.__client.start_event_checking(0.1, 0.5)
+		self.__check_events(3)
+		self.__client.send_command("whoami", [])
+		assert self.__eventloop.get_timeout() == 0.1
+		self.__check_events()
+		assert self.__eventloop.get_timeout() == 0.1
+
+	def test_provides_event_checking_stats(self):
+		self.__client.start_event_checking(0.1, 0.5)
+		self.__check_events(2)
+		assert self.__client.get_event_checking_stats() == {
+			"interval": 0.4,
+			"min-interval": 0.1,
+			"max-interval": 0.5,
+			"checks": 2,
+			"idle-checks": 2
+		}
+
+class TestClientQueryServerUsersMixin(object):
+
+	def setUp(self):
+		timer.set_eventloop(helpers.FakeEventLoop())
+		self.__client = clientquery.ClientQuery()
+		self.__client.is_connected = lambda: True
+		self.__client.send = mock.Mock()
+		self.__changes = []
+		for event in ["user-changed-client-nickname", "user-changed-talking", "user-changed-client-input-muted"]:
+			self.__client.on(event, self.__on_user_changed(event))
+		self.__client.emit("connected-server", 1)
+		self.__receive(
+			"error id=0 msg=ok",
+			"clid=1 cid=2 client_nickname=Foo client_unique_identifier=abc=|clid=2 cid=3 client_nickname=Bar client_unique_identifier=def=",
+			"error id=0 msg=ok",
+			"clid=1 client_meta_data=meta|clid=2 client_meta_data",
+			"error id=0 msg=ok"
+		)
+
+	def __on_user_changed(self, event):
+		return lambda **kwargs: self.__changes.append((event, kwargs))
+
+	def __receive(self, *lines):
+		for line in lines:
+			self.__client.emit("line-received", line)
+
+	def test_provides_user_parameters(self):
+		assert self.__client.has_user(1, 1)
+		assert self.__client.get_user_parameter(1, 1, "client-nickname") == "Foo"
+		assert self.__client.get_user_parameter(1, 1, "client_unique_identifier") == "abc="
+		assert self.__client.get_user_parameter(1, 1, "client-meta-data") == "meta"
+		assert self.__client.get_user_parameter(1, 2, "cid") == 3
+		assert self.__client.get_user_parameter(1, 2, "unknown") is None
+		assert self.__client.get_user_parameter(1, 3, "cid") is None
+
+	def test_emits_change_of_talk_status_once(self):
+		args = [{"schandlerid": "1", "clid": "2", "status": "1", "isreceivedwhisper": "0"}]
+		self.__client.emit("notifytalkstatuschange", args)
+		self.__client.emit("notifytalkstatuschange", args)
+		assert self.__changes == [("user-changed-talking", {"schandlerid": 1, "clid": 2, "old_value": None, "new_value": True})]
+		assert self.__client.get_user_parameter(1, 2, "talking") == True
+
+	def test_emits_only_changes_of_known_parameters(self):
+		self.__client.emit("notifyclientupdated", [{"schandlerid": "1", "clid": "1", "client_input_muted": "1"}])
+		self.__client.emit("notifyclientupdated", [{"schandlerid": "1", "clid": "1", "client_nickname": "Baz"}])
+		assert self.__changes == [("user-changed-client-nickname", {"schandlerid": 1, "clid": 1, "old_value": "Foo", "new_value": "Baz"})]
+
+	def test_falls_back_to_requesting_metadata_per_client_when_batch_fails(self):
+		self.__client.emit("connected-server", 1)
+		self.__receive(
+			"clid=1 cid=2 client_nickname=Foo client_unique_identifier=abc=|clid=2 cid=3 client_nickname=Bar client_unique_identifier=def=",
+			"error id=0 msg=ok",
+			"error id=512 msg=invalid\\sclientID",
+			"clid=1 client_meta_data=meta1",
+			"error id=0 msg=ok",
+			"clid=2 client_meta_data=meta2",
+			"error id=0 msg=ok"
+		)
+		sent = [args[0] for args, kwargs in self.__client.send.call_args_list]
+		assert "clientvariable clid=1 client_meta_data\n\r" in sent
+		assert "clientvariable clid=2 client_meta_data\n\r" in sent
+		assert self.__client.get_user_parameter(1, 1, "client-meta-data") == "meta1"
+		assert self.__client.get_user_parameter(1, 2, "client-meta-data") == "meta2"
+
+	def test_removes_user_when_client_leaves(self):
+		removed = mock.Mock()
+		self.__client.on("user-removed", removed)
+		self.__client.emit("notifyclientleftview", [{"schandlerid": "1", "clid": "1"}])
+		removed.assert_called_once_with(schandlerid=1, clid=1)
+		assert not self.__client.has_user(1, 1)
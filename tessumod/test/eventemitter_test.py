@@ -0,0 +1,125 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import mock
+
+import helpers
+from tessumod.infrastructure import eventemitter
+
+class TestEventEmitterMixin(object):
+
+	def setUp(self):
+		self.__emitter = eventemitter.EventEmitterMixin()
+		self.__calls = []
+
+	def __listener(self, name):
+		return lambda *args, **kwargs: self.__calls.append((name, args, kwargs))
+
+	def test_calls_listener_with_arguments(self):
+		self.__emitter.on("foo", self.__listener("a"))
+		self.__emitter.emit("foo", 1, bar=2)
+		assert self.__calls == [("a", (1,), {"bar": 2})]
+
+	def test_emitting_event_without_listeners_does_nothing(self):
+		self.__emitter.emit("foo")
+		assert self.__calls == []
+
+	def test_calls_listeners_in_priority_order(self):
+		self.__emitter.on("foo", self.__listener("low"), priority=-1)
+		self.__emitter.on("foo", self.__listener("high"), priority=5)
+		self.__emitter.on("foo", self.__listener("normal"))
+		self.__emitter.emit("foo")
+		assert [name for name, args, kwargs in self.__calls] == ["high", "normal", "low"]
+
+	def test_stop_iteration_prevents_further_listeners(self):
+		def stop():
+			raise StopIteration()
+		self.__emitter.on("foo", stop, priority=1)
+		self.__emitter.on("foo", self.__listener("a"))
+		self.__emitter.emit("foo")
+		assert self.__calls == []
+
+	def test_continues_to_next_listener_after_exception(self):
+		def fail():
+			raise RuntimeError("failure")
+		self.__emitter.on("foo", self.__listener("a"), priority=1)
+		self.__emitter.on("foo", fail)
+		self.__emitter.on("foo", self.__listener("b"), priority=-1)
+		with mock.patch("tessumod.infrastructure.log.LOG_CURRENT_EXCEPTION") as log_exception:
+			self.__emitter.emit("foo")
+			assert log_exception.call_count == 1
+		assert [name for name, args, kwargs in self.__calls] == ["a", "b"]
+
+	def test_listener_added_after_emit_is_called(self):
+		self.__emitter.emit("foo")
+		self.__emitter.on("foo", self.__listener("a"))
+		self.__emitter.emit("foo")
+		assert len(self.__calls) == 1
+
+	def test_off_removes_listener(self):
+		listener = self.__listener("a")
+		self.__emitter.on("foo", listener)
+		self.__emitter.on("foo", self.__listener("b"))
+		self.__emitter.emit("foo")
+		self.__emitter.off("foo", listener)
+		self.__emitter.emit("foo")
+		assert [name for name, args, kwargs in self.__calls] == ["a", "b", "b"]
+
+	def test_off_with_unknown_listener_does_nothing(self):
+		self.__emitter.off("foo", self.__listener("a"))
+		self.__emitter.on("foo", self.__listener("b"))
+		self.__emitter.off("foo", self.__listener("a"))
+		self.__emitter.emit("foo")
+		assert len(self.__calls) == 1
+
+	def test_once_listener_is_called_only_once(self):
+		self.__emitter.once("foo", self.__listener("a"))
+		self.__emitter.emit("foo", 1)
+		self.__emitter.emit("foo", 2)
+		assert self.__calls == [("a", (1,), {})]
+
+	def test_off_removes_once_listener(self):
+		listener = self.__listener("a")
+		self.__emitter.once("foo", listener)
+		self.__emitter.off("foo", listener)
+		self.__emitter.emit("foo")
+		assert self.__calls == []
+
+	def test_off_removes_listeners_from_large_listener_set(self):
+		listeners = [self.__listener(index) for index in range(1000)]
+		for index, listener in enumerate(listeners):
+			self.__emitter.on("foo", listener, priority=index % 3)
+		for listener in listeners[::2]:
+			self.__emitter.off("foo", listener)
+		self.__emitter.emit("foo")
+		expected = sorted(range(1, 1000, 2), key=lambda index: -(index % 3))
+		assert [name for name, args, kwargs in self.__calls] == expected
+
+	def test_registering_listener_again_replaces_previous_registration(self):
+		listener = self.__listener("a")
+		self.__emitter.on("foo", listener)
+		self.__emitter.on("foo", self.__listener("b"), priority=1)
+		self.__emitter.on("foo", listener, priority=2)
+		self.__emitter.emit("foo")
+		assert [name for name, args, kwargs in self.__calls] == ["a", "b"]
+
+	def test_off_removes_bound_method_of_unhashable_object(self):
+		calls = []
+		self.__emitter.on("foo", calls.append)
+		self.__emitter.off("foo", calls.append)
+		self.__emitter.emit("foo", 1)
+		assert calls == []
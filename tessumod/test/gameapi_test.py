@@ -0,0 +1,125 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import helpers
+import mock
+import BigWorld
+import Avatar
+from tessumod.infrastructure import gameapi, log
+
+class TestGameApiBattle(object):
+
+	def setUp(self):
+		BigWorld.player(Avatar.Avatar())
+		self.__arena = BigWorld.player().arena
+		self.__add_vehicle(10, 1000, "Foo")
+		self.__add_vehicle(11, 1001, "Bar")
+
+	def tearDown(self):
+		gameapi.Battle.clear_vehicle_index()
+		log.set_level(log.LOG_LEVEL.NOTE)
+
+	def __add_vehicle(self, vehicle_id, dbid, name):
+		self.__arena.vehicles[vehicle_id] = {"accountDBID": dbid, "name": name, "isAlive": True}
+
+	def test_finds_vehicle_id_by_dbid(self):
+		assert gameapi.Battle.find_vehicle_id_by_dbid(1000) == 10
+		assert gameapi.Battle.find_vehicle_id_by_dbid(1001) == 11
+		assert gameapi.Battle.find_vehicle_id_by_dbid(1002) is None
+
+	def test_finds_vehicle_added_with_event(self):
+		gameapi.Battle.find_vehicle_id_by_dbid(1000)
+		self.__add_vehicle(12, 1002, "Baz")
+		self.__arena.onVehicleAdded(12)
+		assert gameapi.Battle.find_vehicle_id_by_dbid(1002) == 12
+
+	def test_finds_vehicle_added_without_event(self):
+		gameapi.Battle.find_vehicle_id_by_dbid(1000)
+		self.__add_vehicle(12, 1002, "Baz")
+		assert gameapi.Battle.find_vehicle_id_by_dbid(1002) == 12
+
+	def test_finds_vehicles_from_new_arena(self):
+		gameapi.Battle.find_vehicle_id_by_dbid(1000)
+		BigWorld.player(Avatar.Avatar())
+		self.__arena = BigWorld.player().arena
+		self.__add_vehicle(20, 1000, "Foo")
+		assert gameapi.Battle.find_vehicle_id_by_dbid(1000) == 20
+
+	def test_finds_vehicle_updated_with_event(self):
+		gameapi.Battle.find_vehicle_id_by_dbid(1000)
+		self.__add_vehicle(11, 1002, "Baz")
+		self.__arena.onVehicleUpdated(11)
+		assert gameapi.Battle.find_vehicle_id_by_dbid(1002) == 11
+
+	def test_detaches_from_previous_arena(self):
+		gameapi.Battle.find_vehicle_id_by_dbid(1000)
+		BigWorld.player().arena = Avatar.TestArena()
+		gameapi.Battle.find_vehicle_id_by_dbid(1000)
+		assert not self.__arena.onVehicleAdded.callbacks
+		assert not self.__arena.onVehicleUpdated.callbacks
+		assert not self.__arena.onNewVehicleListReceived.callbacks
+
+	def test_detaches_from_arena_when_avatar_is_no_longer_player(self):
+		gameapi.Battle.find_vehicle_id_by_dbid(1000)
+		BigWorld.player().onBecomeNonPlayer()
+		assert not self.__arena.onVehicleAdded.callbacks
+	def test_roster_version_changes_when_vehicles_change(self):
+		version = gameapi.Player.get_roster_version()
+		assert gameapi.Player.get_roster_version() == version
+		self.__add_vehicle(12, 1002, "Baz")
+		assert gameapi.Player.get_roster_version() != version
+
+	def test_roster_version_changes_when_vehicle_changes_owner(self):
+		version = gameapi.Player.get_roster_version()
+		self.__add_vehicle(11, 1002, "Baz")
+		self.__arena.onVehicleUpdated(11)
+		assert gameapi.Player.get_roster_version() != version
+
+	def test_notifies_roster_change(self):
+		gameapi.Battle.find_vehicle_id_by_dbid(1000)
+		listener = mock.Mock()
+		gameapi.Player.onRosterChanged += listener
+		try:
+			self.__add_vehicle(12, 1002, "Baz")
+			self.__arena.onVehicleAdded(12)
+			self.__arena.vehicles[12]["isAlive"] = False
+			self.__arena.onVehicleUpdated(12)
+		finally:
+			gameapi.Player.onRosterChanged -= listener
+		assert listener.call_count == 1
+
+	def test_roster_version_is_kept_when_vehicle_state_is_updated(self):
+		version = gameapi.Player.get_roster_version()
+		self.__arena.vehicles[11]["isAlive"] = False
+		self.__arena.onVehicleUpdated(11)
+		assert gameapi.Player.get_roster_version() == version
+
+	def test_provides_player_by_dbid(self):
+		assert gameapi.Player.get_player_by_dbid(1001) == dict(id=1001, name="Bar", in_battle=True, vehicle_id=11, is_alive=True)
+
+	def test_logs_found_players_at_debug_level(self):
+		log.set_level(log.LOG_LEVEL.DEBUG)
+		with mock.patch.object(log, "LOG_DEBUG") as log_debug:
+			assert len(list(gameapi.Player.get_players(in_battle=True))) == 2
+		log_debug.assert_called_once_with("Found players from battle", mock.ANY)
+		assert sorted(log_debug.call_args[0][1]) == ["Bar", "Foo"]
+
+	def test_does_not_log_found_players_at_note_level(self):
+		log.set_level(log.LOG_LEVEL.NOTE)
+		with mock.patch.object(log, "LOG_DEBUG") as log_debug:
+			assert len(list(gameapi.Player.get_players(in_battle=True))) == 2
+		assert not log_debug.called
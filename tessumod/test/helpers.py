@@ -30,3 +30,34 @@ sys.path.extend([
 	os.path.realpath(os.path.join(project_rootpath, "futes", "fakes")),
 	os.path.realpath(os.path.join(project_rootpath, "tessumod", "src", "scripts", "client", "gui", "mods"))
 ])
+
+class FakeEventLoop(object):
+	'''Event loop which runs on virtual time.'''
+
+	def __init__(self):
+		self.time = 0.0
+		self.callbacks = {}
+		self.__next_id = 0
+
+	def callback(self, secs, function):
+		self.__next_id += 1
+		self.callbacks[self.__next_id] = (self.time + secs, function)
+		return self.__next_id
+
+	def cancel_callback(self, id):
+		del self.callbacks[id]
+
+	def get_timeout(self):
+		'''Returns seconds until next callback is called.'''
+		return round(min(call_time for call_time, function in self.callbacks.itervalues()) - self.time, 6)
+
+	def advance(self, secs):
+		end_time = self.time + secs
+		while self.callbacks:
+			id, (call_time, function) = min(self.callbacks.items(), key=lambda item: item[1][0])
+			if call_time > end_time + 1e-9:
+				break
+			del self.callbacks[id]
+			self.time = max(self.time, call_time)
+			function()
+		self.time = end_time
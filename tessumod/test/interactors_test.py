@@ -18,11 +18,17 @@
 import random
 import re
 import mock
-import copy
 
 import helpers
-from tessumod import interactors
+from tessumod import interactors, roster
 from tessumod.constants import SettingConstants
+from tessumod.nickpatterns import NickExtractPatterns
+from tessumod.pairingcache import PairingCache
+
+class FakeChatUser(object):
+
+	def __init__(self, **kwargs):
+		self.__dict__.update(kwargs)
 
 class TestInteractorsPairChatUserToPlayer(object):
 
@@ -32,7 +38,7 @@ class TestInteractorsPairChatUserToPlayer(object):
 		self.__chat_clients = {}
 		self.__settings_data = {
 			SettingConstants.NICK_MAPPINGS: {},
-			SettingConstants.NICK_EXTRACT_PATTERNS: [],
+			SettingConstants.NICK_EXTRACT_PATTERNS: NickExtractPatterns([]),
 			SettingConstants.CHAT_NICK_SEARCH_ENABLED: False,
 			SettingConstants.GET_GAME_NICK_FROM_CHAT_CLIENT: False
 		}
@@ -46,13 +52,14 @@ class TestInteractorsPairChatUserToPlayer(object):
 		self.__interactor.chatclient.get_user.side_effect = self.__get_chat_client
 		self.__interactor.chatclient.get_current_channel_id.return_value = self.__channel_id
 		self.__interactor.players = mock.Mock()
+		self.__interactor.players.get_roster.side_effect = lambda: roster.Roster(self.__interactor.players.get_players.return_value)
 		self.__interactor.settings = mock.Mock()
 		self.__interactor.settings.get.side_effect = lambda key: self.__settings_data[key]
+		self.__interactor.settings.get_version.return_value = 1
+		self.__interactor.pairingcache = PairingCache()
 
 	def __get_chat_client(self, client_id):
-		client = copy.copy(self.__chat_clients[client_id])
-		client["client_id"] = client_id
-		return client
+		return FakeChatUser(client_id=client_id, **self.__chat_clients[client_id])
 
 	def test_matches_using_metadata(self):
 		self.__settings_data[SettingConstants.GET_GAME_NICK_FROM_CHAT_CLIENT] = True
@@ -86,7 +93,7 @@ class TestInteractorsPairChatUserToPlayer(object):
 		self.__interactor.usercache.pair.assert_called_with(1001, "deadf00d")
 
 	def test_extracts_nick_using_regexp_patterns(self):
-		self.__settings_data[SettingConstants.NICK_EXTRACT_PATTERNS] = [re.compile(r"\[[^\]]+\]\s*([a-z0-9_]+)", re.IGNORECASE)]
+		self.__settings_data[SettingConstants.NICK_EXTRACT_PATTERNS] = NickExtractPatterns([r"\[[^\]]+\]\s*([a-z0-9_]+)"])
 		self.__interactor.players.get_players.return_value = [dict(name="TestDummy", id=1000), dict(name="TESTtomato", id=1001)]
 		self.__chat_clients[self.__client_id] = dict(
 			nick="[T-BAD] TestTomato",
@@ -119,7 +126,7 @@ class TestInteractorsPairChatUserToPlayer(object):
 
 	def test_matches_using_both_patterns_and_mappings(self):
 		self.__interactor.players.get_players.return_value = [dict(name="TestDummy", id=1000), dict(name="TESTtomato123", id=1001)]
-		self.__settings_data[SettingConstants.NICK_EXTRACT_PATTERNS] = [re.compile(r"\[[^\]]+\]\s*([a-z0-9_]+)", re.IGNORECASE)]
+		self.__settings_data[SettingConstants.NICK_EXTRACT_PATTERNS] = NickExtractPatterns([r"\[[^\]]+\]\s*([a-z0-9_]+)"])
 		self.__settings_data[SettingConstants.NICK_MAPPINGS] = dict(matti="TESTtomato123")
 		self.__chat_clients[self.__client_id] = dict(
 			nick="[T-BAD] Matti",
@@ -149,3 +156,74 @@ class TestInteractorsPairChatUserToPlayer(object):
 		self.__interactor.execute(client_id=self.__client_id)
 		self.__interactor.usercache.add_player.assert_called_with(id=1001, name="TESTtomato")
 		self.__interactor.usercache.pair.assert_called_with(1001, "deadf00d")
+
+	def test_reuses_previous_result_for_same_user(self):
+		self.__interactor.players.get_players.return_value = [dict(name="TestTomato", id=1001)]
+		self.__interactor.players.get_roster_version.return_value = 1
+		self.__chat_clients[self.__client_id] = dict(
+			nick="TestTomato",
+			game_nick="",
+			unique_id="deadf00d",
+			channel_id=self.__channel_id,
+			speaking=True,
+			is_me=False,
+			in_my_channel=True
+		)
+		self.__interactor.execute(client_id=self.__client_id)
+		self.__interactor.execute(client_id=self.__client_id)
+		assert self.__interactor.players.get_roster.call_count == 1
+		assert self.__interactor.usercache.pair.call_count == 2
+		assert self.__interactor.pairingcache.get_stats() == {"hits": 1, "misses": 1, "size": 1}
+
+	def test_matches_again_when_roster_or_user_changes(self):
+		self.__interactor.players.get_players.return_value = [dict(name="TestDummy", id=1000)]
+		self.__interactor.players.get_roster_version.return_value = 1
+		self.__chat_clients[self.__client_id] = dict(
+			nick="TestTomato",
+			game_nick="",
+			unique_id="deadf00d",
+			channel_id=self.__channel_id,
+			speaking=True,
+			is_me=False,
+			in_my_channel=True
+		)
+		self.__interactor.execute(client_id=self.__client_id)
+		assert not self.__interactor.usercache.pair.called
+		self.__interactor.players.get_players.return_value = [dict(name="TestTomato", id=1001)]
+		self.__interactor.players.get_roster_version.return_value = 2
+		self.__interactor.execute(client_id=self.__client_id)
+		self.__interactor.usercache.pair.assert_called_with(1001, "deadf00d")
+		self.__chat_clients[self.__client_id]["nick"] = "TestDummy"
+		self.__interactor.players.get_players.return_value = [dict(name="TestDummy", id=1000)]
+		self.__interactor.execute(client_id=self.__client_id)
+		self.__interactor.usercache.pair.assert_called_with(1000, "deadf00d")
+		assert self.__interactor.players.get_roster.call_count == 3
+
+class TestInteractorsPairChatUsersToPlayers(object):
+
+	def setUp(self):
+		self.__interactor = interactors.PairChatUsersToPlayers()
+		self.__interactor.usercache = mock.Mock()
+		self.__interactor.chatclient = mock.Mock()
+		self.__interactor.players = mock.Mock()
+		self.__interactor.players.get_roster.side_effect = lambda: roster.Roster(self.__interactor.players.get_players.return_value)
+		self.__interactor.players.get_roster_version.return_value = 1
+		self.__interactor.settings = mock.Mock()
+		self.__interactor.settings.get.side_effect = lambda key: {
+			SettingConstants.NICK_MAPPINGS: {},
+			SettingConstants.NICK_EXTRACT_PATTERNS: NickExtractPatterns([]),
+			SettingConstants.CHAT_NICK_SEARCH_ENABLED: False,
+			SettingConstants.GET_GAME_NICK_FROM_CHAT_CLIENT: False
+		}[key]
+		self.__interactor.settings.get_version.return_value = 1
+		self.__interactor.pairingcache = PairingCache()
+
+	def test_pairs_all_users_in_my_channel(self):
+		self.__interactor.players.get_players.return_value = [dict(name="TestDummy", id=1000), dict(name="TestTomato", id=1001)]
+		self.__interactor.chatclient.get_users.return_value = [
+			FakeChatUser(nick="TestDummy", game_nick="", unique_id="deadf00d", in_my_channel=True),
+			FakeChatUser(nick="TestTomato", game_nick="", unique_id="beefcafe", in_my_channel=True),
+			FakeChatUser(nick="TestTomato", game_nick="", unique_id="f00dbabe", in_my_channel=False)
+		]
+		self.__interactor.execute()
+		assert self.__interactor.usercache.pair.call_args_list == [mock.call(1000, "deadf00d"), mock.call(1001, "beefcafe")]
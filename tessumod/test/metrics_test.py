@@ -0,0 +1,137 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import json
+import mock
+
+import helpers
+from tessumod.adapters.metrics import MetricsAdapter
+from tessumod.infrastructure import metrics, timer
+from tessumod.infrastructure.eventemitter import EventEmitterMixin
+
+metrics_path = os.path.join(helpers.temp_dirpath, "tessu_mod_metrics.json")
+
+class TestMetrics(object):
+
+	def setUp(self):
+		metrics.set_enabled(True)
+
+	def tearDown(self):
+		metrics.set_enabled(False)
+
+	def test_counts(self):
+		metrics.counter("foo").inc()
+		metrics.counter("foo").inc(2)
+		assert metrics.get_snapshot()["counters"]["foo"] == 3
+
+	def test_keeps_labeled_values_separately(self):
+		metrics.counter("labeled", "a").inc()
+		metrics.counter("labeled", "b").inc(2)
+		assert metrics.get_snapshot()["counters"]["labeled"] == {"a": 1, "b": 2}
+
+	def test_gauge_keeps_latest_value(self):
+		metrics.gauge("foo").set(5)
+		metrics.gauge("foo").set(3)
+		assert metrics.get_snapshot()["gauges"]["foo"] == 3
+
+	def test_histogram_counts_values_to_buckets(self):
+		histogram = metrics.histogram("foo")
+		histogram.observe(0.00005)
+		histogram.observe(0.0001)
+		histogram.observe(0.003)
+		histogram.observe(10)
+		value = metrics.get_snapshot()["histograms"]["foo"]
+		assert value["count"] == 4
+		assert value["max"] == 10
+		assert value["buckets"][0] == [0.0001, 2]
+		assert value["buckets"][5] == [0.005, 1]
+		assert value["buckets"][-1] == [None, 1]
+
+	def test_enabling_resets_values(self):
+		metrics.counter("foo").inc()
+		metrics.set_enabled(False)
+		metrics.set_enabled(True)
+		assert metrics.get_snapshot()["counters"]["foo"] == 0
+
+	def test_measures_emitted_events(self):
+		emitter = EventEmitterMixin()
+		emitter.on("foo", mock.Mock())
+		emitter.emit("foo")
+		emitter.emit("foo")
+		assert metrics.get_snapshot()["histograms"]["event-emit"]["foo"]["count"] == 2
+
+	def test_does_not_measure_when_disabled(self):
+		metrics.set_enabled(False)
+		emitter = EventEmitterMixin()
+		emitter.on("bar", mock.Mock())
+		emitter.emit("bar")
+		assert "bar" not in metrics.get_snapshot()["histograms"].get("event-emit", {})
+
+class TestMetricsAdapter(object):
+
+	def setUp(self):
+		try:
+			os.makedirs(os.path.dirname(metrics_path))
+		except:
+			pass
+		try:
+			os.remove(metrics_path)
+		except:
+			pass
+		timer.set_eventloop(mock.MagicMock())
+		self.adapter = MetricsAdapter()
+		self.adapter.init(metrics_path)
+
+	def tearDown(self):
+		metrics.set_enabled(False)
+
+	def read_dumps(self):
+		with open(metrics_path, "r") as file:
+			return [json.loads(line) for line in file]
+
+	def test_appends_dumps_to_file(self):
+		self.adapter.set_enabled(True)
+		metrics.counter("foo").inc()
+		self.adapter.dump()
+		metrics.counter("foo").inc()
+		self.adapter.dump()
+		dumps = self.read_dumps()
+		assert [dump["counters"]["foo"] for dump in dumps] == [1, 2]
+
+	def test_truncates_file_when_enabled_again(self):
+		self.adapter.set_enabled(True)
+		self.adapter.dump()
+		self.adapter.set_enabled(False)
+		self.adapter.set_enabled(True)
+		self.adapter.dump()
+		assert len(self.read_dumps()) == 1
+
+	def test_dumps_when_disabled(self):
+		self.adapter.set_enabled(True)
+		metrics.counter("foo").inc()
+		self.adapter.set_enabled(False)
+		assert self.read_dumps()[0]["counters"]["foo"] == 1
+		assert not metrics.is_enabled()
+
+	def test_dumps_stats_of_added_sources(self):
+		self.adapter.add_stats_source("pairing-cache", lambda: {"hits": 3, "misses": 1})
+		self.adapter.set_enabled(True)
+		self.adapter.dump()
+		gauges = self.read_dumps()[0]["gauges"]
+		assert gauges["pairing-cache"] == {"hits": 3, "misses": 1}
+		assert "timers" in gauges
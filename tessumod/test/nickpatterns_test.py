@@ -0,0 +1,66 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import re
+import mock
+
+import helpers
+from tessumod.nickpatterns import NickExtractPatterns
+
+class TestNickExtractPatterns(object):
+
+	def test_extracts_nick_with_first_matching_pattern(self):
+		patterns = NickExtractPatterns([r"\[[^\]]+\]\s*([a-z0-9_]+)", r"([a-z0-9_]+)"])
+		assert [nick for nick, pattern in patterns.extract("[T-BAD] TestTomato")] == ["TestTomato"]
+		assert [nick for nick, pattern in patterns.extract("TestTomato | Matti")] == ["TestTomato"]
+
+	def test_extracts_nicks_from_all_matching_patterns_in_order(self):
+		patterns = NickExtractPatterns([r"([a-z]+)", r"no match ([a-z]+)", r"([a-z]+) \(([a-z]+)\)"])
+		result = patterns.extract("Nick (Matti)")
+		assert [nick for nick, pattern in result] == ["Nick", "Nick"]
+		assert [pattern.pattern for nick, pattern in result] == [r"([a-z]+)", r"([a-z]+) \(([a-z]+)\)"]
+
+	def test_finds_later_patterns_with_groups_before_them(self):
+		patterns = NickExtractPatterns([r"(a)(b)(c)x", r"\[(\w+)\]", r"(\w+)!"])
+		assert [nick for nick, pattern in patterns.extract("Nick!")] == ["Nick"]
+
+	def test_returns_nothing_if_no_pattern_matches(self):
+		patterns = NickExtractPatterns([r"\[[^\]]+\]\s*([a-z0-9_]+)"])
+		assert patterns.extract("TestTomato") == ()
+		assert patterns.extract(None) == ()
+
+	def test_ignores_patterns_without_groups_or_participating_group(self):
+		patterns = NickExtractPatterns([r"[a-z]+", r"(x)?[a-z]+", r"\s*([a-z]+)"])
+		assert [nick for nick, pattern in patterns.extract("nick")] == ["nick"]
+
+	def test_supports_patterns_with_backreferences(self):
+		patterns = NickExtractPatterns([r"(\w)\1 (\w+)", r"([a-z]+)-\1"])
+		assert [nick for nick, pattern in patterns.extract("foo-foo")] == ["foo"]
+
+	def test_memoizes_results_per_nick(self):
+		pattern = mock.Mock(wraps=re.compile(r"([a-z]+)"))
+		pattern.pattern = r"([a-z]+)"
+		pattern.flags = re.IGNORECASE
+		pattern.groups = 1
+		patterns = NickExtractPatterns([pattern])
+		patterns.extract("nick")
+		patterns.extract("nick")
+		assert pattern.match.call_count == 1
+
+	def test_is_false_without_patterns(self):
+		assert not NickExtractPatterns([])
+		assert len(NickExtractPatterns([r"(a)", r"(b)"])) == 2
@@ -0,0 +1,92 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import time
+import threading
+
+import helpers
+from tessumod.infrastructure.profiler import SamplingProfiler
+from tessumod.adapters.profiler import ProfilerAdapter
+
+profile_path = os.path.join(helpers.temp_dirpath, "tessu_mod_profile.txt")
+
+def busy_outer(secs):
+	busy_inner(secs)
+
+def busy_inner(secs):
+	end_time = time.time() + secs
+	while time.time() < end_time:
+		pass
+
+class TestSamplingProfiler(object):
+
+	def setUp(self):
+		self.profiler = SamplingProfiler(threading.current_thread().ident, interval=0.001, root_dirpath=helpers.script_dirpath)
+		self.profiler.start()
+
+	def tearDown(self):
+		self.profiler.stop()
+		self.profiler.join()
+
+	def test_samples_stacks_of_given_thread(self):
+		busy_outer(0.2)
+		stacks = self.profiler.get_stack_counts()
+		assert any(stack[-2:] == ("profiler_test.py:busy_outer", "profiler_test.py:busy_inner") for stack in stacks)
+
+	def test_keeps_only_frames_within_root_dirpath(self):
+		busy_outer(0.2)
+		for stack in self.profiler.get_stack_counts():
+			assert all(label.startswith("profiler_test.py:") for label in stack)
+
+	def test_outputs_collapsed_stacks(self):
+		busy_outer(0.2)
+		lines = self.profiler.get_collapsed_stacks()
+		assert any(line.startswith("profiler_test.py:test_outputs_collapsed_stacks;profiler_test.py:busy_outer;profiler_test.py:busy_inner ") for line in lines)
+		assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) <= self.profiler.get_sample_count()
+
+class TestProfilerAdapter(object):
+
+	def setUp(self):
+		try:
+			os.makedirs(os.path.dirname(profile_path))
+		except:
+			pass
+		try:
+			os.remove(profile_path)
+		except:
+			pass
+		self.adapter = ProfilerAdapter()
+		self.adapter.init(profile_path)
+		self.adapter.set_interval(0.001)
+
+	def tearDown(self):
+		self.adapter.set_enabled(False)
+
+	def test_dumps_when_disabled(self):
+		self.adapter.set_enabled(True)
+		assert self.adapter.is_collecting()
+		self.adapter.set_enabled(False)
+		assert not self.adapter.is_collecting()
+		assert os.path.exists(profile_path)
+
+	def test_dumps_when_enabled_again(self):
+		self.adapter.set_enabled(True)
+		assert not os.path.exists(profile_path)
+		self.adapter.set_enabled(True)
+		assert os.path.exists(profile_path)
+		assert self.adapter.is_collecting()
@@ -0,0 +1,78 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import mock
+
+import helpers
+from tessumod.roster import Roster, NameMatcher
+
+class TestRoster(object):
+
+	def setUp(self):
+		self.__roster = Roster([
+			dict(name="TestDummy", id=1000),
+			dict(name="TestTomato", id=1001),
+			dict(name="TESTtomato", id=1002)
+		])
+
+	def test_finds_player_by_name_case_insensitive(self):
+		assert self.__roster.find_by_name("testdummy")["id"] == 1000
+		assert self.__roster.find_by_name("TESTDUMMY")["id"] == 1000
+
+	def test_first_player_wins_with_same_names(self):
+		assert self.__roster.find_by_name("testtomato")["id"] == 1001
+		assert len(self.__roster) == 2
+
+	def test_returns_none_for_unknown_or_missing_name(self):
+		assert self.__roster.find_by_name("Foo") is None
+		assert self.__roster.find_by_name(None) is None
+
+	def test_finds_player_whose_name_is_in_text(self):
+		assert self.__roster.find_by_name_in("[CLAN] testtomato (Matti)")["id"] == 1001
+		assert self.__roster.find_by_name_in("Matti") is None
+		assert self.__roster.find_by_name_in(None) is None
+
+	def test_longest_name_in_text_wins(self):
+		roster = Roster([dict(name="Tomato", id=1), dict(name="TestTomato", id=2), dict(name="Test", id=3)])
+		assert roster.find_by_name_in("[CLAN] TestTomato")["id"] == 2
+
+	def test_first_name_in_text_wins_with_equal_lengths(self):
+		roster = Roster([dict(name="Bar", id=1), dict(name="Foo", id=2)])
+		assert roster.find_by_name_in("Foo / Bar")["id"] == 2
+
+class TestNameMatcher(object):
+
+	def test_finds_names_overlapping_each_other(self):
+		matcher = NameMatcher(["he", "she", "his", "hers"])
+		assert matcher.find_longest("ushers") == "hers"
+		assert matcher.find_longest("ushe") == "she"
+		assert matcher.find_longest("ahis") == "his"
+		assert matcher.find_longest("xyz") is None
+
+	def test_finds_name_after_failed_partial_match(self):
+		matcher = NameMatcher(["abcd", "bce"])
+		assert matcher.find_longest("abce") == "bce"
+
+class TestRosterWithNameMatcher(TestRoster):
+
+	def setUp(self):
+		self.__patcher = mock.patch.object(Roster, "NAME_MATCHER_MIN_NAMES", 0)
+		self.__patcher.start()
+		super(TestRosterWithNameMatcher, self).setUp()
+
+	def tearDown(self):
+		self.__patcher.stop()
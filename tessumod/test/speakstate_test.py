@@ -0,0 +1,95 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import mock
+
+import helpers
+from tessumod.infrastructure import timer
+from tessumod.speakstate import SpeakStateDebouncer
+
+class TestSpeakStateDebouncer(object):
+
+	def setUp(self):
+		self.__eventloop = helpers.FakeEventLoop()
+		timer.set_eventloop(self.__eventloop)
+		self.__debouncer = SpeakStateDebouncer()
+		self.__start = mock.Mock()
+		self.__stop = mock.Mock()
+
+	def test_start_is_called_immediately(self):
+		self.__debouncer.start((1, 1), self.__start)
+		assert self.__start.called
+		assert self.__debouncer.get_timer_count() == 0
+
+	def test_stop_is_called_after_timeout(self):
+		self.__debouncer.stop((1, 1), 1, self.__stop)
+		assert not self.__stop.called
+		assert self.__debouncer.get_timer_count() == 1
+		self.__eventloop.advance(1)
+		assert self.__stop.called
+		assert self.__debouncer.get_timer_count() == 0
+
+	def test_repeated_stops_restart_same_timer(self):
+		for i in range(100):
+			self.__debouncer.stop((1, 1), 1, self.__stop)
+		assert self.__debouncer.get_timer_count() == 1
+		assert len(self.__eventloop.callbacks) == 1
+		self.__eventloop.advance(1)
+		assert self.__stop.call_count == 1
+
+	def test_start_cancels_pending_stop(self):
+		self.__debouncer.start((1, 1), mock.Mock())
+		self.__debouncer.stop((1, 1), 1, self.__stop)
+		self.__debouncer.start((1, 1), self.__start)
+		assert not self.__start.called
+		assert self.__debouncer.get_timer_count() == 0
+		assert len(self.__eventloop.callbacks) == 0
+
+	def test_start_is_called_if_stop_is_pending_without_start(self):
+		self.__debouncer.stop((1, 1), 1, self.__stop)
+		self.__debouncer.start((1, 1), self.__start)
+		assert self.__start.called
+		assert self.__debouncer.get_timer_count() == 0
+
+	def test_start_is_called_after_stop(self):
+		self.__debouncer.start((1, 1), mock.Mock())
+		self.__debouncer.stop((1, 1), 1, self.__stop)
+		self.__eventloop.advance(1)
+		self.__debouncer.start((1, 1), self.__start)
+		assert self.__start.called
+
+	def test_flapping_stays_bounded(self):
+		for i in range(100):
+			for clid in range(10):
+				self.__debouncer.start((1, clid), self.__start)
+				self.__debouncer.stop((1, clid), 1, self.__stop)
+		assert self.__debouncer.get_timer_count() == 10
+		assert timer.get_timer_stats()["active-timers"] == 10
+		assert self.__start.call_count == 10
+
+	def test_cancel_all_cancels_pending_stops(self):
+		self.__debouncer.stop((1, 1), 1, self.__stop)
+		self.__debouncer.stop((1, 2), 1, self.__stop)
+		self.__debouncer.cancel_all()
+		assert self.__debouncer.get_timer_count() == 0
+		assert len(self.__eventloop.callbacks) == 0
+
+	def test_provides_stats(self):
+		self.__debouncer.start((1, 1), self.__start)
+		self.__debouncer.start((1, 2), self.__start)
+		self.__debouncer.stop((1, 2), 1, self.__stop)
+		assert self.__debouncer.get_stats() == {"pending-stops": 1, "started": 2}
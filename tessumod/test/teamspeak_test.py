@@ -0,0 +1,81 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import collections
+import mock
+
+import helpers
+from tessumod.infrastructure import timer
+from tessumod.adapters import teamspeak
+
+class TestTeamSpeakChatClientAdapter(object):
+
+	def setUp(self):
+		timer.set_eventloop(mock.Mock())
+		self.__app = collections.defaultdict(mock.Mock)
+		self.__adapter = teamspeak.TeamSpeakChatClientAdapter(self.__app)
+		self.__ts = self.__adapter.get_clientquery()
+		self.__ts.is_connected = lambda: True
+		self.__ts.send = mock.Mock()
+		self.__ts.emit("connected-server", 1)
+		for line in [
+			"error id=0 msg=ok",
+			"clid=1 cid=2 client_nickname=Foo client_unique_identifier=abc=",
+			"error id=0 msg=ok",
+			"virtualserver_name=Test",
+			"error id=0 msg=ok",
+			"clid=1 client_meta_data=<wot_nickname_start>Bar<wot_nickname_end>",
+			"error id=0 msg=ok"
+		]:
+			self.__ts.emit("line-received", line)
+
+	def test_user_provides_values_as_attributes_and_items(self):
+		user = self.__adapter.get_user((1, 1))
+		assert user.client_id == (1, 1)
+		assert user.nick == "Foo"
+		assert user["unique_id"] == "abc="
+		assert user.game_nick == "Bar"
+		assert user.speaking is None
+
+	def test_returns_same_user_object_on_each_call(self):
+		assert self.__adapter.get_user((1, 1)) is self.__adapter.get_user((1, 1))
+		assert list(self.__adapter.get_users()) == [self.__adapter.get_user((1, 1))]
+
+	def test_user_reflects_changes(self):
+		user = self.__adapter.get_user((1, 1))
+		self.__ts.emit("notifytalkstatuschange", [{"schandlerid": "1", "clid": "1", "status": "1"}])
+		assert user.speaking == True
+
+	def test_user_is_not_reused_after_removal(self):
+		user = self.__adapter.get_user((1, 1))
+		self.__ts.emit("notifyclientleftview", [{"schandlerid": "1", "clid": "1"}])
+		self.__ts.emit("notifycliententerview", [{"schandlerid": "1", "clid": "1", "ctid": "2", "client_nickname": "Baz"}])
+		assert self.__adapter.get_user((1, 1)) is not user
+		assert self.__adapter.get_user((1, 1)).nick == "Baz"
+
+	def test_talking_change_only_updates_speak_state(self):
+		self.__app["cache-chatuser"].reset_mock()
+		self.__app["pair-chatuser-to-player"].reset_mock()
+		self.__ts.emit("notifytalkstatuschange", [{"schandlerid": "1", "clid": "1", "status": "1"}])
+		assert not self.__app["cache-chatuser"].called
+		assert not self.__app["pair-chatuser-to-player"].called
+		self.__app["update-chatuser-speakstate"].assert_called_with(client_id=(1, 1))
+
+	def test_nickname_change_caches_user(self):
+		self.__app["cache-chatuser"].reset_mock()
+		self.__ts.emit("notifyclientupdated", [{"schandlerid": "1", "clid": "1", "client_nickname": "Baz"}])
+		self.__app["cache-chatuser"].assert_called_with(client_id=(1, 1))
@@ -0,0 +1,153 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import mock
+
+import helpers
+from tessumod.infrastructure import timer
+
+class TestTimerWheel(object):
+
+	def setUp(self):
+		self.__eventloop = helpers.FakeEventLoop()
+		self.__wheel = timer.TimerWheel(self.__eventloop, clock=lambda: self.__eventloop.time)
+		self.__calls = []
+
+	def __add(self, secs, name, repeat=False):
+		return self.__wheel.add(secs, lambda: self.__calls.append((name, round(self.__eventloop.time, 2))), repeat)
+
+	def test_calls_timers_in_order(self):
+		self.__add(0.3, "c")
+		self.__add(0.1, "a")
+		self.__add(0.2, "b")
+		self.__eventloop.advance(1)
+		assert self.__calls == [("a", 0.1), ("b", 0.2), ("c", 0.3)]
+
+	def test_uses_single_event_loop_callback(self):
+		for i in range(100):
+			self.__add(0.1 * (i + 1), i)
+		assert len(self.__eventloop.callbacks) == 1
+		self.__eventloop.advance(5)
+		assert len(self.__eventloop.callbacks) == 1
+		self.__eventloop.advance(10)
+		assert len(self.__eventloop.callbacks) == 0
+		assert len(self.__calls) == 100
+
+	def test_repeats_timer(self):
+		self.__add(0.5, "a", repeat=True)
+		self.__eventloop.advance(2)
+		assert self.__calls == [("a", 0.5), ("a", 1.0), ("a", 1.5), ("a", 2.0)]
+
+	def test_cancels_timer(self):
+		handle = self.__add(0.1, "a")
+		self.__add(0.2, "b")
+		self.__wheel.cancel(handle)
+		self.__eventloop.advance(1)
+		assert self.__calls == [("b", 0.2)]
+
+	def test_timer_can_be_cancelled_by_timer_of_same_tick(self):
+		handles = {}
+		def cancel_other(name, other):
+			self.__calls.append(name)
+			self.__wheel.cancel(handles[other])
+		handles["a"] = self.__wheel.add(0.1, lambda: cancel_other("a", "b"))
+		handles["b"] = self.__wheel.add(0.1, lambda: cancel_other("b", "a"))
+		self.__eventloop.advance(1)
+		assert len(self.__calls) == 1
+
+	def test_cancels_event_loop_callback_when_no_timers_remain(self):
+		self.__wheel.cancel(self.__add(0.1, "a"))
+		assert len(self.__eventloop.callbacks) == 0
+
+	def test_calls_far_away_timers_on_time(self):
+		self.__add(700, "c")
+		self.__add(45, "b")
+		self.__add(0.7, "a")
+		self.__eventloop.advance(1000)
+		assert self.__calls == [("a", 0.7), ("b", 45.0), ("c", 700.0)]
+
+	def test_timer_can_be_added_from_timer(self):
+		self.__wheel.add(0.1, lambda: self.__add(0.1, "a"))
+		self.__eventloop.advance(1)
+		assert self.__calls == [("a", 0.2)]
+
+	def test_reports_stats(self):
+		self.__add(0.1, "a")
+		self.__add(10, "b", repeat=True)
+		self.__eventloop.advance(0.1)
+		stats = self.__wheel.get_stats()
+		assert stats["active-timers"] == 1
+		assert stats["overruns"] == 0
+
+	def test_reports_overrun(self):
+		self.__add(0.1, "a")
+		# pretend the game was busy and called back too late
+		self.__eventloop.time = 0.5
+		self.__eventloop.advance(0)
+		assert self.__calls == [("a", 0.5)]
+		stats = self.__wheel.get_stats()
+		assert stats["overruns"] == 1
+		assert round(stats["max-overrun"], 2) == 0.4
+
+	def test_late_callback_calls_repeating_timer_once(self):
+		self.__add(0.1, "a", repeat=True)
+		# pretend the game hitched for ten seconds
+		self.__eventloop.time = 10
+		self.__eventloop.advance(0)
+		assert self.__calls == [("a", 10.0)]
+		self.__eventloop.advance(0.25)
+		assert self.__calls == [("a", 10.0), ("a", 10.1), ("a", 10.2)]
+
+	def test_calls_zero_timer_on_next_callback(self):
+		self.__eventloop.time = 0.005
+		self.__add(0, "a")
+		assert [call_time for call_time, function in self.__eventloop.callbacks.values()] == [0.005]
+		self.__eventloop.advance(0)
+		assert [name for name, call_time in self.__calls] == ["a"]
+
+	def test_cancels_zero_timer(self):
+		self.__wheel.cancel(self.__add(0, "a"))
+		self.__eventloop.advance(1)
+		assert self.__calls == []
+		assert len(self.__eventloop.callbacks) == 0
+
+class TestTimerMixin(object):
+
+	def setUp(self):
+		self.__eventloop = helpers.FakeEventLoop()
+		timer.set_eventloop(self.__eventloop)
+		self.__timers = timer.TimerMixin()
+		self.__function = mock.Mock()
+
+	def test_calls_function_once(self):
+		self.__timers.on_timeout(1, self.__function)
+		self.__eventloop.advance(5)
+		assert self.__function.call_count == 1
+
+	def test_replaces_previous_timeout_of_function(self):
+		self.__timers.on_timeout(1, self.__function)
+		self.__timers.on_timeout(2, self.__function)
+		self.__eventloop.advance(1.5)
+		assert not self.__function.called
+		assert timer.get_timer_stats()["active-timers"] == 1
+
+	def test_off_timeout_stops_repeating(self):
+		self.__timers.on_timeout(1, self.__function, repeat=True)
+		self.__eventloop.advance(2)
+		self.__timers.off_timeout(self.__function)
+		self.__eventloop.advance(2)
+		assert self.__function.call_count == 2
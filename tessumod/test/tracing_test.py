@@ -0,0 +1,105 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+
+import helpers
+from tessumod.adapters.tracing import TracingAdapter
+from tessumod.infrastructure import tracing
+
+log_path = os.path.join(helpers.temp_dirpath, "tessu_mod_slow_calls.log")
+
+class TestTracing(object):
+
+	def setUp(self):
+		tracing.set_slow_threshold(0.016)
+		tracing.set_slow_call_count(3)
+		tracing.set_enabled(True)
+
+	def tearDown(self):
+		tracing.set_enabled(False)
+
+	def test_records_execution_times_per_name(self):
+		tracing.record("Foo", 0.001, (), {})
+		tracing.record("Foo", 0.003, (), {})
+		tracing.record("Bar", 0.002, (), {})
+		stats = tracing.get_call_stats()
+		assert stats["Foo"]["count"] == 2
+		assert abs(stats["Foo"]["total"] - 0.004) < 1e-9
+		assert stats["Foo"]["max"] == 0.003
+		assert stats["Bar"]["count"] == 1
+
+	def test_keeps_slow_calls_with_arguments(self):
+		tracing.record("Foo", 0.001, (1,), {})
+		tracing.record("Foo", 0.02, (2,), {"bar": "baz"})
+		calls = tracing.get_slow_calls()
+		assert len(calls) == 1
+		assert calls[0][1:] == ("Foo", 0.02, "2, bar='baz'")
+
+	def test_keeps_only_latest_slow_calls(self):
+		for index in range(5):
+			tracing.record("Foo", 0.02, (index,), {})
+		assert [call[3] for call in tracing.get_slow_calls()] == ["2", "3", "4"]
+
+	def test_truncates_long_arguments(self):
+		tracing.record("Foo", 0.02, ("x" * 1000,), {})
+		assert len(tracing.get_slow_calls()[0][3]) == tracing.MAX_ARGUMENTS_LENGTH + 3
+
+	def test_enabling_clears_recorded_calls(self):
+		tracing.record("Foo", 0.02, (), {})
+		tracing.set_enabled(False)
+		tracing.set_enabled(True)
+		assert not tracing.get_slow_calls()
+		assert not tracing.get_call_stats()
+
+class TestTracingAdapter(object):
+
+	def setUp(self):
+		try:
+			os.makedirs(os.path.dirname(log_path))
+		except:
+			pass
+		try:
+			os.remove(log_path)
+		except:
+			pass
+		self.adapter = TracingAdapter()
+		self.adapter.init(log_path)
+		self.adapter.set_slow_threshold(0.016)
+
+	def tearDown(self):
+		tracing.set_enabled(False)
+
+	def read_log(self):
+		with open(log_path, "r") as file:
+			return file.read()
+
+	def test_dumps_when_disabled(self):
+		self.adapter.set_enabled(True)
+		tracing.record("PairChatUserToPlayer", 0.05, (5,), {})
+		self.adapter.set_enabled(False)
+		contents = self.read_log()
+		assert "PairChatUserToPlayer(5)" in contents
+		assert "50.00 ms" in contents
+
+	def test_dumps_when_enabled_again(self):
+		self.adapter.set_enabled(True)
+		assert not os.path.exists(log_path)
+		tracing.record("Foo", 0.001, (), {})
+		self.adapter.set_enabled(True)
+		assert "Foo" in self.read_log()
+		assert tracing.get_call_stats()["Foo"]["count"] == 1
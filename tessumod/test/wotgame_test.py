@@ -0,0 +1,145 @@
+# TessuMod: Mod for integrating TeamSpeak into World of Tanks
+# Copyright (C) 2016  Janne Hakonen
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+import mock
+
+import helpers
+from tessumod.infrastructure import timer, gameapi
+from tessumod.adapters import wotgame
+
+class TestMinimapAdapter(object):
+
+	def setUp(self):
+		self.__eventloop = helpers.FakeEventLoop()
+		timer.set_eventloop(self.__eventloop)
+		self.__patchers = [
+			mock.patch.object(gameapi.Minimap, "show_markers"),
+			mock.patch("time.time", lambda: self.__eventloop.time)
+		]
+		self.__show_markers = self.__patchers[0].start()
+		self.__patchers[1].start()
+		self.__adapter = wotgame.MinimapAdapter()
+		self.__adapter.set_action("attack")
+		self.__adapter.set_action_interval(2)
+
+	def tearDown(self):
+		for patcher in self.__patchers:
+			patcher.stop()
+
+	def __set_speaking(self, vehicle_id, speaking, flush=True):
+		self.__adapter.set_player_speaking({"in_battle": True, "vehicle_id": vehicle_id}, speaking)
+		if flush:
+			self.__eventloop.advance(0)
+
+	def __repeat(self):
+		self.__show_markers.reset_mock()
+		self.__eventloop.advance(2)
+
+	def test_shows_marker_on_next_tick(self):
+		self.__set_speaking(10, True, flush=False)
+		assert not self.__show_markers.called
+		self.__eventloop.advance(0)
+		self.__show_markers.assert_called_once_with([10], "attack")
+
+	def test_shows_markers_started_within_tick_in_one_call(self):
+		self.__set_speaking(10, True, flush=False)
+		self.__set_speaking(11, True, flush=False)
+		self.__eventloop.advance(0)
+		self.__show_markers.assert_called_once_with(mock.ANY, "attack")
+		assert sorted(self.__show_markers.call_args[0][0]) == [10, 11]
+
+	def test_does_not_show_marker_started_and_stopped_within_tick(self):
+		self.__set_speaking(10, True, flush=False)
+		self.__set_speaking(10, False, flush=False)
+		self.__eventloop.advance(0)
+		assert not self.__show_markers.called
+		assert len(self.__eventloop.callbacks) == 0
+
+	def test_repeats_all_markers_in_one_call(self):
+		self.__set_speaking(10, True)
+		self.__set_speaking(11, True)
+		self.__repeat()
+		self.__show_markers.assert_called_once_with(mock.ANY, "attack")
+		assert sorted(self.__show_markers.call_args[0][0]) == [10, 11]
+
+	def test_uses_one_timer_for_all_markers(self):
+		for vehicle_id in range(30):
+			self.__set_speaking(vehicle_id, True)
+		assert timer.get_timer_stats()["active-timers"] == 1
+		assert len(self.__eventloop.callbacks) == 1
+
+	def test_skips_repeat_right_after_marker_is_shown(self):
+		self.__set_speaking(10, True)
+		self.__eventloop.advance(1.5)
+		self.__set_speaking(11, True)
+		self.__repeat()
+		self.__show_markers.assert_called_once_with([10], "attack")
+		self.__repeat()
+		assert sorted(self.__show_markers.call_args[0][0]) == [10, 11]
+
+	def test_stops_timer_when_nobody_speaks(self):
+		self.__set_speaking(10, True)
+		self.__set_speaking(11, True)
+		self.__set_speaking(10, False)
+		assert self.__adapter.get_animated_count() == 1
+		self.__set_speaking(11, False)
+		assert self.__adapter.get_animated_count() == 0
+		assert timer.get_timer_stats()["active-timers"] == 0
+		assert len(self.__eventloop.callbacks) == 0
+
+	def test_clears_all_markers(self):
+		self.__set_speaking(10, True)
+		self.__adapter.clear_all_players_speaking()
+		self.__repeat()
+		assert not self.__show_markers.called
+
+class TestChatIndicatorAdapter(object):
+
+	def setUp(self):
+		self.__eventloop = helpers.FakeEventLoop()
+		timer.set_eventloop(self.__eventloop)
+		self.__patcher = mock.patch.object(gameapi.VoiceChat, "set_player_speaking")
+		self.__set_player_speaking = self.__patcher.start()
+		self.__adapter = wotgame.ChatIndicatorAdapter()
+
+	def tearDown(self):
+		self.__patcher.stop()
+
+	def test_applies_net_changes_once_per_tick(self):
+		self.__adapter.set_player_speaking({"id": 1000}, True)
+		self.__adapter.set_player_speaking({"id": 1001}, True)
+		self.__adapter.set_player_speaking({"id": 1001}, False)
+		self.__adapter.set_player_speaking({"id": 1000}, True)
+		assert not self.__set_player_speaking.called
+		self.__eventloop.advance(0)
+		self.__set_player_speaking.assert_called_once_with(1000, True)
+
+	def test_does_not_repeat_shown_state(self):
+		self.__adapter.set_player_speaking({"id": 1000}, True)
+		self.__eventloop.advance(0)
+		self.__adapter.set_player_speaking({"id": 1000}, False)
+		self.__adapter.set_player_speaking({"id": 1000}, True)
+		self.__eventloop.advance(0)
+		self.__set_player_speaking.assert_called_once_with(1000, True)
+
+	def test_clears_pending_changes(self):
+		self.__adapter.set_player_speaking({"id": 1000}, True)
+		self.__eventloop.advance(0)
+		self.__adapter.set_player_speaking({"id": 1001}, True)
+		self.__adapter.clear_all_players_speaking()
+		self.__eventloop.advance(0)
+		assert self.__set_player_speaking.call_args_list == [mock.call(1000, True), mock.call(1000, False)]